@@ -0,0 +1,28 @@
+from django.contrib import admin
+from .models import CallingWindow, CallQueue, VoiceOverride
+from .retries import requeue
+
+
+@admin.register(VoiceOverride)
+class VoiceOverrideAdmin(admin.ModelAdmin):
+    list_display = ("country", "voice_id", "updated")
+    search_fields = ("country", "voice_id")
+
+
+@admin.register(CallingWindow)
+class CallingWindowAdmin(admin.ModelAdmin):
+    list_display = ("country", "time_zone", "start", "end", "weekdays")
+    search_fields = ("country",)
+
+
+@admin.register(CallQueue)
+class CallQueueAdmin(admin.ModelAdmin):
+    list_display = ("id", "script", "status", "campaign", "attempts", "last_failure", "not_before", "updated")
+    list_filter = ("status", "last_failure", "campaign")
+    search_fields = ("exten", "campaign")
+    actions = ["requeue_dead_letters"]
+
+    @admin.action(description="Requeue selected dead-lettered calls")
+    def requeue_dead_letters(self, request, queryset):
+        count = requeue(queryset)
+        self.message_user(request, f"Requeued {count} calls.")
@@ -0,0 +1,388 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+from .metrics import (
+    AMI_ACTION_SECONDS, AMI_ERRORS, AMI_LOGIN_SECONDS, AMI_SOCKET_LOOKUPS, AMI_SOCKETS_DROPPED, AMI_SOCKETS_OPEN,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AMILoginError(Exception):
+    """Raised when Asterisk rejects (or never answers) a Login action."""
+
+    def __init__(self, response=None):
+        self.response = response
+        super().__init__(f"AMI login failed: {response}")
+
+
+def credential_key(credential):
+    """Sockets are shared by every CallCredential row with the same host/port/user."""
+    return (credential.ami_host, int(credential.ami_port), credential.ami_user)
+
+
+class AMIMessage:
+    """
+    One AMI packet (a Response or an Event). ``keys`` holds its headers; a
+    header that repeats (ChanVariable, Output, ...) keeps every value in a
+    list under ``multi``. Mirrors the bits of asterisk.ami's Response/Event
+    the rest of callbot uses (``keys``, ``name``, ``is_error()``).
+    """
+
+    __slots__ = ("keys", "multi")
+
+    def __init__(self, keys, multi=None):
+        self.keys = keys
+        self.multi = multi or {}
+
+    @classmethod
+    def parse(cls, data):
+        keys, multi = {}, {}
+        for line in data.decode("utf-8", "replace").split("\r\n"):
+            key, sep, value = line.partition(":")
+            if not sep:
+                continue
+            key, value = key.strip(), value.strip()
+            if key in keys:
+                multi.setdefault(key, [keys[key]]).append(value)
+            keys[key] = value
+        return cls(keys, multi)
+
+    @property
+    def name(self):
+        return self.keys.get("Event")
+
+    @property
+    def status(self):
+        return self.keys.get("Response")
+
+    def is_error(self):
+        return self.keys.get("Response", "").lower() == "error"
+
+    def __repr__(self):
+        return f"<AMIMessage {self.keys}>"
+
+
+def credential_label(key):
+    host, port, user = key
+    return f"{user}@{host}:{port}"
+
+
+def format_action(name, keys):
+    lines = [f"Action: {name}"]
+    for key, value in keys.items():
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple)):
+            lines.extend(f"{key}: {v}" for v in value)  # e.g. Variable=[...]
+        else:
+            lines.append(f"{key}: {value}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8")
+
+
+class AsyncAMIClient:
+    """
+    asyncio AMI connection. Actions are written as soon as they're sent and
+    matched to their Response by ActionID, so any number can be in flight on
+    one socket (pipelining). With ``events`` on, events go to subscribers; a
+    subscriber is a callable (sync, or a coroutine function run as a task)
+    plus an optional set of event names. Sync subscribers run on the event
+    loop, so they must not block (ami_events.AMIEventListener hands events
+    to a thread of its own).
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, host, port, username, secret, events=False, timeout=10, keepalive_interval=20):
+        self.host = host
+        self.port = int(port)
+        self.username = username
+        self.secret = secret
+        self.events = events
+        self.timeout = timeout
+        self.keepalive_interval = keepalive_interval
+        self._reader = None
+        self._writer = None
+        self._pending = {}
+        self._subscribers = []
+        self._tasks = []
+        self._event_tasks = set()  # subscriber coroutines still running; the loop only keeps weak refs
+        self._prefix = f"aami{next(self._ids)}-"
+        self._counter = itertools.count(1)
+        self.connected = False
+        self.in_flight_max = 0
+        self.actions = 0
+        self.errors = 0
+        self.action_seconds = 0.0
+        self.action_seconds_max = 0.0
+
+    async def connect(self):
+        """Open the socket and log in. Returns login seconds; raises AMILoginError if rejected."""
+        started = time.perf_counter()
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, limit=2 ** 20), self.timeout
+        )
+        banner = await asyncio.wait_for(self._reader.readline(), self.timeout)
+        if not banner.lower().startswith(b"asterisk call manager"):
+            await self.close()
+            raise ConnectionError(f"not an AMI server: {banner!r}")
+        self.connected = True
+        self._tasks = [asyncio.create_task(self._read_loop())]
+        response = await self.send_action(
+            "Login", Username=self.username, Secret=self.secret, Events="on" if self.events else "off"
+        )
+        if response.is_error():
+            await self.close()
+            raise AMILoginError(response)
+        if self.keepalive_interval:
+            self._tasks.append(asyncio.create_task(self._keepalive()))
+        return time.perf_counter() - started
+
+    # -- actions ----------------------------------------------------------
+
+    def send_action_nowait(self, name, **keys):
+        """Write the action now and return a future for its Response."""
+        if not self.connected:
+            raise ConnectionError(f"AMI {self.host}:{self.port} is not connected")
+        action_id = keys.pop("ActionID", None) or f"{self._prefix}{next(self._counter)}"
+        future = asyncio.get_running_loop().create_future()
+        future.started = time.perf_counter()
+        self._pending[action_id] = future
+        self.in_flight_max = max(self.in_flight_max, len(self._pending))
+        self._writer.write(format_action(name, {"ActionID": action_id, **keys}))
+        return future
+
+    async def send_action(self, name, timeout=None, **keys):
+        """Send an action and wait for its Response (other actions may be sent meanwhile)."""
+        action_id = keys.setdefault("ActionID", f"{self._prefix}{next(self._counter)}")
+        future = self.send_action_nowait(name, **keys)
+        # Flow control: only waits when the socket's write buffer is full
+        await self._writer.drain()
+        try:
+            return await asyncio.wait_for(future, timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.errors += 1
+            self._pending.pop(action_id, None)
+            raise
+
+    async def ping(self):
+        return await self.send_action("Ping")
+
+    async def _keepalive(self):
+        while self.connected:
+            await asyncio.sleep(self.keepalive_interval)
+            try:
+                await self.ping()
+            except Exception:
+                await self.close()
+
+    # -- events -----------------------------------------------------------
+
+    def subscribe(self, callback, names=None):
+        entry = (callback, set(names) if names else None)
+        self._subscribers.append(entry)
+        return entry
+
+    def unsubscribe(self, entry):
+        if entry in self._subscribers:
+            self._subscribers.remove(entry)
+
+    def _dispatch(self, event):
+        for callback, names in self._subscribers:
+            if names is not None and event.name not in names:
+                continue
+            try:
+                result = callback(event)
+            except Exception:
+                logger.exception("AMI event subscriber failed on %s", event.name)
+                continue
+            if asyncio.iscoroutine(result):
+                task = asyncio.ensure_future(result)
+                self._event_tasks.add(task)
+                task.add_done_callback(self._event_task_done)
+
+    def _event_task_done(self, task):
+        self._event_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("AMI event subscriber failed", exc_info=task.exception())
+
+    # -- reading ----------------------------------------------------------
+
+    async def _read_loop(self):
+        try:
+            while True:
+                data = await self._reader.readuntil(b"\r\n\r\n")
+                message = AMIMessage.parse(data)
+                # Check Event first: OriginateResponse events carry a Response header too
+                if "Event" in message.keys:
+                    self._dispatch(message)
+                elif "Response" in message.keys:
+                    future = self._pending.pop(message.keys.get("ActionID"), None)
+                    if future is not None and not future.done():
+                        elapsed = time.perf_counter() - future.started
+                        self.actions += 1
+                        self.action_seconds += elapsed
+                        self.action_seconds_max = max(self.action_seconds_max, elapsed)
+                        if message.is_error():
+                            self.errors += 1
+                        future.set_result(message)
+        except (asyncio.IncompleteReadError, ConnectionError, OSError):
+            pass
+        finally:
+            self.connected = False
+            self._fail_pending(ConnectionError(f"AMI {self.host}:{self.port} disconnected"))
+
+    def _fail_pending(self, exc):
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(exc)
+
+    async def close(self):
+        was_connected, self.connected = self.connected, False
+        current = asyncio.current_task()
+        for task in self._tasks + list(self._event_tasks):
+            if task is not current:
+                task.cancel()
+        if self._writer is not None:
+            try:
+                if was_connected:
+                    self._writer.write(format_action("Logoff", {}))
+                self._writer.close()
+            except Exception:
+                pass
+        self._fail_pending(ConnectionError(f"AMI {self.host}:{self.port} closed"))
+
+    def stats(self):
+        return {
+            "connected": self.connected,
+            "in_flight": len(self._pending),
+            "in_flight_max": self.in_flight_max,
+            "actions": self.actions,
+            "errors": self.errors,
+            "action_ms_avg": 1000 * self.action_seconds / self.actions if self.actions else 0.0,
+            "action_ms_max": 1000 * self.action_seconds_max,
+        }
+
+
+class AsyncAMIPool:
+    """
+    Up to ``sockets`` logged-in AsyncAMIClients per credential key, used
+    round-robin. Each socket pipelines, so a handful of them carry thousands
+    of actions per second. Belongs to one event loop (one per dialer worker).
+    A lookup served by an open socket counts as a hit, one that has to log a
+    socket in as a miss.
+    """
+
+    def __init__(self, sockets=2, timeout=10, keepalive_interval=20):
+        self.sockets = sockets
+        self.timeout = timeout
+        self.keepalive_interval = keepalive_interval
+        self._clients = defaultdict(list)
+        self._next = defaultdict(int)
+        self._locks = defaultdict(asyncio.Lock)
+        self._stats = defaultdict(lambda: defaultdict(float))
+
+    async def client(self, credential):
+        key = credential_key(credential)
+        label = credential_label(key)
+        clients = [c for c in self._clients[key] if c.connected]
+        dropped = len(self._clients[key]) - len(clients)
+        if dropped:
+            self._stats[key]["dropped"] += dropped
+            AMI_SOCKETS_DROPPED.labels(credential=label).inc(dropped)
+            AMI_SOCKETS_OPEN.labels(credential=label).set(len(clients))
+        self._clients[key] = clients
+        if len(clients) < self.sockets:
+            async with self._locks[key]:
+                clients = [c for c in self._clients[key] if c.connected]
+                if len(clients) < self.sockets:
+                    client = await self._login(key, credential)
+                    self._clients[key] = clients + [client]
+                    self._lookup(key, hit=False)
+                    AMI_SOCKETS_OPEN.labels(credential=label).set(len(clients) + 1)
+                    return client
+        self._lookup(key, hit=True)
+        self._next[key] = (self._next[key] + 1) % len(clients)
+        return clients[self._next[key]]
+
+    def _lookup(self, key, hit):
+        self._stats[key]["hits" if hit else "misses"] += 1
+        AMI_SOCKET_LOOKUPS.labels(credential=credential_label(key), result="hit" if hit else "miss").inc()
+
+    async def _login(self, key, credential):
+        stats = self._stats[key]
+        client = AsyncAMIClient(
+            key[0], key[1], key[2], credential.ami_pass,
+            timeout=self.timeout, keepalive_interval=self.keepalive_interval,
+        )
+        try:
+            elapsed = await client.connect()
+        except Exception:
+            stats["login_failures"] += 1
+            AMI_ERRORS.labels(credential=credential_label(key), action="Login").inc()
+            raise
+        stats["logins"] += 1
+        AMI_LOGIN_SECONDS.labels(credential=credential_label(key)).observe(elapsed)
+        stats["login_seconds"] += elapsed
+        stats["login_seconds_max"] = max(stats["login_seconds_max"], elapsed)
+        return client
+
+    async def send_action(self, credential, name, **keys):
+        label = credential_label(credential_key(credential))
+        client = await self.client(credential)
+        started = time.perf_counter()
+        try:
+            response = await client.send_action(name, **keys)
+        except Exception:
+            AMI_ERRORS.labels(credential=label, action=name).inc()
+            raise
+        AMI_ACTION_SECONDS.labels(credential=label, action=name).observe(time.perf_counter() - started)
+        if response.is_error():
+            AMI_ERRORS.labels(credential=label, action=name).inc()
+        return response
+
+    async def close(self):
+        for key, clients in self._clients.items():
+            for client in clients:
+                await client.close()
+            AMI_SOCKETS_OPEN.labels(credential=credential_label(key)).set(0)
+        self._clients.clear()
+
+    def stats(self):
+        out = {}
+        for key in set(self._clients) | set(self._stats):
+            s = self._stats[key]
+            clients = [c.stats() for c in self._clients.get(key, [])]
+            actions = sum(c["actions"] for c in clients)
+            lookups = s["hits"] + s["misses"]
+            out[credential_label(key)] = {
+                "sockets": sum(1 for c in clients if c["connected"]),
+                "hits": int(s["hits"]),
+                "misses": int(s["misses"]),
+                "hit_ratio": s["hits"] / lookups if lookups else 0.0,
+                "dropped": int(s["dropped"]),
+                "logins": int(s["logins"]),
+                "login_failures": int(s["login_failures"]),
+                "login_ms_avg": 1000 * s["login_seconds"] / s["logins"] if s["logins"] else 0.0,
+                "login_ms_max": 1000 * s["login_seconds_max"],
+                "actions": actions,
+                "errors": sum(c["errors"] for c in clients),
+                "in_flight": sum(c["in_flight"] for c in clients),
+                "action_ms_avg": sum(c["action_ms_avg"] * c["actions"] for c in clients) / actions if actions else 0.0,
+                "action_ms_max": max((c["action_ms_max"] for c in clients), default=0.0),
+            }
+        return out
+
+
+def make_async_pool():
+    return AsyncAMIPool(
+        sockets=getattr(settings, 'AMI_ASYNC_SOCKETS', 2),
+        timeout=getattr(settings, 'AMI_ASYNC_TIMEOUT', 10),
+        keepalive_interval=getattr(settings, 'AMI_KEEPALIVE_SECONDS', 20),
+    )
@@ -0,0 +1,366 @@
+import asyncio
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .ami_async import AsyncAMIClient, credential_key
+from .models import CallQueue
+from .retries import NO_ANSWER, REJECTED, apply_failure, failure_fields, settle_orphaned
+from .spans import UNSAMPLED
+from .write_behind import WRITER
+
+logger = logging.getLogger(__name__)
+
+TRACKED_EVENTS = ("OriginateResponse", "Newstate", "Hangup")
+
+# Statuses of a call Asterisk is working on; the event stream moves it on from here
+ACTIVE = ("Dialing", "Ringing", "Answered")
+
+# Q.850 causes on an unanswered hangup that mean the callee didn't pick up
+_NO_ANSWER_CAUSES = {"17", "18", "19", "34"}  # busy, no user responding, no answer, congestion
+# OriginateResponse Reason codes for the same
+_NO_ANSWER_REASONS = {"3", "5", "8"}          # no answer, busy, congestion
+
+
+class CallTracker:
+    """
+    Correlates AMI events with CallQueue rows and writes the call's progress
+    to them: Dialing -> Ringing -> Answered -> Completed, or a retry (see
+    callbot.retries) if it fails before being answered.
+
+    Every dialer process has a listener per PBX, so each one sees every
+    call's events. Originates carry ``ActionID`` and ``ChannelId`` (which
+    becomes the channel's Uniqueid) starting with this tracker's
+    ``call_prefix``, and events without it belong to another process (or
+    aren't ours at all) and are dropped before any DB lookup. Calls left in
+    flight by a process that died are settled by leases.reclaim_expired once
+    its lease runs out; expire_stale only looks at this process' own calls. Transitions are decided
+    from the call's state kept here and written through the write-behind
+    buffer, so they land in order without a read per event. Rows tracked from
+    this process also get an asyncio future resolved with the final outcome.
+    """
+
+    def __init__(self, writer=WRITER, remember_finished=10000, call_prefix=None):
+        self.writer = writer
+        self.call_prefix = call_prefix or f"callbot-{uuid.uuid4().hex[:8]}-"
+        self._lock = threading.Lock()
+        self._calls = {}     # queue id -> {"status", "answered_at", "attempts"}
+        self._by_action = {}
+        self._by_uniqueid = {}
+        self._waiters = {}   # queue id -> (loop, future)
+        self._finished = OrderedDict()  # recently finished ids, so late events are ignored
+        self._remember_finished = remember_finished
+        self.events = 0
+        self.unmatched = 0
+        self.foreign = 0
+
+    def call_id(self, queue_id, attempts):
+        """ActionID / ChannelId for one attempt of a call originated from this process."""
+        return f"{self.call_prefix}{queue_id}-{attempts}"
+
+    def track(self, queue_id, action_id, uniqueid=None, attempts=0, spans=UNSAMPLED):
+        """Register a call about to be originated; returns a future for its outcome."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            self._finished.pop(queue_id, None)
+            self._calls[queue_id] = {"status": "Dialing", "answered_at": None, "attempts": attempts, "spans": spans}
+            self._by_action[action_id] = queue_id
+            if uniqueid:
+                self._by_uniqueid[uniqueid] = queue_id
+            self._waiters[queue_id] = (loop, future)
+        return future
+
+    def forget(self, queue_id):
+        with self._lock:
+            self._calls.pop(queue_id, None)
+            self._waiters.pop(queue_id, None)
+            for mapping in (self._by_action, self._by_uniqueid):
+                for key in [k for k, v in mapping.items() if v == queue_id]:
+                    del mapping[key]
+
+    def _finish(self, queue_id, outcome):
+        with self._lock:
+            waiter = self._waiters.pop(queue_id, None)
+            self._finished[queue_id] = True
+            while len(self._finished) > self._remember_finished:
+                self._finished.popitem(last=False)
+        if waiter:
+            loop, future = waiter
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(outcome))
+        self.forget(queue_id)
+
+    def _call(self, action_id=None, uniqueid=None):
+        """(queue id, state) of the call an event belongs to, or (None, None)."""
+        with self._lock:
+            queue_id = self._by_action.get(action_id) or self._by_uniqueid.get(uniqueid)
+            if queue_id:
+                return queue_id, self._calls[queue_id]
+        if not any(i and i.startswith(self.call_prefix) for i in (action_id, uniqueid)):
+            self.foreign += 1  # another process' call, or a channel the dialer didn't start
+            return None, None
+        # Ours but no longer tracked (e.g. a late event after the final write): ask the row
+        qs = CallQueue.objects.filter(status__in=ACTIVE)
+        row = None
+        if action_id:
+            row = qs.filter(action_id=action_id).values("id", "status", "answered_at", "attempts").first()
+        if row is None and uniqueid:
+            row = qs.filter(uniqueid=uniqueid).values("id", "status", "answered_at", "attempts").first()
+        if row is None:
+            return None, None
+        queue_id = row.pop("id")
+        with self._lock:
+            if queue_id in self._finished:
+                return None, None  # its final write may not have been flushed yet
+            state = self._calls.setdefault(queue_id, row)
+            if uniqueid:
+                self._by_uniqueid[uniqueid] = queue_id
+        return queue_id, state
+
+    def _write(self, queue_id, **fields):
+        self.writer.update(CallQueue, queue_id, **fields)
+
+    # -- event handlers (run on the AMI listener threads) ----------------
+
+    def handle(self, event, source=None):
+        self.events += 1
+        handler = getattr(self, f"_on_{event.name.lower()}", None)
+        if handler is None:
+            return
+        try:
+            handler(event.keys)
+        except Exception:
+            logger.exception("AMI %s event not applied", event.name)
+
+    def _on_originateresponse(self, keys):
+        queue_id, state = self._call(action_id=keys.get("ActionID"))
+        if not queue_id:
+            self.unmatched += 1
+            return
+        if keys.get("Response") == "Success":
+            # Async Originate reports Success once the far end answers
+            uniqueid = keys.get("Uniqueid", "")
+            if uniqueid and uniqueid != "<null>":
+                with self._lock:
+                    self._by_uniqueid[uniqueid] = queue_id
+                self._write(queue_id, uniqueid=uniqueid)
+            self._answer(queue_id, state)
+            return
+        reason = str(keys.get("Reason", ""))
+        failure = NO_ANSWER if reason in _NO_ANSWER_REASONS else REJECTED
+        self.fail(queue_id, failure, f"Originate failed (reason {reason or '?'})")
+
+    def _on_newstate(self, keys):
+        queue_id, state = self._call(uniqueid=keys.get("Uniqueid"))
+        if not queue_id:
+            return
+        channel_state = str(keys.get("ChannelState", ""))
+        if channel_state == "5" and state["status"] == "Dialing":
+            state["status"] = "Ringing"
+            self._write(queue_id, status="Ringing")
+        elif channel_state == "6":
+            self._answer(queue_id, state)
+
+    def _answer(self, queue_id, state):
+        if state["answered_at"] is None:
+            state["status"] = "Answered"
+            state["answered_at"] = timezone.now()
+            state.get("spans", UNSAMPLED).mark("answered")
+            self._write(queue_id, status="Answered", answered_at=state["answered_at"])
+
+    def _on_hangup(self, keys):
+        queue_id, state = self._call(uniqueid=keys.get("Uniqueid"))
+        if not queue_id:
+            return
+        now = timezone.now()
+        state.get("spans", UNSAMPLED).mark("hung_up")
+        cause = str(keys.get("Cause", ""))
+        cause_text = f"{cause} {keys.get('Cause-txt', '')}".strip()
+        if state["answered_at"]:
+            duration = (now - state["answered_at"]).total_seconds()
+            self._write(
+                queue_id, status="Completed", ended_at=now, duration=duration, hangup_cause=cause_text,
+                last_failure="", last_error="",
+            )
+            self._finish(queue_id, f"Completed after {duration:.0f}s ({cause_text})")
+            return
+        failure = NO_ANSWER if cause in _NO_ANSWER_CAUSES else REJECTED
+        self.fail(queue_id, failure, f"Hangup before answer: {cause_text}", ended_at=now, hangup_cause=cause_text)
+
+    def fail(self, queue_id, failure, error, **extra):
+        """Finish a tracked call as failed: schedule its retry (or DeadLetter) and resolve its future."""
+        with self._lock:
+            state = self._calls.get(queue_id)
+        if state is None:
+            return False
+        state.get("spans", UNSAMPLED).mark("hung_up")
+        queue_obj = CallQueue(pk=queue_id, attempts=state["attempts"])
+        now = timezone.now()
+        delay = apply_failure(queue_obj, failure, error, now)
+        self.writer.update(CallQueue, queue_id, **failure_fields(queue_obj, now), **extra)
+        retry = f"retry in {delay:.0f}s" if delay is not None else queue_obj.status
+        self._finish(queue_id, f"{error} | {retry}")
+        return True
+
+    def expire_stale(self, max_age):
+        """
+        Settle this process' calls that have had no event for ``max_age``
+        seconds and aren't waited on any more (lost listener, missed Hangup).
+        Other processes' calls are theirs to finish while their lease holds.
+        """
+        cutoff = timezone.now() - timedelta(seconds=max_age)
+        expired = 0
+        stale = CallQueue.objects.filter(status__in=ACTIVE, action_id__startswith=self.call_prefix, updated__lt=cutoff)
+        for queue_obj in stale:
+            with self._lock:
+                if queue_obj.pk in self._calls:
+                    continue  # still waited on here; the dialer's own timeout handles it
+            settle_orphaned(queue_obj, f"no call events for {max_age}s")
+            expired += 1
+        return expired
+
+
+class AMIEventListener(threading.Thread):
+    """
+    One logged-in AMI connection that feeds TRACKED_EVENTS to ``on_event``,
+    reconnecting as needed. The connection is an AsyncAMIClient(events=True)
+    on this thread's own event loop; ``on_event`` may touch the database, so
+    it runs on a single handler thread, which also keeps events in order.
+    """
+
+    def __init__(self, credential, on_event, keepalive_interval=20, timeout=30, reconnect_delay=2):
+        self.key = credential_key(credential)
+        super().__init__(name=f"ami-events-{self.key[0]}:{self.key[1]}", daemon=True)
+        self.secret = credential.ami_pass
+        self.on_event = on_event
+        self.keepalive_interval = keepalive_interval
+        self.timeout = timeout
+        self.reconnect_delay = reconnect_delay
+        self.connected = threading.Event()
+        self.stopped = threading.Event()
+        self.reconnects = 0
+        self.client = None
+        self._handler = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{self.name}-handler")
+
+    def run(self):
+        try:
+            asyncio.run(self._listen())
+        finally:
+            self._handler.shutdown(wait=False)
+
+    async def _listen(self):
+        host, port, user = self.key
+        delay = self.reconnect_delay
+        while not self.stopped.is_set():
+            self.client = AsyncAMIClient(
+                host, port, user, self.secret, events=True,
+                timeout=self.timeout, keepalive_interval=self.keepalive_interval,
+            )
+            self.client.subscribe(self._deliver, TRACKED_EVENTS)
+            try:
+                await self.client.connect()
+            except Exception as e:
+                logger.error("AMI event listener %s:%s could not log in: %s", host, port, e)
+                await self.client.close()
+                await self._sleep(delay)
+                delay = min(delay * 2, 60)
+                continue
+            delay = self.reconnect_delay
+            self.connected.set()
+            # The client's own keepalive closes it when a Ping goes unanswered
+            while self.client.connected and not self.stopped.is_set():
+                await asyncio.sleep(0.5)
+            self.connected.clear()
+            await self.client.close()
+            if not self.stopped.is_set():
+                self.reconnects += 1
+                logger.warning("AMI event listener %s:%s disconnected, reconnecting", host, port)
+
+    def _deliver(self, event):
+        self._handler.submit(self.on_event, event)
+
+    async def _sleep(self, seconds):
+        deadline = asyncio.get_running_loop().time() + seconds
+        while not self.stopped.is_set() and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.5)
+
+    def stop(self):
+        self.stopped.set()
+
+
+class AMIEventHub:
+    """One AMIEventListener per PBX (host, port), shared by every call and credential on it."""
+
+    def __init__(self, tracker, keepalive_interval=20, timeout=30, connect_timeout=5):
+        if keepalive_interval >= timeout:
+            raise ValueError(
+                f"AMI keepalive interval ({keepalive_interval}s) must be below the socket timeout ({timeout}s)"
+            )
+        self.tracker = tracker
+        self.keepalive_interval = keepalive_interval
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._listeners = {}
+        self._lock = threading.Lock()
+
+    def ensure_listener(self, credential):
+        pbx = credential_key(credential)[:2]
+        with self._lock:
+            listener = self._listeners.get(pbx)
+            if listener is not None and listener.is_alive():
+                return listener
+            listener = AMIEventListener(
+                credential, self.tracker.handle, self.keepalive_interval, self.timeout,
+            )
+            self._listeners[pbx] = listener
+            listener.start()
+        # Give a new listener a moment so it sees this call's first events
+        listener.connected.wait(self.connect_timeout)
+        return listener
+
+    def call_id(self, queue_id, attempts):
+        return self.tracker.call_id(queue_id, attempts)
+
+    def track(self, queue_id, action_id, uniqueid=None, attempts=0, spans=UNSAMPLED):
+        """Call from the event loop after ensure_listener() (which may block) for the call's PBX."""
+        return self.tracker.track(queue_id, action_id, uniqueid, attempts, spans=spans)
+
+    def forget(self, queue_id):
+        self.tracker.forget(queue_id)
+
+    def fail(self, queue_id, failure, error):
+        return self.tracker.fail(queue_id, failure, error)
+
+    def expire_stale(self, max_age):
+        return self.tracker.expire_stale(max_age)
+
+    def close_all(self):
+        with self._lock:
+            for listener in self._listeners.values():
+                listener.stop()
+            self._listeners = {}
+
+    def stats(self):
+        with self._lock:
+            listeners = {
+                f"{host}:{port}": {"connected": l.connected.is_set(), "reconnects": l.reconnects}
+                for (host, port), l in self._listeners.items()
+            }
+        return {
+            "events": self.tracker.events, "unmatched": self.tracker.unmatched,
+            "foreign": self.tracker.foreign, "listeners": listeners,
+        }
+
+
+AMI_EVENTS = AMIEventHub(
+    CallTracker(),
+    keepalive_interval=getattr(settings, 'AMI_KEEPALIVE_SECONDS', 20),
+    timeout=getattr(settings, 'AMI_SOCKET_TIMEOUT', 30),
+    connect_timeout=getattr(settings, 'AMI_EVENTS_CONNECT_TIMEOUT', 5),
+)
@@ -0,0 +1,234 @@
+import math
+import os
+import shutil
+import subprocess
+import threading
+import warnings
+import wave
+from pathlib import Path
+
+from django.conf import settings
+
+with warnings.catch_warnings():
+    # Deprecated in 3.11, removed in 3.13 (requirements.txt pulls in audioop-lts there); C speed for all sample math
+    warnings.simplefilter("ignore", DeprecationWarning)
+    import audioop
+
+TELEPHONY_RATE = 8000
+SAMPLE_WIDTH = 2  # signed 16-bit little-endian, Asterisk's "slin"
+
+
+def read_pcm(path):
+    """(mono 16-bit PCM bytes, sample rate) from a WAV or AIFF file, whatever the driver wrote."""
+    with open(path, "rb") as f:
+        magic = f.read(12)
+    if magic[:4] == b"FORM" and magic[8:12] in (b"AIFF", b"AIFC"):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            import aifc
+        with aifc.open(str(path), "rb") as f:
+            width, channels, rate = f.getsampwidth(), f.getnchannels(), f.getframerate()
+            data = f.readframes(f.getnframes())
+        data = audioop.byteswap(data, width)  # AIFF is big-endian
+    elif magic[:4] == b"RIFF" and magic[8:12] == b"WAVE":
+        with wave.open(str(path), "rb") as f:
+            width, channels, rate = f.getsampwidth(), f.getnchannels(), f.getframerate()
+            data = f.readframes(f.getnframes())
+        if width == 1:
+            data = audioop.bias(data, 1, -128)  # 8-bit WAV is unsigned
+    else:
+        raise ValueError(f"{Path(path).name} is not WAV or AIFF audio")
+    if channels == 2:
+        data = audioop.tomono(data, width, 0.5, 0.5)
+    elif channels != 1:
+        raise ValueError(f"{Path(path).name} has {channels} channels")
+    if width != SAMPLE_WIDTH:
+        data = audioop.lin2lin(data, width, SAMPLE_WIDTH)
+    return data, rate
+
+
+def write_wav(path, pcm, rate=TELEPHONY_RATE):
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(SAMPLE_WIDTH)
+        f.setframerate(rate)
+        f.writeframes(pcm)
+
+
+def concat_audio(sources, target):
+    """Join prompts end to end as one WAV; sample for sample when they share a rate, as chunks of one voice do."""
+    parts, rate = [], None
+    for source in sources:
+        pcm, source_rate = read_pcm(source)
+        if rate is None:
+            rate = source_rate
+        elif source_rate != rate:
+            pcm = audioop.ratecv(pcm, SAMPLE_WIDTH, 1, source_rate, rate, None)[0]
+        parts.append(pcm)
+    write_wav(target, b"".join(parts), rate or TELEPHONY_RATE)
+
+
+def _moving_average(pcm, width):
+    # Sum of ``width`` shifted copies, each pre-scaled: a box filter at C speed
+    scaled = audioop.mul(pcm, SAMPLE_WIDTH, 1.0 / width)
+    out = scaled
+    for shift in range(1, width):
+        pad = b"\0" * (shift * SAMPLE_WIDTH)
+        out = audioop.add(out, pad + scaled[: len(scaled) - len(pad)], SAMPLE_WIDTH)
+    return out
+
+
+def resample(pcm, rate, target=TELEPHONY_RATE):
+    if rate == target:
+        return pcm
+    if rate > target:
+        # Two box-filter passes put nulls near 7 kHz for common TTS rates (22.05k, 16k, 44.1k),
+        # enough to keep sibilants from aliasing into the 0-4 kHz band ratecv keeps
+        width = int(rate // target) + 1
+        pcm = _moving_average(_moving_average(pcm, width), width)
+    return audioop.ratecv(pcm, SAMPLE_WIDTH, 1, rate, target, None)[0]
+
+
+def dbfs_to_amplitude(dbfs):
+    return 32767 * 10 ** (dbfs / 20)
+
+
+def trim_silence(pcm, rate, threshold_dbfs=-45.0, frame_ms=20, pad_ms=100):
+    """Drop leading/trailing frames quieter than ``threshold_dbfs``, keeping ``pad_ms`` either side."""
+    frame = max(1, rate * frame_ms // 1000) * SAMPLE_WIDTH
+    threshold = dbfs_to_amplitude(threshold_dbfs)
+    loud = [i for i in range(0, len(pcm), frame) if audioop.rms(pcm[i:i + frame], SAMPLE_WIDTH) > threshold]
+    if not loud:
+        return b""
+    pad = rate * pad_ms // 1000 * SAMPLE_WIDTH
+    return pcm[max(0, loud[0] - pad):min(len(pcm), loud[-1] + frame + pad)]
+
+
+def normalize(pcm, target_dbfs=-18.0, peak_dbfs=-1.0):
+    """Scale to ``target_dbfs`` RMS without letting peaks go over ``peak_dbfs``."""
+    if not pcm:
+        return pcm
+    rms = audioop.rms(pcm, SAMPLE_WIDTH)
+    peak = audioop.max(pcm, SAMPLE_WIDTH)
+    if not rms or not peak:
+        return pcm
+    gain = min(dbfs_to_amplitude(target_dbfs) / rms, dbfs_to_amplitude(peak_dbfs) / peak)
+    return audioop.mul(pcm, SAMPLE_WIDTH, gain) if not math.isclose(gain, 1.0, rel_tol=0.01) else pcm
+
+
+def _encode_gsm(pcm, path):
+    # GSM 06.10 has no stdlib codec; sox does it when installed
+    subprocess.run(
+        ["sox", "-t", "raw", "-r", str(TELEPHONY_RATE), "-e", "signed", "-b", "16", "-c", "1", "-",
+         "-t", "gsm", str(path)],
+        input=pcm, check=True, capture_output=True, timeout=60,
+    )
+
+
+ENCODERS = {
+    "sln": lambda pcm, path: Path(path).write_bytes(pcm),
+    "ulaw": lambda pcm, path: Path(path).write_bytes(audioop.lin2ulaw(pcm, SAMPLE_WIDTH)),
+    "alaw": lambda pcm, path: Path(path).write_bytes(audioop.lin2alaw(pcm, SAMPLE_WIDTH)),
+    "gsm": _encode_gsm,
+}
+
+_warned = set()
+_warned_lock = threading.Lock()
+
+
+def _warn_once(key, message):
+    with _warned_lock:
+        if key in _warned:
+            return
+        _warned.add(key)
+    print(f"⚠️ {message}")
+
+
+class TelephonyAudio:
+    """
+    Turns a synthesized prompt into the files Asterisk plays without
+    transcoding: 8 kHz mono, silence trimmed, loudness normalized, encoded
+    once per format in ``formats`` (sln, ulaw, alaw, gsm) and stored next to
+    the source with the same stem (``<key>.wav`` -> ``<key>.ulaw`` ...), so
+    ``Playback(<dir>/<key>)`` picks the channel's native format and reads it
+    straight off disk. Variants are written to a temp name and renamed, so
+    concurrent renders of the same prompt are harmless.
+    """
+
+    def __init__(self, formats=("sln", "ulaw", "alaw", "gsm"), target_dbfs=-18.0, peak_dbfs=-1.0,
+                 silence_dbfs=-45.0, pad_ms=100):
+        unknown = set(formats) - set(ENCODERS)
+        if unknown:
+            raise ValueError(f"Unknown telephony formats: {', '.join(sorted(unknown))}")
+        self.formats = tuple(formats)
+        self.target_dbfs = target_dbfs
+        self.peak_dbfs = peak_dbfs
+        self.silence_dbfs = silence_dbfs
+        self.pad_ms = pad_ms
+        self._available = None
+
+    def available_formats(self):
+        # Looked up once: this runs on every cache hit
+        if self._available is None:
+            formats = self.formats
+            if "gsm" in formats and shutil.which("sox") is None:
+                _warn_once("gsm", "sox not found: .gsm prompt variants are skipped")
+                formats = tuple(f for f in formats if f != "gsm")
+            self._available = formats
+        return self._available
+
+    def variant_paths(self, source):
+        source = Path(source)
+        return {fmt: source.with_suffix(f".{fmt}") for fmt in self.available_formats()}
+
+    def missing(self, source):
+        return [fmt for fmt, path in self.variant_paths(source).items() if not path.exists()]
+
+    def prepare(self, pcm, rate, normalized=True):
+        """Source PCM -> 8 kHz, trimmed PCM (slin); loudness normalized unless ``normalized`` is False."""
+        pcm = resample(pcm, rate)
+        pcm = trim_silence(pcm, TELEPHONY_RATE, self.silence_dbfs, pad_ms=self.pad_ms)
+        return self.normalize(pcm) if normalized else pcm
+
+    def normalize(self, pcm):
+        return normalize(pcm, self.target_dbfs, self.peak_dbfs)
+
+    def render(self, source, formats=None):
+        """Write the variants of ``source`` (default: the missing ones). Returns {format: path}."""
+        formats = self.missing(source) if formats is None else formats
+        if not formats:
+            return {}
+        pcm = self.prepare(*read_pcm(source))
+        return self.write(source, pcm, formats)
+
+    def write(self, source, pcm, formats=None):
+        """Encode already prepared 8 kHz PCM as the variants of ``source``."""
+        paths = self.variant_paths(source)
+        written = {}
+        for fmt in (formats or paths):
+            path = paths[fmt]
+            tmp = path.with_name(f"{path.stem}.{os.getpid()}.{threading.get_ident()}.tmp.{fmt}")
+            try:
+                ENCODERS[fmt](pcm, tmp)
+                os.replace(tmp, path)
+                written[fmt] = path
+            finally:
+                if tmp.exists():
+                    tmp.unlink()
+        return written
+
+
+def asterisk_prompt(path):
+    """What to pass to Playback()/Background(): the absolute path without extension."""
+    path = Path(path)
+    if not path.is_absolute():
+        path = Path(settings.BASE_DIR) / path
+    return str(path.with_suffix(""))
+
+
+TELEPHONY = TelephonyAudio(
+    formats=getattr(settings, "TTS_TELEPHONY_FORMATS", ("sln", "ulaw", "alaw", "gsm")),
+    target_dbfs=getattr(settings, "TTS_TELEPHONY_TARGET_DBFS", -18.0),
+    peak_dbfs=getattr(settings, "TTS_TELEPHONY_PEAK_DBFS", -1.0),
+    silence_dbfs=getattr(settings, "TTS_TELEPHONY_SILENCE_DBFS", -45.0),
+)
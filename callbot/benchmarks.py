@@ -0,0 +1,326 @@
+import contextlib
+import io
+import itertools
+import json
+import math
+import os
+import platform
+import sqlite3
+import subprocess
+import time
+from array import array
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import RequestFactory
+
+from . import tts_pool, utils, views
+from .audio import write_wav
+from .models import CallCredential, CallLog, CallQueue, CallScript
+from .stats import percentile
+from .tts_cache import TTSCache
+from .tts_jobs import _EXECUTOR as TTS_JOB_EXECUTOR
+from .voices import VOICES
+
+SHORT_SCRIPT = "Hello, this is a reminder about your appointment tomorrow."
+LONG_SCRIPT = " ".join([
+    "Hello, this is an automated call from the customer service team.",
+    "We are calling about the order you placed with us last week.",
+    "Your package has been dispatched and should arrive within three working days.",
+    "If you are not at home, the courier will leave a card with instructions for collection.",
+    "To change the delivery address or pick a different day, press one now or visit our website.",
+    "For questions about billing, returns or anything else, stay on the line to speak to an agent.",
+] * 5)
+
+
+class StubTTSDriver:
+    """
+    Offline stand-in for TTSWorkerPool: same ``synthesize``/``list_voices``
+    interface, no pyttsx3. Writes a 22.05 kHz WAV tone lasting
+    ``audio_seconds_per_char`` per character of text, between 200ms of
+    silence (like a real engine's output, so the telephony stage has work
+    to do), after sleeping ``seconds_per_char`` to model engine cost.
+    """
+
+    VOICES = [
+        ("stub.en-US", "Stub English (US)", ["en_US"]),
+        ("stub.en-GB", "Stub English (UK)", ["en_GB"]),
+        ("stub.ur-PK", "Stub Urdu", ["ur_PK"]),
+    ]
+    RATE = 22050
+
+    def __init__(self, seconds_per_char=0.0, audio_seconds_per_char=0.06):
+        self.seconds_per_char = seconds_per_char
+        self.audio_seconds_per_char = audio_seconds_per_char
+        self.calls = 0
+        # One period of a 441 Hz tone, repeated to length
+        self._period = array("h", (int(8000 * math.sin(2 * math.pi * i / 50)) for i in range(50))).tobytes()
+        self._silence = bytes(2 * self.RATE // 5)
+
+    def synthesize(self, text, voice_id, filename):
+        self.calls += 1
+        if self.seconds_per_char:
+            time.sleep(self.seconds_per_char * len(text))
+        periods = max(1, int(self.audio_seconds_per_char * len(text) * self.RATE / 50))
+        write_wav(filename, self._silence + self._period * periods + self._silence, self.RATE)
+        return filename
+
+    def list_voices(self):
+        return list(self.VOICES)
+
+    def stats(self):
+        return {"calls": self.calls}
+
+    def shutdown(self, timeout=5):
+        pass
+
+
+@contextlib.contextmanager
+def stub_tts(root, driver=None):
+    """Route TTS (pool, voice table and cache) to a StubTTSDriver and a cache under ``root``."""
+    driver = driver or StubTTSDriver()
+    saved = tts_pool._POOL, utils.TTS_CACHE, VOICES._table, VOICES._default
+    tts_pool._POOL = driver
+    utils.TTS_CACHE = TTSCache(Path(root) / "tts", 512 * 1024 * 1024)
+    VOICES._table = None
+    try:
+        yield driver
+    finally:
+        tts_pool._POOL, utils.TTS_CACHE, VOICES._table, VOICES._default = saved
+
+
+@contextlib.contextmanager
+def scratch_database(root):
+    """Point the default connection at a fresh, migrated SQLite file under ``root``."""
+    test_settings = connection.settings_dict.setdefault("TEST", {})
+    test_settings["NAME"] = os.path.join(root, "bench.sqlite3")
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield test_settings["NAME"]
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def summarize(samples):
+    """Timing stats in ms, rounded so reports diff cleanly."""
+    total = sum(samples)
+    return {
+        "iterations": len(samples),
+        "mean_ms": round(1000 * total / len(samples), 3) if samples else 0.0,
+        "p50_ms": round(1000 * percentile(samples, 50), 3),
+        "p95_ms": round(1000 * percentile(samples, 95), 3),
+        "min_ms": round(1000 * min(samples, default=0.0), 3),
+        "max_ms": round(1000 * max(samples, default=0.0), 3),
+        "ops_per_sec": round(len(samples) / total, 1) if total else 0.0,
+    }
+
+
+def measure(fn, iterations, warmup=0):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class BenchmarkSuite:
+    """
+    Micro-benchmarks for the hot paths of the web app, run offline against
+    a scratch database (see the benchmark command):
+
+    * ``tts.*``: generate_ai_voice on a cold (miss) and warm (hit) cache, short and long scripts
+    * ``views.home`` / ``views.get_queue_logs.*`` at each of ``sizes`` rows in CallQueue and CallLog
+    * ``views.save_form``: form submission throughput
+
+    ``results`` maps a stable name (e.g. ``views.home[rows=100000]``) to the
+    stats from ``summarize``.
+    """
+
+    def __init__(self, root, sizes=(1000, 100000, 1000000), iterations=50, tts_iterations=200,
+                 save_form_iterations=500, full_max_rows=100000, log=print):
+        self.root = Path(root)
+        self.sizes = sorted(sizes)
+        self.iterations = iterations
+        self.tts_iterations = tts_iterations
+        self.save_form_iterations = save_form_iterations
+        self.full_max_rows = full_max_rows
+        self.log = log
+        self.factory = RequestFactory()
+        self.results = {}
+        self.seconds_seeding = 0.0
+
+    def run(self, only=None):
+        groups = {"tts": self.bench_tts, "views": self.bench_views, "save_form": self.bench_save_form}
+        for name, bench in groups.items():
+            if only and name not in only:
+                continue
+            bench()
+        return self.results
+
+    def record(self, name, stats):
+        self.results[name] = stats
+        self.log(f"{name:<48} p50 {stats['p50_ms']:>10.3f}ms  p95 {stats['p95_ms']:>10.3f}ms  "
+                 f"{stats['ops_per_sec']:>10.1f}/s")
+
+    # -- TTS --------------------------------------------------------------
+
+    def bench_tts(self):
+        for label, text in (("short", SHORT_SCRIPT), ("long", LONG_SCRIPT)):
+            # Cold: every call misses (distinct text, empty cache) and renders + stores a file
+            cache = TTSCache(self.root / f"tts-cold-{label}", 512 * 1024 * 1024)
+            counter = itertools.count()
+            with _patched(utils, "TTS_CACHE", cache):
+                self.record(f"tts.generate_ai_voice.cold[{label}]", measure(
+                    lambda: utils.generate_ai_voice(f"{text} #{next(counter)}", "USA"), self.tts_iterations,
+                ))
+            # Warm: the same prompt again, answered from the cache
+            cache = TTSCache(self.root / f"tts-warm-{label}", 512 * 1024 * 1024)
+            with _patched(utils, "TTS_CACHE", cache):
+                self.record(f"tts.generate_ai_voice.warm[{label}]", measure(
+                    lambda: utils.generate_ai_voice(text, "USA"), self.tts_iterations, warmup=1,
+                ))
+
+    # -- listing views ----------------------------------------------------
+
+    def bench_views(self):
+        for size in self.sizes:
+            started = time.perf_counter()
+            self.seed(size)
+            self.seconds_seeding += time.perf_counter() - started
+            self.log(f"-- {size} rows in CallQueue and CallLog (seeded in {time.perf_counter() - started:.1f}s)")
+            suffix = f"[rows={size}]"
+
+            self.record(f"views.home{suffix}", measure(lambda: views.home(self._get("/")), self.iterations, warmup=1))
+
+            snapshot = views.get_queue_logs(self.factory.get("/get_queue_logs/"))
+            etag = snapshot["ETag"]
+            cursor = json.loads(snapshot.content)["cursor"]
+            self.record(f"views.get_queue_logs.snapshot{suffix}", measure(
+                lambda: views.get_queue_logs(self._get("/get_queue_logs/")), self.iterations,
+            ))
+            self.record(f"views.get_queue_logs.delta{suffix}", measure(
+                lambda: views.get_queue_logs(self._get("/get_queue_logs/", {"cursor": cursor})), self.iterations,
+            ))
+            self.record(f"views.get_queue_logs.not_modified{suffix}", measure(
+                lambda: views.get_queue_logs(self._get("/get_queue_logs/", HTTP_IF_NONE_MATCH=etag)), self.iterations,
+            ))
+            if size <= self.full_max_rows:
+                self.record(f"views.get_queue_logs.full{suffix}", measure(
+                    lambda: views.get_queue_logs(self._get("/get_queue_logs/", {"full": "1"})),
+                    max(1, self.iterations // 10),
+                ))
+
+    def seed(self, size, batch=10000):
+        """Top CallQueue and CallLog up to ``size`` rows each."""
+        scripts = self._scripts()
+        statuses = ["Queued", "Completed", "Completed", "Completed", "DeadLetter", "Running"]
+        with transaction.atomic():
+            have = CallQueue.objects.count()
+            for start in range(have, size, batch):
+                CallQueue.objects.bulk_create([
+                    CallQueue(script=scripts[i % len(scripts)], status=statuses[i % len(statuses)])
+                    for i in range(start, min(size, start + batch))
+                ])
+            have = CallLog.objects.count()
+            for start in range(have, size, batch):
+                CallLog.objects.bulk_create([
+                    CallLog(user_script=scripts[i % len(scripts)], ai_response=f"AI reading: {SHORT_SCRIPT}",
+                            audio_path=f"media/tts/{i % 256:02x}/{i:064x}.mp3")
+                    for i in range(start, min(size, start + batch))
+                ])
+
+    def _scripts(self):
+        scripts = list(CallScript.objects.filter(country__in=("USA", "UK", "Pakistan"))[:3])
+        if not scripts:
+            credential = CallCredential.objects.create(ami_host="127.0.0.1", ami_user="bench", ami_pass="bench")
+            scripts = [
+                CallScript.objects.create(country=country, script_text=SHORT_SCRIPT, credential=credential)
+                for country in ("USA", "UK", "Pakistan")
+            ]
+        return scripts
+
+    # -- form submission --------------------------------------------------
+
+    def bench_save_form(self):
+        # ScriptForm leaves CallScript.credential at its model default, which must exist
+        default = CallScript._meta.get_field("credential").default
+        CallCredential.objects.get_or_create(pk=default, defaults={
+            "ami_host": "127.0.0.1", "ami_user": "bench", "ami_pass": "bench",
+        })
+        counter = itertools.count()
+
+        def submit():
+            n = next(counter)
+            response = views.save_form(self.factory.post("/save_form/", {
+                "ami_host": "127.0.0.1", "ami_port": "5038", "ami_user": f"bench{n}", "ami_pass": "bench",
+                "sip_endpoint": "", "country": "USA", "script_text": f"{SHORT_SCRIPT} #{n % 20}",
+            }))
+            if response.status_code != 202:
+                raise RuntimeError(f"save_form returned {response.status_code}: {response.content[:200]!r}")
+
+        # save_form prints per request; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            stats = measure(submit, self.save_form_iterations, warmup=1)
+            # Let the background TTS jobs finish so they don't bleed into the next run
+            TTS_JOB_EXECUTOR.submit(lambda: None).result()
+        self.record("views.save_form", stats)
+
+    # -- helpers ----------------------------------------------------------
+
+    def _get(self, path, data=None, **extra):
+        return self.factory.get(path, data or {}, HTTP_ACCEPT_ENCODING="gzip", **extra)
+
+    def metadata(self):
+        return {
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "sizes": self.sizes,
+            "iterations": self.iterations,
+            "tts_iterations": self.tts_iterations,
+            "save_form_iterations": self.save_form_iterations,
+            "seconds_seeding": round(self.seconds_seeding, 1),
+        }
+
+
+def compare(old, new):
+    """Lines of p50 / ops-per-second change for results present in both reports."""
+    lines = []
+    for name in sorted(set(old) & set(new)):
+        before, after = old[name]["p50_ms"], new[name]["p50_ms"]
+        change = 100 * (after - before) / before if before else 0.0
+        lines.append(f"{name:<48} p50 {before:>10.3f}ms -> {after:>10.3f}ms ({change:+6.1f}%)")
+    for name in sorted(set(new) - set(old)):
+        lines.append(f"{name:<48} new")
+    for name in sorted(set(old) - set(new)):
+        lines.append(f"{name:<48} gone")
+    return lines
+
+
+@contextlib.contextmanager
+def _patched(obj, name, value):
+    saved = getattr(obj, name)
+    setattr(obj, name, value)
+    try:
+        yield value
+    finally:
+        setattr(obj, name, saved)
+
@@ -0,0 +1,225 @@
+import asyncio
+import time
+from collections import deque
+
+from asgiref.sync import sync_to_async
+
+from .ami_async import credential_label
+from .metrics import DIALER_CALLS, DIALER_IN_FLIGHT, TRUNK_CALLS, TRUNK_CHANNELS_IN_USE, TRUNK_LIMIT, TRUNK_WAIT_SECONDS
+
+
+class TokenBucket:
+    """Calls-per-second pacing: ``rate`` tokens/s, bursts of up to ``capacity``."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def resize(self, rate, capacity=None):
+        self._refill()
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self.tokens = min(self.tokens, self.capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Take one token, sleeping until one is available. Returns seconds waited."""
+        waited = 0.0
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                delay = (1 - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+                self._refill()
+            self.tokens -= 1
+        return waited
+
+
+class TrunkLimiter:
+    """
+    Per-credential channel cap plus CPS token bucket; a limit of 0 (or less)
+    means none. ``label`` names the trunk in /metrics (callbot_trunk_*).
+
+    The limits hold within one dialer process: every worker keeps its own
+    limiter, so N workers dialing the same trunk can reach N times them.
+    """
+
+    def __init__(self, max_channels, max_cps, label=""):
+        self.label = label
+        self.max_channels = 0
+        self.max_cps = 0
+        self.bucket = None
+        self.in_flight = 0
+        self.channel_waits = 0
+        self.channel_wait_seconds = 0.0
+        self.token_waits = 0
+        self.token_wait_seconds = 0.0
+        self._waiters = []
+        self._in_use = TRUNK_CHANNELS_IN_USE.labels(credential=label)
+        self.resize(max_channels, max_cps)
+
+    def resize(self, max_channels, max_cps):
+        """Apply edited limits in place; calls already holding a channel keep it."""
+        if max_cps > 0:
+            if self.bucket is None:
+                self.bucket = TokenBucket(max_cps)
+            elif max_cps != self.max_cps:
+                self.bucket.resize(max_cps)
+        else:
+            self.bucket = None
+        self.max_channels, self.max_cps = max_channels, max_cps
+        TRUNK_LIMIT.labels(credential=self.label, limit="channels").set(max(max_channels, 0))
+        TRUNK_LIMIT.labels(credential=self.label, limit="cps").set(max(max_cps, 0))
+        self._wake()
+
+    def _has_channel(self):
+        return self.max_channels <= 0 or self.in_flight < self.max_channels
+
+    def _wake(self):
+        # Waiters re-check the limit themselves, so waking all of them is always safe
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def acquire(self):
+        """Take a channel, then a CPS token; release() the channel when the call ends."""
+        started = time.monotonic()
+        while not self._has_channel():
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            await waiter
+        self.in_flight += 1
+        self._in_use.set(self.in_flight)
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            self.channel_waits += 1
+            self.channel_wait_seconds += waited
+            TRUNK_WAIT_SECONDS.labels(credential=self.label, limit="channels").inc(waited)
+        try:
+            if self.bucket is not None:
+                waited = await self.bucket.acquire()
+                if waited:
+                    self.token_waits += 1
+                    self.token_wait_seconds += waited
+                    TRUNK_WAIT_SECONDS.labels(credential=self.label, limit="cps").inc(waited)
+        except BaseException:
+            self.release()
+            raise
+        TRUNK_CALLS.labels(credential=self.label).inc()
+
+    def release(self):
+        self.in_flight -= 1
+        self._in_use.set(self.in_flight)
+        self._wake()
+
+    def stats(self):
+        return {
+            "max_channels": self.max_channels,
+            "max_cps": self.max_cps,
+            "in_flight": self.in_flight,
+            "channel_utilization": self.in_flight / self.max_channels if self.max_channels > 0 else 0.0,
+            "channel_waits": self.channel_waits,
+            "channel_wait_seconds": self.channel_wait_seconds,
+            "token_waits": self.token_waits,
+            "token_wait_seconds": self.token_wait_seconds,
+        }
+
+
+class Dialer:
+    """
+    Runs up to ``concurrency`` calls at once from an asyncio.Queue of
+    CallQueue rows. Each call first takes a channel on its credential's trunk
+    and a CPS token, so one busy trunk can't starve the others or exceed the
+    limits stored on its CallCredential.
+
+    ``process_call(credential, queue_obj)`` owns the row once it is called.
+    If anything fails before that (no credential, a bad limiter),
+    ``on_error(queue_obj, exc)`` gets the row back out of Running.
+    """
+
+    def __init__(self, process_call, concurrency=20, on_error=None):
+        self.process_call = process_call
+        self.on_error = on_error
+        self.concurrency = concurrency
+        self._slots = asyncio.Semaphore(concurrency)
+        self._limiters = {}
+        self._tasks = set()
+        self._finished = deque(maxlen=10000)
+        self.started = 0
+        self.completed = 0
+        self.errors = 0
+
+    def limiter_for(self, credential):
+        limiter = self._limiters.get(credential.pk)
+        if limiter is None:
+            label = credential_label((credential.ami_host, credential.ami_port, credential.ami_user))
+            limiter = self._limiters[credential.pk] = TrunkLimiter(credential.max_channels, credential.max_cps, label)
+        elif (limiter.max_channels, limiter.max_cps) != (credential.max_channels, credential.max_cps):
+            # Edited limits: a fresh limiter would forget the calls still holding channels
+            limiter.resize(credential.max_channels, credential.max_cps)
+        return limiter
+
+    async def run(self, queue, default_credential=None):
+        while True:
+            queue_obj = await queue.get()
+            await self._slots.acquire()
+            task = asyncio.create_task(self._dial(queue_obj, default_credential))
+            self._tasks.add(task)
+            task.add_done_callback(lambda t: (self._tasks.discard(t), queue.task_done()))
+
+    async def drain(self):
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _dial(self, queue_obj, default_credential):
+        handed_over = False
+        try:
+            credential = await sync_to_async(lambda: queue_obj.script.credential)() or default_credential
+            if credential is None:
+                raise ValueError("the script has no credential and this worker has no default")
+            limiter = self.limiter_for(credential)
+
+            await limiter.acquire()
+            try:
+                self.started += 1
+                DIALER_IN_FLIGHT.inc()
+                handed_over = True
+                await self.process_call(credential, queue_obj)
+                self.completed += 1
+                DIALER_CALLS.labels(outcome="completed").inc()
+            finally:
+                DIALER_IN_FLIGHT.dec()
+                limiter.release()
+        except Exception as e:
+            self.errors += 1
+            DIALER_CALLS.labels(outcome="failed" if handed_over else "not_started").inc()
+            if not handed_over and self.on_error is not None:
+                try:
+                    await self.on_error(queue_obj, e)
+                except Exception as e2:
+                    print(f"❌ Could not release call {queue_obj.pk} after {e}: {e2}")
+        finally:
+            self._finished.append(time.monotonic())
+            self._slots.release()
+
+    def stats(self, window=60):
+        now = time.monotonic()
+        recent = sum(1 for t in self._finished if now - t <= window)
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": len(self._tasks),
+            "started": self.started,
+            "completed": self.completed,
+            "errors": self.errors,
+            "calls_per_second": recent / window,
+            "trunks": {pk: limiter.stats() for pk, limiter in self._limiters.items()},
+        }
@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import math
+import multiprocessing
+import signal
+import time
+
+# Imported by freshly spawned worker processes before Django is set up, so
+# nothing from Django or the callbot app is imported at module level.
+
+logger = logging.getLogger(__name__)
+
+
+def worker_main(index, shard_count, stop_event, shard_by_credential=True, worker_id=None):
+    """Entry point of one dialer worker process (shard ``index`` of ``shard_count.value``)."""
+    import django
+    django.setup()
+    from callbot.utils import queue_worker
+
+    # Ctrl-C reaches the whole process group; only the supervisor decides when to stop.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    async def main():
+        stop = asyncio.Event()
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+        except (NotImplementedError, AttributeError):
+            pass  # Windows: rely on stop_event only
+
+        async def watch_supervisor():
+            while not stop_event.is_set():
+                await asyncio.sleep(0.5)
+            stop.set()
+
+        watcher = asyncio.create_task(watch_supervisor())
+        shard = (lambda: (index, shard_count.value)) if shard_by_credential else None
+        await queue_worker(shard=shard, worker_id=worker_id, stop=stop)
+        watcher.cancel()
+
+    asyncio.run(main())
+
+
+def queue_pressure():
+    """(Queued rows that are due, seconds the longest-waiting one has been due) from the shared DB."""
+    from django.db import close_old_connections
+    from django.db.models import Count, Min
+    from django.utils import timezone
+    from callbot.models import CallQueue
+
+    close_old_connections()
+    now = timezone.now()
+    # Future-scheduled calls aren't backlog; rows the scheduler pushed to their
+    # next calling window drop out the same way.
+    stats = CallQueue.objects.filter(status="Queued", not_before__lte=now).aggregate(
+        depth=Count("id"), oldest=Min("not_before")
+    )
+    lag = (now - stats["oldest"]).total_seconds() if stats["oldest"] else 0.0
+    return stats["depth"], lag
+
+
+def settle_leftover_calls(worker_id):
+    """
+    Clean up after a killed worker: claimed (Running) rows go straight back to
+    Queued, in-progress ones through retries.settle_orphaned. Returns
+    (rows re-queued, [(id, status)] of the in-progress calls settled).
+    """
+    from django.db import close_old_connections
+    from callbot.leases import release_leases
+    from callbot.models import CallQueue
+    from callbot.retries import settle_orphaned
+
+    close_old_connections()
+    released = release_leases(worker_id)
+    settled = []
+    for queue_obj in CallQueue.objects.filter(lease_owner=worker_id, status__in=("Dialing", "Ringing", "Answered")):
+        settle_orphaned(queue_obj, f"dialer worker {worker_id} was killed")
+        settled.append((queue_obj.pk, queue_obj.status))
+    return released, settled
+
+
+class DialerSupervisor:
+    """
+    Keeps between ``min_workers`` and ``max_workers`` dialer processes on
+    this node. Every ``interval`` seconds it sizes the pool to queue depth
+    (``calls_per_worker`` Queued rows per process) and adds a worker while
+    the oldest Queued call is older than ``max_lag`` seconds. It scales down
+    one worker at a time once the pool has been oversized for
+    ``scale_down_after`` seconds.
+
+    With ``shard_by_credential`` worker i only claims credentials in shard i
+    of the current pool size, which keeps each trunk's AMI sessions and
+    limits in one process; turn it off when a single trunk needs more than
+    one worker. Nodes don't coordinate: leases make overlapping shards on
+    different nodes safe, they just compete for the same rows.
+
+    CallCredential.max_channels / max_cps are enforced per dialer process.
+    Each node, and each worker under ``shard_by_credential=False``, applies
+    them on its own, so the trunk sees up to that many times the limit; set
+    them to the trunk's capacity divided by the processes that can dial it.
+    While the pool is resharded a departing worker can still be finishing
+    calls on a trunk its successor has started dialing.
+    """
+
+    def __init__(self, min_workers=1, max_workers=4, calls_per_worker=100, max_lag=30,
+                 interval=5, scale_down_after=60, drain_timeout=60, shard_by_credential=True, log=print):
+        self.min_workers = min_workers
+        self.max_workers = max(max_workers, min_workers)
+        self.calls_per_worker = calls_per_worker
+        self.max_lag = max_lag
+        self.interval = interval
+        self.scale_down_after = scale_down_after
+        self.drain_timeout = drain_timeout
+        self.shard_by_credential = shard_by_credential
+        self.log = log
+        self._ctx = multiprocessing.get_context("spawn")
+        self._shard_count = self._ctx.Value("i", 0)
+        self._workers = []  # index -> (process, stop_event)
+        self._worker_ids = {}  # process -> the lease owner id it claims rows under
+        self._draining = []
+        self._stopping = False
+        self._oversized_since = None
+
+    # -- sizing -----------------------------------------------------------
+
+    def desired_workers(self, depth, lag, current):
+        want = math.ceil(depth / self.calls_per_worker) if self.calls_per_worker else current
+        if lag > self.max_lag and depth:
+            want = max(want, current + 1)
+        return min(max(want, self.min_workers), self.max_workers)
+
+    # -- lifecycle --------------------------------------------------------
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        self._scale_to(self.min_workers)
+        try:
+            while not self._stopping:
+                time.sleep(self.interval)
+                if self._stopping:
+                    break
+                self._replace_dead()
+                self._reap_drained()
+                try:
+                    depth, lag = queue_pressure()
+                except Exception as e:
+                    logger.error("Could not read queue depth: %s", e)
+                    continue
+                self._autoscale(depth, lag)
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        self.log(f"Draining {len(self._workers)} dialer worker(s)...")
+        for _, stop_event in self._workers:
+            stop_event.set()
+        deadline = time.monotonic() + self.drain_timeout
+        for proc, _ in self._workers + self._draining:
+            proc.join(max(deadline - time.monotonic(), 0))
+            if proc.is_alive():
+                # SIGKILL: SIGTERM only asks the worker to drain again
+                logger.warning("Worker %s did not drain in %ss, killing it", proc.pid, self.drain_timeout)
+                proc.kill()
+                proc.join(5)
+                self._settle_leftovers(proc)
+        self._workers = []
+        self._draining = []
+        self._worker_ids = {}
+
+    def _settle_leftovers(self, proc):
+        worker_id = self._worker_ids.get(proc)
+        if not worker_id:
+            return
+        try:
+            released, settled = settle_leftover_calls(worker_id)
+        except Exception:
+            # Their leases stop being renewed, so another worker's lease keeper gets to them
+            logger.exception("Could not settle calls left by worker %s (%s)", proc.pid, worker_id)
+            return
+        if released or settled:
+            logger.warning(
+                "Worker %s (%s) left %d claimed call(s), re-queued, and %d in progress: %s "
+                "(answered calls are dead-lettered, the rest retried)",
+                proc.pid, worker_id, released, len(settled),
+                ", ".join(f"{pk} {status}" for pk, status in settled) or "none",
+            )
+
+    def _request_stop(self, signum, frame):
+        self._stopping = True
+
+    def _autoscale(self, depth, lag):
+        current = len(self._workers)
+        want = self.desired_workers(depth, lag, current)
+        if want > current:
+            self._oversized_since = None
+            self.log(f"Scaling up {current} -> {want} (queued={depth}, lag={lag:.0f}s)")
+            self._scale_to(want)
+        elif want < current:
+            now = time.monotonic()
+            if self._oversized_since is None:
+                self._oversized_since = now
+            elif now - self._oversized_since >= self.scale_down_after:
+                self.log(f"Scaling down {current} -> {current - 1} (queued={depth}, lag={lag:.0f}s)")
+                self._scale_to(current - 1)
+                self._oversized_since = now
+        else:
+            self._oversized_since = None
+
+    def _scale_to(self, n):
+        while len(self._workers) < n:
+            index = len(self._workers)
+            self._workers.append(self._spawn(index))
+            self._shard_count.value = len(self._workers)
+        while len(self._workers) > n:
+            # Shrink the shard count first so the survivors already cover the
+            # departing worker's credentials while it drains.
+            self._shard_count.value = len(self._workers) - 1
+            proc, stop_event = self._workers.pop()
+            stop_event.set()
+            self._draining.append((proc, stop_event))
+
+    def _spawn(self, index):
+        from callbot.leases import new_worker_id
+
+        stop_event = self._ctx.Event()
+        # Chosen here so the supervisor can tell which rows a killed worker left behind
+        worker_id = f"{new_worker_id()}:dialer-{index}"
+        proc = self._ctx.Process(
+            target=worker_main,
+            args=(index, self._shard_count, stop_event, self.shard_by_credential, worker_id),
+            name=f"dialer-{index}",
+        )
+        proc.start()
+        self._worker_ids[proc] = worker_id
+        self.log(f"Started dialer worker {index} (pid {proc.pid})")
+        return proc, stop_event
+
+    def _replace_dead(self):
+        for index, (proc, stop_event) in enumerate(self._workers):
+            if not proc.is_alive():
+                logger.warning("Dialer worker %s (pid %s) exited with %s, restarting", index, proc.pid, proc.exitcode)
+                self._worker_ids.pop(proc, None)
+                self._workers[index] = self._spawn(index)
+
+    def _reap_drained(self):
+        for proc, _ in self._draining:
+            if not proc.is_alive():
+                self._worker_ids.pop(proc, None)
+        self._draining = [(p, e) for p, e in self._draining if p.is_alive()]
@@ -0,0 +1,177 @@
+import asyncio
+import itertools
+import random
+import threading
+import time
+
+from .ami_async import AMIMessage
+
+
+def _packet(**keys):
+    return ("".join(f"{k.replace('_', '-')}: {v}\r\n" for k, v in keys.items()) + "\r\n").encode("utf-8")
+
+
+class FakeAMIServer:
+    """
+    Stand-in for Asterisk's manager interface, for load tests and local
+    development. Speaks Login, Logoff, Ping and Originate. An Async Originate
+    plays out a call over the event stream: Newstate Ringing, then either
+    OriginateResponse Failure + Hangup (no answer) or Newstate Up +
+    OriginateResponse Success and, after the call's duration, Hangup.
+
+    ``latency`` delays every Response, ``failure_rate`` is the share of
+    Originates rejected outright, ``no_answer_rate`` the share of calls that
+    ring out, and ring/call durations are drawn uniformly from the given
+    (min, max) seconds. Events go to every session logged in with events on,
+    like Asterisk.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, secret=None, latency=0.002, failure_rate=0.0,
+                 no_answer_rate=0.0, ring_seconds=(0.05, 0.2), call_seconds=(0.2, 1.0), seed=None):
+        self.host = host
+        self.port = port
+        self.secret = secret
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.no_answer_rate = no_answer_rate
+        self.ring_seconds = ring_seconds
+        self.call_seconds = call_seconds
+        self.random = random.Random(seed)
+        self.originates = {}  # ActionID -> wall-clock time the Originate arrived
+        self.counts = {"logins": 0, "login_failures": 0, "originates": 0, "rejected": 0,
+                       "answered": 0, "no_answer": 0, "events": 0}
+        self._server = None
+        self._sessions = set()
+        self._event_sessions = set()
+        self._uniqueids = itertools.count(1)
+        self._loop = None
+        self._thread = None
+
+    # -- lifecycle --------------------------------------------------------
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._session, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        for writer in list(self._sessions):
+            writer.close()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        # Sessions mid-reply and calls still playing out
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start_in_thread(self):
+        """Run on a private event loop in a daemon thread; returns once listening."""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="fake-ami", daemon=True)
+        self._thread.start()
+        ready.wait(10)
+        return self
+
+    def stop_thread(self):
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result(10)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(10)
+
+    # -- protocol ---------------------------------------------------------
+
+    async def _session(self, reader, writer):
+        self._sessions.add(writer)
+        writer.write(b"Asterisk Call Manager/5.0.1\r\n")
+        logged_in = False
+        try:
+            while True:
+                data = await reader.readuntil(b"\r\n\r\n")
+                keys = AMIMessage.parse(data).keys
+                action = keys.get("Action", "").lower()
+                action_id = keys.get("ActionID", "")
+                if action == "login":
+                    logged_in = self.secret is None or keys.get("Secret") == self.secret
+                    if logged_in:
+                        self.counts["logins"] += 1
+                        if keys.get("Events", "on").lower() != "off":
+                            self._event_sessions.add(writer)
+                        await self._reply(writer, Response="Success", ActionID=action_id, Message="Authentication accepted")
+                    else:
+                        self.counts["login_failures"] += 1
+                        await self._reply(writer, Response="Error", ActionID=action_id, Message="Authentication failed")
+                elif not logged_in:
+                    await self._reply(writer, Response="Error", ActionID=action_id, Message="Permission denied")
+                elif action == "ping":
+                    await self._reply(writer, Response="Success", ActionID=action_id, Ping="Pong", Timestamp=f"{time.time():.6f}")
+                elif action == "logoff":
+                    await self._reply(writer, Response="Goodbye", ActionID=action_id, Message="Thanks for all the fish.")
+                    break
+                elif action == "originate":
+                    # Handled as a task so pipelined actions behind it aren't held up
+                    asyncio.create_task(self._originate(writer, keys))
+                else:
+                    await self._reply(writer, Response="Error", ActionID=action_id, Message="Invalid/unknown command")
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._sessions.discard(writer)
+            self._event_sessions.discard(writer)
+            writer.close()
+
+    async def _reply(self, writer, **keys):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        writer.write(_packet(**keys))
+
+    def _emit(self, **keys):
+        self.counts["events"] += 1
+        data = _packet(**keys)
+        for writer in list(self._event_sessions):
+            writer.write(data)
+
+    async def _originate(self, writer, keys):
+        action_id = keys.get("ActionID", "")
+        self.originates[action_id] = time.time()
+        self.counts["originates"] += 1
+        if self.random.random() < self.failure_rate:
+            self.counts["rejected"] += 1
+            await self._reply(writer, Response="Error", ActionID=action_id, Message="Originate failed")
+            return
+        await self._reply(writer, Response="Success", ActionID=action_id, Message="Originate successfully queued")
+        if keys.get("Async", "").lower() not in ("true", "yes", "1"):
+            return
+
+        uniqueid = keys.get("ChannelId") or f"fake-{next(self._uniqueids)}"
+        channel = f"{keys.get('Channel', 'Local/s')}-{uniqueid}"
+        self._emit(Event="Newstate", Channel=channel, ChannelState=5, ChannelStateDesc="Ringing", Uniqueid=uniqueid)
+        await asyncio.sleep(self.random.uniform(*self.ring_seconds))
+        if self.random.random() < self.no_answer_rate:
+            self.counts["no_answer"] += 1
+            self._emit(Event="Hangup", Channel=channel, Uniqueid=uniqueid, Cause=19, Cause_txt="No answer")
+            self._emit(Event="OriginateResponse", ActionID=action_id, Response="Failure", Channel=channel,
+                       Reason=3, Uniqueid="<null>")
+            return
+        self.counts["answered"] += 1
+        self._emit(Event="Newstate", Channel=channel, ChannelState=6, ChannelStateDesc="Up", Uniqueid=uniqueid)
+        self._emit(Event="OriginateResponse", ActionID=action_id, Response="Success", Channel=channel,
+                   Reason=4, Uniqueid=uniqueid)
+        await asyncio.sleep(self.random.uniform(*self.call_seconds))
+        self._emit(Event="Hangup", Channel=channel, Uniqueid=uniqueid, Cause=16, Cause_txt="Normal Clearing")
+
+    def stats(self):
+        return {**self.counts, "sessions": len(self._sessions)}
@@ -1,5 +1,8 @@
 from django import forms
+from django.conf import settings
+from django.template.defaultfilters import filesizeformat
 from .models import CallCredential, CallScript
+from .script_templates import parse_template
 
 class CredentialForm(forms.ModelForm):
     class Meta:
@@ -9,7 +12,17 @@ class CredentialForm(forms.ModelForm):
             'ami_pass': forms.PasswordInput(attrs={'placeholder': 'Enter AMI Password'}),
         }
 
-class ScriptForm(forms.ModelForm):
+class TemplateScriptMixin:
+    # script_text may be a template: "Hello {name}, you owe {amount:number}" (callbot.script_templates)
+    def clean_script_text(self):
+        text = self.cleaned_data['script_text']
+        try:
+            parse_template(text)
+        except ValueError as e:
+            raise forms.ValidationError(str(e))
+        return text
+
+class ScriptForm(TemplateScriptMixin, forms.ModelForm):
     class Meta:
         model = CallScript
         fields = ['country', 'script_text']
@@ -21,7 +34,7 @@ class ScriptForm(forms.ModelForm):
             }),
         }
 
-class CallScriptForm(forms.ModelForm):
+class CallScriptForm(TemplateScriptMixin, forms.ModelForm):
     credential = forms.ModelChoiceField(
         queryset=CallCredential.objects.all(),
         label="Select Credential",
@@ -33,3 +46,17 @@ class CallScriptForm(forms.ModelForm):
     class Meta:
         model = CallScript
         fields = ['country', 'script_text', 'credential', 'exten', 'caller_id']
+
+class CampaignImportForm(forms.Form):
+    file = forms.FileField(label="CSV / JSONL file (exten, caller_id, country, script, var_<name>...)")
+    campaign = forms.CharField(label="Campaign", max_length=100, required=False)
+
+    # Uploads are imported inside the request; bigger files go through `manage.py import_campaign`
+    def clean_file(self):
+        upload = self.cleaned_data['file']
+        limit = getattr(settings, 'CAMPAIGN_IMPORT_MAX_UPLOAD_BYTES', 5 * 1024 * 1024)
+        if upload.size > limit:
+            raise forms.ValidationError(
+                f"File is larger than {filesizeformat(limit)}; import it with `manage.py import_campaign`."
+            )
+        return upload
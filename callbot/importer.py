@@ -0,0 +1,197 @@
+import codecs
+import csv
+import json
+import re
+from datetime import timezone
+from itertools import islice
+
+from django.utils.dateparse import parse_datetime
+
+from .models import CallQueue, CallScript
+
+EXTEN_RE = re.compile(r"^\+?[0-9*#]{2,20}$")
+VARIABLE_RE = re.compile(r"^\w{1,50}$")
+VARIABLE_PREFIX = "var_"
+MAX_VARIABLE_LENGTH = 200
+FORMATS = ("csv", "jsonl")
+
+
+class ImportFileError(ValueError):
+    """The file itself can't be read (not UTF-8, broken CSV quoting); nothing after ``line`` was imported."""
+
+    def __init__(self, message, line):
+        super().__init__(f"{message} (line {line})")
+        self.line = line
+
+
+class RejectedRow:
+    def __init__(self, line, reason, row):
+        self.line = line
+        self.reason = reason
+        self.row = row
+
+    def as_dict(self):
+        return {"line": self.line, "reason": self.reason, "row": self.row}
+
+
+class ImportResult:
+    def __init__(self, keep_rejects=100):
+        self.processed = 0
+        self.created = 0
+        self.rejected = 0
+        self.keep_rejects = keep_rejects
+        self.rejects = []
+
+    def reject(self, rejected_row):
+        self.rejected += 1
+        if len(self.rejects) < self.keep_rejects:
+            self.rejects.append(rejected_row)
+
+    def as_dict(self):
+        return {
+            "processed": self.processed,
+            "created": self.created,
+            "rejected": self.rejected,
+            "rejected_rows": [r.as_dict() for r in self.rejects],
+        }
+
+
+def guess_format(filename):
+    return "jsonl" if filename.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+def iter_rows(fileobj, fmt):
+    """
+    Yield (line_number, dict) from a binary file object one line at a time,
+    so a 100k-row campaign never sits in memory as a whole.
+
+    A bad row is yielded with an ``__error__``; an unreadable file raises
+    ImportFileError once the reader gets to the bad bytes.
+    """
+    lines = codecs.iterdecode(fileobj, "utf-8-sig")
+    line_no = 0
+    try:
+        if fmt == "jsonl":
+            for line_no, line in enumerate(lines, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield line_no, {"__error__": f"invalid JSON: {e}"}
+                    continue
+                yield line_no, row if isinstance(row, dict) else {"__error__": "expected a JSON object"}
+        else:
+            reader = csv.DictReader(lines)
+            for row in reader:
+                line_no = reader.line_num
+                yield line_no, row
+    except UnicodeDecodeError as e:
+        raise ImportFileError(f"file is not UTF-8 text: {e.reason}", line_no + 1) from e
+    except csv.Error as e:
+        raise ImportFileError(f"malformed CSV: {e}", line_no + 1) from e
+
+
+def _script_ref(row):
+    return str(row.get("script") or row.get("script_id") or "").strip()
+
+
+def _variables(row):
+    """Template values from ``var_<name>`` columns/keys and a JSONL ``variables`` object."""
+    variables = row.get("variables") or {}
+    if not isinstance(variables, dict):
+        raise ValueError("variables must be a JSON object")
+    variables = dict(variables)
+    for key, value in row.items():
+        if key and key.startswith(VARIABLE_PREFIX) and value not in (None, ""):
+            variables[key[len(VARIABLE_PREFIX):]] = value
+    for name, value in variables.items():
+        if not VARIABLE_RE.match(str(name)):
+            raise ValueError(f"invalid variable name {name!r}")
+        if isinstance(value, (dict, list)) or len(str(value)) > MAX_VARIABLE_LENGTH:
+            raise ValueError(f"variable {name} must be text of at most {MAX_VARIABLE_LENGTH} characters")
+    return {str(name): str(value) for name, value in variables.items()}
+
+
+def _clean(row, known_scripts):
+    """Return (CallQueue kwargs, None) or (None, reason)."""
+    if "__error__" in row:
+        return None, row["__error__"]
+    exten = str(row.get("exten") or "").strip()
+    caller_id = str(row.get("caller_id") or "").strip()
+    country = str(row.get("country") or "").strip()
+    script_ref = _script_ref(row)
+    if not EXTEN_RE.match(exten):
+        return None, "invalid exten"
+    if len(caller_id) > 50:
+        return None, "caller_id longer than 50 characters"
+    if len(country) > 50:
+        return None, "country longer than 50 characters"
+    if not script_ref.isdigit() or int(script_ref) not in known_scripts:
+        return None, "unknown script"
+    fields = {"script_id": int(script_ref), "exten": exten, "caller_id": caller_id, "country": country}
+
+    # Optional template values for the script's {fields}: var_<name> columns, or a "variables" object in JSONL
+    try:
+        fields["variables"] = _variables(row)
+    except ValueError as e:
+        return None, str(e)
+
+    # Optional scheduling columns: not_before (ISO 8601, UTC if no offset) and priority.
+    not_before = str(row.get("not_before") or "").strip()
+    if not_before:
+        try:
+            when = parse_datetime(not_before)
+        except ValueError:
+            when = None
+        if when is None:
+            return None, "invalid not_before"
+        fields["not_before"] = when if when.tzinfo else when.replace(tzinfo=timezone.utc)
+    priority = str(row.get("priority") or "").strip()
+    if priority:
+        try:
+            fields["priority"] = int(priority)
+        except ValueError:
+            return None, "invalid priority"
+        if not -32768 <= fields["priority"] <= 32767:
+            return None, "priority out of range"
+    return fields, None
+
+
+def import_calls(rows, campaign="", batch_size=1000, result=None, progress=None, on_reject=None):
+    """
+    Validate ``rows`` (an iter_rows() iterator) a chunk at a time and insert
+    the valid ones as Queued CallQueue rows with one bulk_create per chunk.
+    ``progress(result)`` runs after every chunk and ``on_reject(RejectedRow)``
+    for every bad row.
+    """
+    result = result or ImportResult()
+    known_scripts = set()
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            break
+        # One query per chunk to learn which script refs exist.
+        refs = {int(ref) for _, r in chunk if (ref := _script_ref(r)).isdigit()}
+        missing = refs - known_scripts
+        if missing:
+            known_scripts.update(CallScript.objects.filter(pk__in=missing).values_list("pk", flat=True))
+
+        batch = []
+        for line_no, row in chunk:
+            result.processed += 1
+            fields, reason = _clean(row, known_scripts)
+            if reason:
+                rejected = RejectedRow(line_no, reason, row)
+                result.reject(rejected)
+                if on_reject:
+                    on_reject(rejected)
+                continue
+            batch.append(CallQueue(campaign=campaign, **fields))
+        if batch:
+            CallQueue.objects.bulk_create(batch, batch_size=batch_size)
+            result.created += len(batch)
+        if progress:
+            progress(result)
+    return result
@@ -0,0 +1,78 @@
+import os
+import socket
+import uuid
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .ami_events import ACTIVE
+from .models import CallQueue
+from .retries import settle_orphaned
+
+# Every status a worker holds a row in: claimed (Running) or on the phone (ACTIVE)
+LEASED = ("Running",) + ACTIVE
+
+
+def new_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def claim_ids(worker_id, ids, lease_seconds):
+    """
+    Atomically move the scheduler's picks from Queued to Running under a
+    lease owned by ``worker_id`` and return them (script and credential
+    loaded) in the order of ``ids``.
+
+    On databases with SKIP LOCKED (Postgres) concurrent workers skip rows
+    another one is claiming right now. SQLite has a single writer, so there
+    the UPDATE re-checks status='Queued' and acts as a compare-and-set. Either
+    way rows that another worker took, or that were pushed back past now, are
+    silently left out.
+    """
+    if not ids:
+        return []
+    now = timezone.now()
+    expires = now + timedelta(seconds=lease_seconds)
+    with transaction.atomic():
+        candidates = CallQueue.objects.filter(id__in=ids, status="Queued", not_before__lte=now)
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = CallQueue.objects.filter(
+                id__in=list(candidates.select_for_update(skip_locked=True).values_list("id", flat=True))
+            )
+        candidates.update(status="Running", lease_owner=worker_id, lease_expires=expires, updated=now)
+    claimed = CallQueue.objects.select_related("script__credential").filter(
+        id__in=ids, status="Running", lease_owner=worker_id, lease_expires=expires
+    ).in_bulk()
+    return [claimed[pk] for pk in ids if pk in claimed]
+
+
+def renew_leases(worker_id, lease_seconds):
+    """Push out the lease on every row this worker still holds, claimed or in a call."""
+    return CallQueue.objects.filter(status__in=LEASED, lease_owner=worker_id).update(
+        lease_expires=timezone.now() + timedelta(seconds=lease_seconds)
+    )
+
+
+def reclaim_expired():
+    """
+    Clean up after workers that died (their lease ran out). Claimed rows go
+    back to the queue; calls they had in progress go through
+    retries.settle_orphaned, so an answered call is never dialed again.
+    """
+    now = timezone.now()
+    reclaimed = CallQueue.objects.filter(status="Running", lease_expires__lt=now).update(
+        status="Queued", lease_owner="", lease_expires=None, updated=now
+    )
+    for queue_obj in CallQueue.objects.filter(status__in=ACTIVE, lease_expires__lt=now):
+        settle_orphaned(queue_obj, f"lease of dialer {queue_obj.lease_owner or '?'} expired")
+        reclaimed += 1
+    return reclaimed
+
+
+def release_leases(worker_id):
+    """Hand back everything this worker claimed but didn't start (graceful shutdown)."""
+    now = timezone.now()
+    return CallQueue.objects.filter(status="Running", lease_owner=worker_id).update(
+        status="Queued", lease_owner="", lease_expires=None, updated=now
+    )
@@ -0,0 +1,178 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.db.models.signals import post_save
+
+from .models import CallQueue, CallLog
+from .pagination import datetime_to_us, us_to_datetime
+
+QUEUE_LOGS_SNAPSHOT_ROWS = 200   # rows sent when the dashboard has no cursor yet
+QUEUE_LOGS_DELTA_LIMIT = 500     # max changed rows per fetch; "more" means fetch again
+
+
+def format_queue_row(q):
+    return {
+        "id": q["id"],
+        "status": q["status"],
+        "timestamp": q["timestamp"].strftime("%Y-%m-%d %H:%M:%S"),
+        "script_text": q["script__script_text"],
+        "country": q["script__country"]
+    }
+
+
+def format_log_row(l):
+    return {
+        "id": l["id"],
+        "ai_response": l["ai_response"],
+        "timestamp": l["timestamp"].strftime("%Y-%m-%d %H:%M:%S"),
+        "audio_path": l["audio_path"],
+        "country": l["user_script__country"]
+    }
+
+
+def parse_cursor(raw):
+    # "<queue updated, epoch µs>.<queue id>.<log id>"
+    try:
+        updated_us, queue_id, log_id = (int(part) for part in raw.split("."))
+    except (AttributeError, ValueError):
+        return None
+    return us_to_datetime(updated_us), queue_id, log_id
+
+
+def make_cursor(updated, queue_id, log_id):
+    return f"{datetime_to_us(updated)}.{queue_id}.{log_id}"
+
+
+def queue_values():
+    return CallQueue.objects.select_related("script").values(
+        "id", "status", "timestamp", "updated", "script__script_text", "script__country"
+    )
+
+
+def log_values():
+    return CallLog.objects.select_related("user_script").values(
+        "id", "ai_response", "timestamp", "audio_path", "user_script__country"
+    )
+
+
+def fetch_snapshot(limit=QUEUE_LOGS_SNAPSHOT_ROWS):
+    """Latest rows plus a cursor pointing at the newest change."""
+    queue_rows = list(queue_values().order_by("-updated", "-id")[:limit])
+    log_rows = list(log_values().order_by("-id")[:limit])
+    last_q = queue_rows[0] if queue_rows else {"updated": None, "id": 0}
+    return {
+        "queue": [format_queue_row(q) for q in queue_rows],
+        "logs": [format_log_row(l) for l in log_rows],
+        "cursor": make_cursor(last_q["updated"], last_q["id"], log_rows[0]["id"] if log_rows else 0),
+        "more": False
+    }
+
+
+def fetch_changes(cursor, limit=QUEUE_LOGS_DELTA_LIMIT):
+    """Queue rows changed and log rows written after ``cursor`` (a parse_cursor tuple)."""
+    since, queue_id, log_id = cursor
+    queue_rows = list(
+        queue_values().filter(Q(updated__gt=since) | Q(updated=since, id__gt=queue_id))
+        .order_by("updated", "id")[:limit]
+    )
+    log_rows = list(log_values().filter(id__gt=log_id).order_by("id")[:limit])
+    last_q = queue_rows[-1] if queue_rows else {"updated": since, "id": queue_id}
+    last_log_id = log_rows[-1]["id"] if log_rows else log_id
+    return {
+        "queue": [format_queue_row(q) for q in queue_rows],
+        "logs": [format_log_row(l) for l in log_rows],
+        "cursor": make_cursor(last_q["updated"], last_q["id"], last_log_id),
+        "more": len(queue_rows) == limit or len(log_rows) == limit
+    }
+
+
+def _fetch_changes_closing(cursor):
+    # Runs in a worker thread; don't let its connection outlive CONN_MAX_AGE.
+    close_old_connections()
+    try:
+        return fetch_changes(cursor)
+    finally:
+        close_old_connections()
+
+
+class ChangeFeed:
+    """
+    One DB tail per process, fanned out to every connected dashboard.
+
+    The feed task reads changes after its cursor every ``interval`` seconds
+    (sooner when a CallQueue/CallLog save in this process wakes it) and puts
+    each batch on every subscriber's queue. Slow subscribers whose queue is
+    full are dropped; their EventSource reconnects with Last-Event-ID and
+    catches up from the DB.
+    """
+
+    def __init__(self, interval=1.0, subscriber_queue_size=100):
+        self.interval = interval
+        self.subscriber_queue_size = subscriber_queue_size
+        self._subscribers = set()
+        self._loop = None
+        self._task = None
+        self._wake = None
+
+    def subscribe(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._wake = asyncio.Event()
+            self._task = loop.create_task(self._run())
+        queue = asyncio.Queue(self.subscriber_queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def is_subscribed(self, queue):
+        return queue in self._subscribers
+
+    def wake(self, **kwargs):
+        loop, wake = self._loop, self._wake
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wake.set)
+
+    async def _run(self):
+        snapshot = await sync_to_async(fetch_snapshot)(limit=1)
+        cursor = parse_cursor(snapshot["cursor"])
+        while self._subscribers:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                batch = await sync_to_async(_fetch_changes_closing)(cursor)
+            except Exception:
+                continue
+            if not batch["queue"] and not batch["logs"]:
+                continue
+            cursor = parse_cursor(batch["cursor"])
+            for queue in list(self._subscribers):
+                try:
+                    queue.put_nowait(batch)
+                except asyncio.QueueFull:
+                    self._subscribers.discard(queue)
+            if batch["more"]:
+                self._wake.set()
+        self._task = None
+
+
+def sse_message(batch):
+    return f"id: {batch['cursor']}\ndata: {json.dumps(batch)}\n\n"
+
+
+LIVE_FEED = ChangeFeed(
+    interval=getattr(settings, "LIVE_FEED_INTERVAL", 1.0),
+    subscriber_queue_size=getattr(settings, "LIVE_FEED_SUBSCRIBER_QUEUE", 100),
+)
+
+post_save.connect(LIVE_FEED.wake, sender=CallQueue, weak=False)
+post_save.connect(LIVE_FEED.wake, sender=CallLog, weak=False)
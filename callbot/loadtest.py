@@ -0,0 +1,132 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count
+
+from . import utils
+from .ami_events import ACTIVE, AMI_EVENTS
+from .fake_ami import FakeAMIServer
+from .models import CallCredential, CallQueue, CallScript
+from .stats import percentile
+from .write_behind import WRITER
+
+
+class DialerLoadTest:
+    """
+    Drives CallQueue -> scheduler -> dialer -> FakeAMIServer at each offered
+    rate in ``rates`` (calls enqueued per second) for ``duration`` seconds,
+    waits for the step's calls to finish, and measures what the real worker
+    code path achieved. Meant to run against a scratch database (see the
+    bench_dialer command); it creates its own credential and script.
+    """
+
+    def __init__(self, rates, duration=10, server_options=None, max_channels=10000, max_cps=10000.0,
+                 drain_timeout=60, log=print):
+        self.rates = rates
+        self.duration = duration
+        self.server_options = server_options or {}
+        self.max_channels = max_channels
+        self.max_cps = max_cps
+        self.drain_timeout = drain_timeout
+        self.log = log
+        self.server = None
+
+    async def run(self):
+        self.server = FakeAMIServer(**self.server_options).start_in_thread()
+        script = await sync_to_async(self._create_script)()
+        stop = asyncio.Event()
+        worker = asyncio.create_task(utils.queue_worker(stop=stop))
+        results = []
+        try:
+            for rate in self.rates:
+                result = await self._step(rate, script)
+                self.log(self.format_result(result))
+                results.append(result)
+        finally:
+            stop.set()
+            await worker
+            AMI_EVENTS.close_all()
+            self.server.stop_thread()
+        return results
+
+    def _create_script(self):
+        credential = CallCredential.objects.create(
+            ami_host="127.0.0.1", ami_port=self.server.port, ami_user="bench", ami_pass="bench",
+            max_channels=self.max_channels, max_cps=self.max_cps,
+        )
+        return CallScript.objects.create(
+            country="Bench", script_text="This is a load test call.", credential=credential,
+        )
+
+    async def _step(self, rate, script):
+        campaign = f"bench-{rate}"
+        total = int(rate * self.duration)
+        writes_before = WRITER.stats()
+        started = time.time()
+
+        # Enqueue at the offered rate in 100ms ticks, like a steady stream of form posts / imports
+        enqueued = 0
+        while enqueued < total:
+            due = min(total, int((time.time() - started) * rate) + 1)
+            if due > enqueued:
+                batch = [CallQueue(script=script, campaign=campaign) for _ in range(due - enqueued)]
+                await sync_to_async(CallQueue.objects.bulk_create)(batch)
+                enqueued = due
+            await asyncio.sleep(0.1)
+
+        deadline = time.time() + self.drain_timeout
+        while time.time() < deadline and await sync_to_async(self._unfinished)(campaign):
+            await asyncio.sleep(0.2)
+        await sync_to_async(WRITER.flush)()
+        elapsed = time.time() - started
+        writes_after = WRITER.stats()
+
+        rows = await sync_to_async(list)(
+            CallQueue.objects.filter(campaign=campaign).values_list("action_id", "timestamp")
+        )
+        latencies, originated_at = [], []
+        for action_id, enqueued_at in rows:
+            at = self.server.originates.get(action_id)
+            if at is not None:
+                originated_at.append(at)
+                latencies.append(at - enqueued_at.timestamp())
+        span = (max(originated_at) - min(originated_at)) if len(originated_at) > 1 else 0.0
+        statuses = await sync_to_async(lambda: dict(
+            CallQueue.objects.filter(campaign=campaign).values_list("status").annotate(n=Count("id"))
+        ))()
+        rows_written = (writes_after["rows_updated"] + writes_after["rows_created"]
+                        - writes_before["rows_updated"] - writes_before["rows_created"])
+        return {
+            "offered_rate": rate,
+            "calls": total,
+            "originated": len(originated_at),
+            "originates_per_sec": len(originated_at) / span if span else float(len(originated_at)),
+            "enqueue_to_originate_ms": {
+                "p50": 1000 * percentile(latencies, 50),
+                "p99": 1000 * percentile(latencies, 99),
+                "max": 1000 * max(latencies, default=0.0),
+            },
+            "db_rows_written_per_sec": rows_written / elapsed,
+            "db_flushes_per_sec": (writes_after["flushes"] - writes_before["flushes"]) / elapsed,
+            "db_flush_ms_avg": writes_after["flush_ms_avg"],
+            "loop_lag_ms_max": utils.LOOP_MONITOR.stats()["lag_ms_max"] if utils.LOOP_MONITOR else 0.0,
+            "statuses": statuses,
+            "seconds": elapsed,
+        }
+
+    @staticmethod
+    def _unfinished(campaign):
+        rows = CallQueue.objects.filter(campaign=campaign)
+        return (rows.filter(status__in=("Running",) + ACTIVE).exists()
+                or rows.filter(status="Queued", attempts=0).exists())
+
+    @staticmethod
+    def format_result(r):
+        lat = r["enqueue_to_originate_ms"]
+        return (
+            f"{r['offered_rate']:>6}/s offered | {r['originated']:>6}/{r['calls']} originated "
+            f"at {r['originates_per_sec']:8.1f}/s | enqueue->originate p50 {lat['p50']:7.0f}ms "
+            f"p99 {lat['p99']:7.0f}ms | DB {r['db_rows_written_per_sec']:7.0f} rows/s "
+            f"in {r['db_flushes_per_sec']:5.1f} flushes/s | loop lag max {r['loop_lag_ms_max']:.0f}ms"
+        )
@@ -0,0 +1,94 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+
+from .metrics import LOOP_LAG_SECONDS, LOOP_STALLS
+
+
+class LoopLagMonitor:
+    """
+    Measures event-loop lag and reports whatever is blocking the loop.
+
+    A task on the loop sleeps ``interval`` seconds and records how late it
+    wakes up (the lag every other coroutine sees too). A watchdog thread
+    checks the task's heartbeat; when the loop hasn't run it for more than
+    ``threshold`` seconds, it grabs the loop thread's stack, so the report
+    names the blocking call rather than just saying the loop was slow.
+    """
+
+    def __init__(self, threshold=0.1, interval=0.05, name="dialer", log=print):
+        self.threshold = threshold
+        self.interval = interval
+        self.name = name
+        self.log = log
+        self._beat = time.monotonic()
+        self._loop_thread_id = None
+        self._task = None
+        self._watchdog = None
+        self._stopped = threading.Event()
+        self.samples = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+        self.lag_last = 0.0
+        self.stalls = 0
+        self.stall_seconds_max = 0.0
+
+    def start(self):
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name=f"{self.name}-loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _heartbeat(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(now - started - self.interval, 0.0)
+            self._beat = now
+            self.samples += 1
+            self.lag_total += lag
+            self.lag_last = lag
+            self.lag_max = max(self.lag_max, lag)
+            LOOP_LAG_SECONDS.observe(lag)
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stopped.wait(self.threshold / 2):
+            beat = self._beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked <= self.threshold or beat == reported_beat:
+                continue
+            # One report per stall, taken while it is still happening
+            reported_beat = beat
+            self.stalls += 1
+            LOOP_STALLS.inc()
+            frame = sys._current_frames().get(self._loop_thread_id)
+            where = "".join(traceback.format_stack(frame, limit=6)) if frame else "  (no stack)\n"
+            self.log(f"⚠️ {self.name} event loop blocked for {blocked * 1000:.0f}ms+ in:\n{where.rstrip()}")
+            self._track_stall(beat)
+
+    def _track_stall(self, beat):
+        # Record the full stall length once the loop is back
+        while self._beat == beat and not self._stopped.is_set():
+            time.sleep(self.threshold / 4)
+        self.stall_seconds_max = max(self.stall_seconds_max, time.monotonic() - beat - self.interval)
+
+    def stats(self):
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "lag_ms_last": self.lag_last * 1000,
+            "lag_ms_avg": 1000 * self.lag_total / self.samples if self.samples else 0.0,
+            "lag_ms_max": self.lag_max * 1000,
+            "stalls": self.stalls,
+            "stall_ms_max": self.stall_seconds_max * 1000,
+        }
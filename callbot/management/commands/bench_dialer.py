@@ -0,0 +1,68 @@
+import asyncio
+import json
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from callbot.benchmarks import scratch_database, stub_tts
+from callbot.loadtest import DialerLoadTest
+from callbot.management.commands.fake_ami import seconds_range
+
+
+def rates(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the dialer end to end (CallQueue -> scheduler -> dialer -> fake AMI) at increasing "
+        "offered rates, on a scratch database. Reports originates/sec, enqueue->originate p50/p99 "
+        "and the DB write rate for each step."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rates", type=rates, default=[10, 50, 100, 200], help="Calls/sec per step, e.g. 10,50,100")
+        parser.add_argument("--duration", type=float, default=10, help="Seconds of enqueueing per step")
+        parser.add_argument("--latency-ms", type=float, default=2.0, help="Fake AMI response latency")
+        parser.add_argument("--failure-rate", type=float, default=0.0)
+        parser.add_argument("--no-answer-rate", type=float, default=0.0)
+        parser.add_argument("--ring-seconds", type=seconds_range, default=(0.05, 0.2))
+        parser.add_argument("--call-seconds", type=seconds_range, default=(0.2, 1.0))
+        parser.add_argument("--concurrency", type=int, default=getattr(settings, "DIALER_CONCURRENCY", 20),
+                            help="DIALER_CONCURRENCY for the run (calls held until hangup count against it)")
+        parser.add_argument("--refill-seconds", type=float, default=getattr(settings, "SCHEDULER_REFILL_SECONDS", 5),
+                            help="SCHEDULER_REFILL_SECONDS for the run")
+        parser.add_argument("--drain-timeout", type=float, default=60, help="Max seconds to wait for a step's calls")
+        parser.add_argument("--json", help="Also write the results to this file")
+
+    def handle(self, *args, **options):
+        scratch = tempfile.mkdtemp(prefix="callbot-bench-")
+        loadtest = DialerLoadTest(
+            rates=options["rates"],
+            duration=options["duration"],
+            drain_timeout=options["drain_timeout"],
+            server_options=dict(
+                latency=options["latency_ms"] / 1000,
+                failure_rate=options["failure_rate"],
+                no_answer_rate=options["no_answer_rate"],
+                ring_seconds=options["ring_seconds"],
+                call_seconds=options["call_seconds"],
+            ),
+            log=self.stdout.write,
+        )
+        self.stdout.write(f"Scratch database in {scratch}, concurrency {options['concurrency']}, "
+                          f"scheduler refill {options['refill_seconds']}s")
+        # The load test measures the dialer, not pyttsx3: the stub TTS driver stands in
+        with scratch_database(scratch), stub_tts(scratch), \
+                override_settings(DIALER_CONCURRENCY=options["concurrency"],
+                                  SCHEDULER_REFILL_SECONDS=options["refill_seconds"]):
+            results = asyncio.run(loadtest.run())
+
+        if options["json"]:
+            with open(options["json"], "w", encoding="utf-8") as f:
+                json.dump({"options": {k: options[k] for k in ("rates", "duration", "concurrency", "refill_seconds")},
+                           "steps": results}, f, indent=2, default=str)
+            self.stdout.write(f"Results written to {options['json']}")
+        self.stdout.write(self.style.SUCCESS(f"✅ Load test finished ({len(results)} steps)"))
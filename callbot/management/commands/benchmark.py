@@ -0,0 +1,67 @@
+import json
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from callbot.benchmarks import BenchmarkSuite, StubTTSDriver, compare, scratch_database, stub_tts
+
+GROUPS = ("tts", "views", "save_form")
+
+
+def sizes(value):
+    return [int(float(v)) for v in value.split(",") if v.strip()]
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the micro-benchmark suite (generate_ai_voice cold/warm, home and get_queue_logs at "
+        "1k/100k/1M rows, save_form throughput) offline on a scratch database with a stub TTS "
+        "driver, and write a JSON report that can be diffed between commits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=sizes, default=[1000, 100000, 1000000],
+                            help="Row counts for the listing views, e.g. 1000,1e5,1e6")
+        parser.add_argument("--only", action="append", choices=GROUPS, help="Run just this group (repeatable)")
+        parser.add_argument("--iterations", type=int, default=50, help="Timed calls per view benchmark")
+        parser.add_argument("--tts-iterations", type=int, default=200)
+        parser.add_argument("--save-form-iterations", type=int, default=500)
+        parser.add_argument("--full-max-rows", type=int, default=100000,
+                            help="Skip get_queue_logs?full=1 above this many rows")
+        parser.add_argument("--tts-ms-per-char", type=float, default=0.0,
+                            help="Simulated engine cost for the stub TTS driver (default: none)")
+        parser.add_argument("--output", "-o", default="benchmark.json", help="Report file")
+        parser.add_argument("--compare", help="Previous report to print changes against")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["compare"]:
+            try:
+                with open(options["compare"], encoding="utf-8") as f:
+                    baseline = json.load(f)["results"]
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f"Cannot read {options['compare']}: {e}")
+
+        root = tempfile.mkdtemp(prefix="callbot-bench-")
+        suite = BenchmarkSuite(
+            root,
+            sizes=options["sizes"],
+            iterations=options["iterations"],
+            tts_iterations=options["tts_iterations"],
+            save_form_iterations=options["save_form_iterations"],
+            full_max_rows=options["full_max_rows"],
+            log=self.stdout.write,
+        )
+        driver = StubTTSDriver(seconds_per_char=options["tts_ms_per_char"] / 1000)
+        with scratch_database(root), stub_tts(root, driver):
+            results = suite.run(only=options["only"])
+
+        with open(options["output"], "w", encoding="utf-8") as f:
+            json.dump({"meta": suite.metadata(), "results": results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        self.stdout.write(self.style.SUCCESS(f"✅ {len(results)} benchmarks written to {options['output']}"))
+
+        if baseline is not None:
+            self.stdout.write(f"Compared with {options['compare']}:")
+            for line in compare(baseline, results):
+                self.stdout.write(line)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from callbot.retries import dead_letters, requeue
+
+
+class Command(BaseCommand):
+    help = "List DeadLetter calls (calls that ran out of retries) and optionally send them back to the queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--campaign", help="Only rows from this campaign")
+        parser.add_argument("--failure", help="Only rows whose last failure was this class (login, rejected, no_answer, error)")
+        parser.add_argument("--requeue", action="store_true", help="Move the matching rows back to Queued")
+        parser.add_argument("--keep-attempts", action="store_true",
+                            help="With --requeue, keep the attempt counters instead of resetting them")
+
+    def handle(self, *args, **options):
+        qs = dead_letters(campaign=options["campaign"], failure_class=options["failure"])
+        by_failure = qs.values("last_failure").annotate(n=Count("id")).order_by("-n")
+        total = 0
+        for row in by_failure:
+            total += row["n"]
+            self.stdout.write(f"{row['last_failure'] or '-':<10} {row['n']}")
+        if not options["requeue"]:
+            self.stdout.write(f"{total} dead-lettered calls")
+            return
+        count = requeue(qs, reset_attempts=not options["keep_attempts"])
+        self.stdout.write(self.style.SUCCESS(f"✅ Requeued {count} calls"))
@@ -0,0 +1,39 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from callbot.fake_ami import FakeAMIServer
+
+
+def seconds_range(value):
+    low, _, high = value.partition("-")
+    return float(low), float(high or low)
+
+
+class Command(BaseCommand):
+    help = "Run a fake Asterisk AMI server (Login, Ping, Originate + call events) for local testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=5038)
+        parser.add_argument("--secret", help="Accept only this AMI secret (default: any)")
+        parser.add_argument("--latency-ms", type=float, default=2.0, help="Delay before every Response")
+        parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of Originates rejected")
+        parser.add_argument("--no-answer-rate", type=float, default=0.1, help="Share of calls that ring out")
+        parser.add_argument("--ring-seconds", type=seconds_range, default=(0.5, 3.0), help="min-max, e.g. 0.5-3")
+        parser.add_argument("--call-seconds", type=seconds_range, default=(5.0, 60.0), help="min-max, e.g. 5-60")
+        parser.add_argument("--seed", type=int)
+
+    def handle(self, *args, **options):
+        server = FakeAMIServer(
+            host=options["host"], port=options["port"], secret=options["secret"],
+            latency=options["latency_ms"] / 1000, failure_rate=options["failure_rate"],
+            no_answer_rate=options["no_answer_rate"], ring_seconds=options["ring_seconds"],
+            call_seconds=options["call_seconds"], seed=options["seed"],
+        )
+        self.stdout.write(f"Fake AMI listening on {options['host']}:{options['port']} (Ctrl-C to stop)")
+        try:
+            asyncio.run(server.serve_forever())
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f"Served: {server.stats()}")
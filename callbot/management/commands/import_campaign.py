@@ -0,0 +1,60 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from callbot.importer import FORMATS, ImportFileError, ImportResult, guess_format, import_calls, iter_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Queue calls from a CSV or JSONL file of exten, caller_id, country, script rows; "
+        "var_<name> columns fill the script's template {fields}."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--campaign", default="", help="Label stored on every queued row")
+        parser.add_argument("--format", choices=FORMATS, help="Defaults to the file extension")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--rejects", help="Write rejected rows (line, reason, row) to this CSV file")
+
+    def handle(self, *args, **options):
+        fmt = options["format"] or guess_format(options["path"])
+        try:
+            source = open(options["path"], "rb")
+        except OSError as e:
+            raise CommandError(e)
+
+        rejects_file = writer = None
+        if options["rejects"]:
+            rejects_file = open(options["rejects"], "w", newline="", encoding="utf-8")
+            writer = csv.writer(rejects_file)
+            writer.writerow(["line", "reason", "row"])
+
+        def on_reject(rejected):
+            if writer:
+                writer.writerow([rejected.line, rejected.reason, rejected.row])
+
+        def progress(result):
+            self.stdout.write(f"{result.processed} rows read, {result.created} queued, {result.rejected} rejected")
+
+        result = ImportResult()
+        try:
+            with source:
+                import_calls(
+                    iter_rows(source, fmt),
+                    campaign=options["campaign"],
+                    batch_size=options["batch_size"],
+                    result=result,
+                    progress=progress,
+                    on_reject=on_reject,
+                )
+        except ImportFileError as e:
+            raise CommandError(f"{e}; {result.created} calls were already queued from earlier lines")
+        finally:
+            if rejects_file:
+                rejects_file.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Queued {result.created} calls ({result.rejected} rejected of {result.processed})"
+        ))
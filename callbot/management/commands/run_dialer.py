@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from callbot.dialer_supervisor import DialerSupervisor
+
+
+class Command(BaseCommand):
+    help = "Run an autoscaling pool of dialer worker processes against the shared CallQueue table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--min-workers", type=int, default=getattr(settings, "DIALER_MIN_WORKERS", 1))
+        parser.add_argument("--max-workers", type=int, default=getattr(settings, "DIALER_MAX_WORKERS", 4))
+        parser.add_argument("--calls-per-worker", type=int, default=getattr(settings, "DIALER_CALLS_PER_WORKER", 100),
+                            help="Queued rows one worker is expected to keep up with")
+        parser.add_argument("--max-lag", type=float, default=getattr(settings, "DIALER_MAX_LAG_SECONDS", 30),
+                            help="Add a worker while the oldest Queued call is older than this")
+        parser.add_argument("--interval", type=float, default=5, help="Seconds between scaling decisions")
+        parser.add_argument("--drain-timeout", type=float, default=getattr(settings, "DIALER_DRAIN_SECONDS", 60),
+                            help="How long in-flight calls get to finish on SIGTERM")
+        parser.add_argument("--no-shard", action="store_true",
+                            help="Let every worker claim any credential instead of sharding trunks across workers "
+                                 "(each worker then applies a trunk's max_channels / max_cps on its own)")
+
+    def handle(self, *args, **options):
+        supervisor = DialerSupervisor(
+            min_workers=options["min_workers"],
+            max_workers=options["max_workers"],
+            calls_per_worker=options["calls_per_worker"],
+            max_lag=options["max_lag"],
+            interval=options["interval"],
+            drain_timeout=options["drain_timeout"],
+            shard_by_credential=not options["no_shard"],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"📞 Dialer running with {options['min_workers']}-{options['max_workers']} workers (Ctrl-C / SIGTERM to drain)"
+        ))
+        supervisor.run()
+        self.stdout.write(self.style.SUCCESS("✅ Dialer stopped"))
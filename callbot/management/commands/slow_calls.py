@@ -0,0 +1,68 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from callbot.models import CallLog
+from callbot.spans import STAGES, decode, stage_percentiles
+
+
+class Command(BaseCommand):
+    help = (
+        "Slow-call report from the per-stage timings stored on CallLog (sampled calls): the slowest "
+        "calls and p50/p95/p99 for each stage (claimed, started, tts, ami_connected, originated, "
+        "answered, hung_up; each measured from the previous stage)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hours", type=float, default=24, help="Only calls logged in the last N hours")
+        parser.add_argument("--campaign", help="Only calls from this campaign")
+        parser.add_argument("--limit", type=int, default=20, help="How many slow calls to list")
+        parser.add_argument("--stage", choices=STAGES, help="Rank by this stage instead of the whole call")
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        if options["limit"] < 0:
+            raise CommandError("--limit must be >= 0")
+        logs = CallLog.objects.exclude(timings="").filter(
+            timestamp__gte=timezone.now() - timedelta(hours=options["hours"])
+        )
+        if options["campaign"]:
+            logs = logs.filter(call__campaign=options["campaign"])
+
+        fields = ("id", "call_id", "user_script__country", "timestamp", "timings", "total_ms")
+        if options["stage"]:
+            # Per-stage ranking needs the decoded strings; total ranking uses the total_ms index
+            rows = sorted(logs.values(*fields).iterator(),
+                          key=lambda r: decode(r["timings"]).get(options["stage"], -1), reverse=True)
+            slowest = rows[:options["limit"]]
+        else:
+            slowest = list(logs.order_by("-total_ms").values(*fields)[:options["limit"]])
+        stages = stage_percentiles(logs.values_list("timings", flat=True).iterator())
+
+        if options["json"]:
+            self.stdout.write(json.dumps({
+                "stages": stages,
+                "slowest": [{**r, "timestamp": r["timestamp"].isoformat(), "timings": decode(r["timings"])}
+                            for r in slowest],
+            }, indent=2))
+            return
+
+        self.stdout.write(f"{'stage':<14} {'calls':>8} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+        for stage, s in stages.items():
+            self.stdout.write(f"{stage:<14} {s['calls']:>8} {s['p50']:>10} {s['p95']:>10} {s['p99']:>10}")
+        if not stages:
+            self.stdout.write("No timed calls in this window (is CALL_TIMING_SAMPLE_RATE above 0?)")
+            return
+
+        self.stdout.write("")
+        self.stdout.write(f"{'log':>8} {'call':>8} {'country':<12} {'logged':<19} {'total ms':>10}  "
+                          + " ".join(f"{s:>13}" for s in STAGES))
+        for r in slowest:
+            timings = decode(r["timings"])
+            self.stdout.write(
+                f"{r['id']:>8} {r['call_id'] or '-':>8} {r['user_script__country'][:12]:<12} "
+                f"{r['timestamp']:%Y-%m-%d %H:%M:%S} {r['total_ms'] or 0:>10}  "
+                + " ".join(f"{timings.get(s, ''):>13}" for s in STAGES)
+            )
@@ -0,0 +1,409 @@
+import atexit
+import bisect
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+# Seconds; Prometheus' own defaults, stretched at both ends for TTS and queue lag
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+TTS_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LAG_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value):
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def samples(self):
+        """[(sample name, labels, value)] for every label combination seen so far."""
+        out = []
+        for key, child in list(self._children.items()):
+            labels = dict(zip(self.labelnames, key))
+            for suffix, extra, value in child.samples():
+                out.append((self.name + suffix, {**labels, **extra}, value))
+        return out
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1.0):
+        self.inc(-amount)
+
+    def set(self, value):
+        self.value = float(value)
+
+    def samples(self):
+        return [("", {}, self.value)]
+
+
+class Counter(_Metric):
+    """Monotonic count; ``name`` should end in ``_total``."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1.0):
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def inc(self, amount=1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount=1.0):
+        self.labels().dec(amount)
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def samples(self):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        out, cumulative = [], 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            out.append(("_bucket", {"le": _format_value(bound)}, cumulative))
+        out.append(("_sum", {}, total))
+        out.append(("_count", {}, cumulative))
+        return out
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+
+class MetricsRegistry:
+    """
+    In-process metrics, exposed in the Prometheus text format by the
+    /metrics view. Recording a sample is a dict lookup and a locked add in
+    memory; nothing touches the database.
+
+    Every process records into its own registry. Dialer workers (separate
+    processes under run_dialer) write a snapshot to ``directory`` every
+    ``interval`` seconds, and ``render`` merges the fresh snapshots of other
+    processes with this one's live values, each series labeled with the
+    ``process`` that recorded it. Collectors add values read at scrape time
+    (queue depth from the DB) without a process label.
+    """
+
+    def __init__(self, directory, interval=10, stale_after=60):
+        self.directory = Path(directory)
+        self.interval = interval
+        self.stale_after = stale_after
+        self.process = f"pid-{os.getpid()}"
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._snapshot_thread = None
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def collector(self, fn):
+        """Register ``fn() -> [(name, kind, documentation, [(sample name, labels, value)])]``."""
+        self._collectors.append(fn)
+        return fn
+
+    # -- exposition -------------------------------------------------------
+
+    def families(self):
+        return {
+            name: {"kind": m.kind, "help": m.documentation, "samples": m.samples()}
+            for name, m in list(self._metrics.items())
+        }
+
+    def render(self):
+        merged = {}
+
+        def add(name, kind, documentation, samples, process=None):
+            family = merged.setdefault(name, {"kind": kind, "help": documentation, "samples": []})
+            for sample, labels, value in samples:
+                if process is not None:
+                    labels = {"process": process, **labels}
+                family["samples"].append((sample, labels, value))
+
+        for process, families in [(self.process, self.families())] + self.read_snapshots():
+            for name, f in families.items():
+                add(name, f["kind"], f["help"], f["samples"], process)
+        for collect in self._collectors:
+            try:
+                for name, kind, documentation, samples in collect():
+                    add(name, kind, documentation, samples)
+            except Exception as e:
+                print(f"⚠️ Metrics collector {collect.__name__} failed: {e}")
+
+        lines = []
+        for name in sorted(merged):
+            family = merged[name]
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['kind']}")
+            for sample, labels, value in family["samples"]:
+                lines.append(f"{sample}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    # -- cross-process snapshots ------------------------------------------
+
+    def start_snapshots(self, process=None):
+        """Publish this process' metrics for /metrics in the web process (idempotent)."""
+        if process:
+            self.process = process
+        if self._snapshot_thread is not None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._snapshot_thread = threading.Thread(target=self._snapshot_loop, name="metrics-snapshot", daemon=True)
+        self._snapshot_thread.start()
+        atexit.register(self._remove_snapshot)
+
+    def _snapshot_path(self):
+        return self.directory / f"{self.process.replace(':', '_').replace('/', '_')}.json"
+
+    def _snapshot_loop(self):
+        while True:
+            try:
+                self.write_snapshot()
+            except Exception as e:
+                print(f"⚠️ Could not write metrics snapshot: {e}")
+            time.sleep(self.interval)
+
+    def write_snapshot(self):
+        path = self._snapshot_path()
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"process": self.process, "pid": os.getpid(), "families": self.families()}))
+        os.replace(tmp, path)
+
+    def _remove_snapshot(self):
+        try:
+            self._snapshot_path().unlink()
+        except FileNotFoundError:
+            pass
+
+    def read_snapshots(self):
+        """[(process, families)] of other processes' snapshots written in the last ``stale_after`` seconds."""
+        out = []
+        if not self.directory.is_dir():
+            return out
+        now = time.time()
+        for path in self.directory.glob("*.json"):
+            try:
+                if now - path.stat().st_mtime > self.stale_after:
+                    continue
+                data = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            if data.get("pid") == os.getpid():
+                continue
+            out.append((data["process"], data["families"]))
+        return out
+
+
+class timer:
+    """``with timer(histogram.labels(...)):`` observes the block's wall time."""
+
+    __slots__ = ("metric", "started")
+
+    def __init__(self, metric):
+        self.metric = metric
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metric.observe(time.perf_counter() - self.started)
+        return False
+
+
+REGISTRY = MetricsRegistry(
+    directory=getattr(settings, "METRICS_DIR", Path(tempfile.gettempdir()) / "callbot-metrics"),
+    interval=getattr(settings, "METRICS_SNAPSHOT_SECONDS", 10),
+    stale_after=getattr(settings, "METRICS_STALE_SECONDS", 60),
+)
+
+TTS_SECONDS = REGISTRY.histogram(
+    "callbot_tts_generate_seconds", "generate_ai_voice latency by TTS cache result.", ["cache"], TTS_BUCKETS,
+)
+TTS_CACHE_LOOKUPS = REGISTRY.counter(
+    "callbot_tts_cache_lookups_total",
+    "TTS cache lookups by result: hit, miss (rendered), coalesced (waited for another render).",
+    ["result"],
+)
+TTS_CACHE_EVICTED = REGISTRY.counter("callbot_tts_cache_evicted_total", "Prompts evicted from the TTS cache.")
+TTS_CACHE_BYTES = REGISTRY.gauge("callbot_tts_cache_bytes", "TTS cache size found by the last directory walk.")
+TTS_POOL_QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "callbot_tts_pool_queue_wait_seconds", "Time a TTS job waited for a free worker process.", buckets=TTS_BUCKETS,
+)
+TTS_POOL_JOB_SECONDS = REGISTRY.histogram(
+    "callbot_tts_pool_job_seconds", "TTS worker run time per job, by outcome (ok / failed).", ["outcome"], TTS_BUCKETS,
+)
+TTS_POOL_REJECTED = REGISTRY.counter(
+    "callbot_tts_pool_rejected_total", "TTS jobs refused because the pool's queue stayed full.",
+)
+TTS_POOL_WORKER_EXITS = REGISTRY.counter(
+    "callbot_tts_pool_worker_exits_total", "TTS worker processes replaced, by reason (recycled / crashed).", ["reason"],
+)
+ENQUEUE_TO_DIAL_SECONDS = REGISTRY.histogram(
+    "callbot_enqueue_to_dial_seconds", "Time from a call becoming due (not_before) to its Originate.",
+    buckets=LAG_BUCKETS,
+)
+DIALER_CALLS = REGISTRY.counter(
+    "callbot_dialer_calls_total",
+    "Calls finished by the dialer, by outcome: completed, failed (in process_call), not_started.",
+    ["outcome"],
+)
+DIALER_IN_FLIGHT = REGISTRY.gauge("callbot_dialer_in_flight", "Calls the dialer has handed to process_call.")
+TRUNK_CALLS = REGISTRY.counter(
+    "callbot_trunk_calls_total", "Calls let through a trunk's limiter; rate() is its achieved CPS.", ["credential"],
+)
+TRUNK_CHANNELS_IN_USE = REGISTRY.gauge(
+    "callbot_trunk_channels_in_use", "Channels held on a trunk by this dialer process.", ["credential"],
+)
+TRUNK_LIMIT = REGISTRY.gauge(
+    "callbot_trunk_limit", "A trunk's per-process limit (channels, cps); 0 means none.", ["credential", "limit"],
+)
+TRUNK_WAIT_SECONDS = REGISTRY.counter(
+    "callbot_trunk_wait_seconds_total", "Time calls spent waiting on a trunk limit (channels, cps).",
+    ["credential", "limit"],
+)
+AMI_LOGIN_SECONDS = REGISTRY.histogram(
+    "callbot_ami_login_seconds", "AMI connect + Login latency.", ["credential"], FAST_BUCKETS,
+)
+AMI_ACTION_SECONDS = REGISTRY.histogram(
+    "callbot_ami_action_seconds", "AMI action round trip (send to Response).", ["credential", "action"], FAST_BUCKETS,
+)
+AMI_SOCKET_LOOKUPS = REGISTRY.counter(
+    "callbot_ami_socket_lookups_total",
+    "AMI socket requests by result: hit reused a logged-in socket, miss had to log one in.",
+    ["credential", "result"],
+)
+AMI_SOCKETS_OPEN = REGISTRY.gauge("callbot_ami_sockets_open", "Logged-in AMI sockets.", ["credential"])
+AMI_SOCKETS_DROPPED = REGISTRY.counter(
+    "callbot_ami_sockets_dropped_total", "Pooled AMI sockets found disconnected and replaced.", ["credential"],
+)
+AMI_ERRORS = REGISTRY.counter(
+    "callbot_ami_errors_total", "AMI logins and actions that failed, timed out or got an Error response.",
+    ["credential", "action"],
+)
+DB_FLUSH_SECONDS = REGISTRY.histogram(
+    "callbot_db_flush_seconds", "Write-behind flush latency (one transaction).", buckets=FAST_BUCKETS,
+)
+DB_FLUSH_ROWS = REGISTRY.counter("callbot_db_flush_rows_total", "Rows written by write-behind flushes.", ["op"])
+DB_FLUSH_ERRORS = REGISTRY.counter("callbot_db_flush_errors_total", "Write-behind flushes that failed.")
+LOOP_LAG_SECONDS = REGISTRY.histogram(
+    "callbot_event_loop_lag_seconds", "How late the dialer event loop ran a due timer.", buckets=FAST_BUCKETS,
+)
+LOOP_STALLS = REGISTRY.counter(
+    "callbot_event_loop_stalls_total", "Times the event loop was blocked past LOOP_LAG_THRESHOLD_MS.",
+)
+
+
+@REGISTRY.collector
+def queue_collector():
+    # Read at scrape time from the shared table, so it is the same whichever process answers
+    from django.db.models import Count, Min
+    from django.utils import timezone
+    from .models import CallQueue
+
+    now = timezone.now()
+    depth = CallQueue.objects.values_list("status").annotate(n=Count("id")).order_by()
+    due = CallQueue.objects.filter(status="Queued", not_before__lte=now).aggregate(n=Count("id"), oldest=Min("not_before"))
+    lag = (now - due["oldest"]).total_seconds() if due["oldest"] else 0.0
+    return [
+        ("callbot_queue_depth", "gauge", "CallQueue rows by status.",
+         [("callbot_queue_depth", {"status": status}, n) for status, n in depth]),
+        ("callbot_queue_due", "gauge", "Queued calls whose not_before has passed.",
+         [("callbot_queue_due", {}, due["n"])]),
+        ("callbot_queue_oldest_due_seconds", "gauge", "How long the longest-waiting due call has waited.",
+         [("callbot_queue_oldest_due_seconds", {}, lag)]),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('callbot', '0004_callcredential_sip_endpoint_callscript_caller_id_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TTSJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(default='Pending', max_length=20)),
+                ('audio_path', models.CharField(blank=True, max_length=200)),
+                ('error', models.TextField(blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('script', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='callbot.callscript')),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('callbot', '0005_ttsjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoiceOverride',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country', models.CharField(help_text='Matched case-insensitively against CallScript.country', max_length=50, unique=True)),
+                ('voice_id', models.CharField(help_text='TTS engine voice id to use for this country', max_length=255)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
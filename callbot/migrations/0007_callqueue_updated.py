@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('callbot', '0006_voiceoverride'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callqueue',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
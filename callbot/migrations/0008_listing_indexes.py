@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('callbot', '0007_callqueue_updated'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='calllog',
+            index=models.Index(fields=['timestamp', 'id'], name='calllog_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='callqueue',
+            index=models.Index(fields=['status', 'timestamp'], name='callqueue_status_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='callqueue',
+            index=models.Index(fields=['timestamp', 'id'], name='callqueue_timestamp_idx'),
+        ),
+    ]
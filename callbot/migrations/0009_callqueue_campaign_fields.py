@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('callbot', '0008_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callqueue',
+            name='caller_id',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='callqueue',
+            name='campaign',
+            field=models.CharField(blank=True, db_index=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='callqueue',
+            name='country',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='callqueue',
+            name='exten',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+    ]
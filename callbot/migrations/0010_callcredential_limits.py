@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('callbot', '0009_callqueue_campaign_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callcredential',
+            name='max_channels',
+            field=models.PositiveIntegerField(default=10),
+        ),
+        migrations.AddField(
+            model_name='callcredential',
+            name='max_cps',
+            field=models.FloatField(default=5.0),
+        ),
+    ]
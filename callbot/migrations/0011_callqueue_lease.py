@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('callbot', '0010_callcredential_limits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callqueue',
+            name='lease_expires',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='callqueue',
+            name='lease_owner',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='callqueue',
+            index=models.Index(fields=['status', 'lease_expires'], name='callqueue_lease_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:34
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('callbot', '0011_callqueue_lease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CallingWindow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country', models.CharField(db_index=True, help_text="Matched case-insensitively against the call's country", max_length=50)),
+                ('time_zone', models.CharField(default='UTC', help_text='IANA name, e.g. Asia/Karachi', max_length=64)),
+                ('start', models.TimeField()),
+                ('end', models.TimeField(help_text='Earlier than start means the window runs past midnight')),
+                ('weekdays', models.CharField(default='0123456', help_text='Days the window opens, 0=Monday .. 6=Sunday, e.g. 01234 for weekdays', max_length=7)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='callqueue',
+            name='not_before',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='callqueue',
+            name='priority',
+            field=models.SmallIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='callqueue',
+            index=models.Index(fields=['status', 'not_before'], name='callqueue_schedule_idx'),
+        ),
+    ]
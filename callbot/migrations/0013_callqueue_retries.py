@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('callbot', '0012_scheduling'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callqueue',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='callqueue',
+            name='last_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='callqueue',
+            name='last_failure',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+    ]
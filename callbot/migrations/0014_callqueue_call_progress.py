@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('callbot', '0013_callqueue_retries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callqueue',
+            name='action_id',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='callqueue',
+            name='answered_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='callqueue',
+            name='duration',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='callqueue',
+            name='ended_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='callqueue',
+            name='hangup_cause',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='callqueue',
+            name='uniqueid',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
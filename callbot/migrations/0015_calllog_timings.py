@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('callbot', '0014_callqueue_call_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calllog',
+            name='call',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='logs', to='callbot.callqueue'),
+        ),
+        migrations.AddField(
+            model_name='calllog',
+            name='timings',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='calllog',
+            name='total_ms',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('callbot', '0015_calllog_timings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callqueue',
+            name='variables',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 class CallCredential(models.Model):
     ami_host = models.CharField(max_length=100)
@@ -6,6 +7,8 @@ class CallCredential(models.Model):
     ami_user = models.CharField(max_length=50)
     ami_pass = models.CharField(max_length=50)
     sip_endpoint = models.CharField(max_length=100, blank=True, null=True)  # New SIP field
+    max_channels = models.PositiveIntegerField(default=10)  # simultaneous originates on this trunk; 0 = no cap
+    max_cps = models.FloatField(default=5.0)  # calls per second ceiling on this trunk; 0 = no cap
 
     def __str__(self):
         return f"{self.ami_user} @ {self.ami_host}"
@@ -33,12 +36,93 @@ class CallLog(models.Model):
     ai_response = models.TextField()
     audio_path = models.CharField(max_length=200, blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Per-stage timings of the attempt (callbot.spans), for sampled calls only:
+    # ms to reach each of spans.STAGES from the previous one, e.g. "120,3,250,1,14,4100,61000"
+    call = models.ForeignKey("CallQueue", on_delete=models.SET_NULL, null=True, blank=True, related_name="logs")
+    timings = models.CharField(max_length=100, blank=True)
+    total_ms = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["timestamp", "id"], name="calllog_timestamp_idx"),
+        ]
 
 
 class CallQueue(models.Model):
     script = models.ForeignKey(CallScript, on_delete=models.CASCADE)
     status = models.CharField(max_length=20, default='Queued')
     timestamp = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True, db_index=True)  # cursor for get_queue_logs deltas; set it explicitly in .update() (WRITER stamps it at flush)
+    # Per-call overrides of the script defaults, filled by campaign imports
+    exten = models.CharField(max_length=20, blank=True)
+    caller_id = models.CharField(max_length=50, blank=True)
+    country = models.CharField(max_length=50, blank=True)
+    campaign = models.CharField(max_length=100, blank=True, db_index=True)
+    # Values for the script's template fields, e.g. {"name": "Ayesha", "amount": "1250"} (callbot.script_templates)
+    variables = models.JSONField(default=dict, blank=True)
+    # Set while a dialer worker owns the row; expired leases go back to Queued
+    lease_owner = models.CharField(max_length=100, blank=True)
+    lease_expires = models.DateTimeField(null=True, blank=True)
+    # Scheduling: not dialed before not_before (pushed to the next CallingWindow
+    # opening for its country by the scheduler); higher priority dials first
+    not_before = models.DateTimeField(default=timezone.now)
+    priority = models.SmallIntegerField(default=0)
+    # Retries (callbot.retries): failed calls go back to Queued with a backed-off
+    # not_before until attempts (one count across all failure classes) reaches the
+    # max_attempts of the class that failed, then DeadLetter
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_failure = models.CharField(max_length=20, blank=True)  # login / rejected / no_answer / error
+    last_error = models.TextField(blank=True)
+    # Call progress from the AMI event stream (callbot.ami_events): Originate
+    # ActionID / channel Uniqueid of the current attempt and what happened to it
+    action_id = models.CharField(max_length=64, blank=True, db_index=True)
+    uniqueid = models.CharField(max_length=64, blank=True, db_index=True)
+    answered_at = models.DateTimeField(null=True, blank=True)
+    ended_at = models.DateTimeField(null=True, blank=True)
+    duration = models.FloatField(null=True, blank=True)  # seconds from answer to hangup
+    hangup_cause = models.CharField(max_length=100, blank=True)  # e.g. "16 Normal Clearing"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "timestamp"], name="callqueue_status_ts_idx"),
+            models.Index(fields=["timestamp", "id"], name="callqueue_timestamp_idx"),
+            models.Index(fields=["status", "lease_expires"], name="callqueue_lease_idx"),
+            models.Index(fields=["status", "not_before"], name="callqueue_schedule_idx"),
+        ]
+
+
+class CallingWindow(models.Model):
+    WEEKDAYS_HELP = "Days the window opens, 0=Monday .. 6=Sunday, e.g. 01234 for weekdays"
+
+    country = models.CharField(max_length=50, db_index=True, help_text="Matched case-insensitively against the call's country")
+    time_zone = models.CharField(max_length=64, default="UTC", help_text="IANA name, e.g. Asia/Karachi")
+    start = models.TimeField()
+    end = models.TimeField(help_text="Earlier than start means the window runs past midnight")
+    weekdays = models.CharField(max_length=7, default="0123456", help_text=WEEKDAYS_HELP)
+
+    def __str__(self):
+        return f"{self.country} {self.start:%H:%M}-{self.end:%H:%M} {self.time_zone}"
+
+
+class VoiceOverride(models.Model):
+    country = models.CharField(max_length=50, unique=True, help_text="Matched case-insensitively against CallScript.country")
+    voice_id = models.CharField(max_length=255, help_text="TTS engine voice id to use for this country")
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.country} -> {self.voice_id}"
+
+
+class TTSJob(models.Model):
+    script = models.ForeignKey(CallScript, on_delete=models.CASCADE)
+    status = models.CharField(max_length=20, default='Pending')  # Pending / Running / Done / Failed
+    audio_path = models.CharField(max_length=200, blank=True)
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"TTS job {self.pk} ({self.status})"
 
 
 class Credential(models.Model):
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta, timezone
+
+from django.db.models import Q
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def datetime_to_us(value):
+    """Exact integer microseconds since the epoch (no float rounding)."""
+    return (value - _EPOCH) // timedelta(microseconds=1) if value else 0
+
+
+def us_to_datetime(value):
+    return _EPOCH + timedelta(microseconds=int(value))
+
+
+def encode_position(timestamp, pk):
+    return f"{datetime_to_us(timestamp)}.{pk}"
+
+
+def decode_position(raw):
+    try:
+        timestamp_us, pk = raw.split(".")
+        return us_to_datetime(timestamp_us), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+class KeysetPage:
+    def __init__(self, rows, next_cursor):
+        self.rows = rows
+        self.next_cursor = next_cursor
+        self.has_next = next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def keyset_page(queryset, cursor, page_size, field="timestamp"):
+    """
+    Newest-first page of ``queryset`` starting after ``cursor`` (an
+    encode_position() string). Seeks on (field, id) instead of OFFSET, so
+    the cost of a page doesn't grow with how deep into the table it is.
+    """
+    queryset = queryset.order_by(f"-{field}", "-id")
+    position = decode_position(cursor)
+    if position is not None:
+        before, pk = position
+        queryset = queryset.filter(Q(**{f"{field}__lt": before}) | Q(**{field: before, "id__lt": pk}))
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_position(getattr(rows[-1], field), rows[-1].pk)
+    return KeysetPage(rows, next_cursor)
@@ -0,0 +1,152 @@
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .ami_async import AMILoginError
+from .models import CallQueue
+
+LOGIN = "login"            # AMI login rejected / unreachable
+REJECTED = "rejected"      # Originate answered with Response: Error
+NO_ANSWER = "no_answer"    # busy, no answer, congestion
+ERROR = "error"            # anything else
+
+DEAD_LETTER = "DeadLetter"
+
+# Only used when settings.CALL_RETRY_POLICIES is missing; tune the setting, not this
+DEFAULT_POLICIES = {
+    LOGIN: {"max_attempts": 6, "base_delay": 30, "factor": 2, "max_delay": 1800},
+    REJECTED: {"max_attempts": 3, "base_delay": 60, "factor": 2, "max_delay": 3600},
+    NO_ANSWER: {"max_attempts": 4, "base_delay": 600, "factor": 2, "max_delay": 7200},
+    ERROR: {"max_attempts": 3, "base_delay": 30, "factor": 4, "max_delay": 1800},
+}
+
+# OriginateResponse / Hangup reason codes that mean the callee, not the trunk, failed
+_NO_ANSWER_REASONS = {"3", "5", "8"}  # no answer, busy, congestion
+_NO_ANSWER_WORDS = ("busy", "no answer", "noanswer", "congestion", "unavailable")
+
+
+class OriginateRejected(Exception):
+    """Asterisk refused an Originate (``Response: Error``)."""
+
+    def __init__(self, response=None, reason=None):
+        self.response = response
+        self.reason = str(reason) if reason is not None else None
+        message = getattr(response, "keys", {}).get("Message") if response is not None else None
+        super().__init__(f"Originate rejected: {message or response}")
+
+
+class RetryPolicy:
+    """Exponential backoff: ``base_delay * factor**(attempt - 1)`` seconds, capped and jittered."""
+
+    def __init__(self, max_attempts, base_delay, factor=2, max_delay=3600, jitter=0.1):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def delay(self, attempt):
+        seconds = min(self.max_delay, self.base_delay * self.factor ** max(attempt - 1, 0))
+        if self.jitter:
+            seconds *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return seconds
+
+
+def get_policy(failure_class):
+    policies = getattr(settings, "CALL_RETRY_POLICIES", None) or DEFAULT_POLICIES
+    conf = policies.get(failure_class) or policies.get(ERROR) or DEFAULT_POLICIES[ERROR]
+    return RetryPolicy(jitter=getattr(settings, "CALL_RETRY_JITTER", 0.1), **conf)
+
+
+def classify(exc):
+    """Map an exception from the call path to a failure class."""
+    if isinstance(exc, AMILoginError):
+        return LOGIN
+    if isinstance(exc, OriginateRejected):
+        message = str(exc).lower()
+        if exc.reason in _NO_ANSWER_REASONS or any(word in message for word in _NO_ANSWER_WORDS):
+            return NO_ANSWER
+        return REJECTED
+    return ERROR
+
+
+def apply_failure(queue_obj, failure_class, error, now=None):
+    """
+    Set ``queue_obj`` up for its next attempt (Queued, not_before backed off)
+    or DeadLetter once ``attempts`` reaches the class's max_attempts.
+    ``attempts`` counts every attempt whatever failed it, so max_attempts is
+    a total: a call with 3 login failures behind it dead-letters on its first
+    rejection when rejected allows 3. The caller saves the row; ``attempts``
+    must already count this attempt.
+    Returns the seconds until the retry, or None for DeadLetter.
+    """
+    now = now or timezone.now()
+    policy = get_policy(failure_class)
+    queue_obj.last_failure = failure_class
+    queue_obj.last_error = str(error)[:2000]
+    queue_obj.lease_owner = ""
+    queue_obj.lease_expires = None
+    if queue_obj.attempts >= policy.max_attempts:
+        queue_obj.status = DEAD_LETTER
+        return None
+    delay = policy.delay(queue_obj.attempts)
+    # Back to Queued, so the row waits in the DB (and the scheduler's heap)
+    # rather than holding a dialer slot while it sleeps
+    queue_obj.status = "Queued"
+    queue_obj.not_before = now + timedelta(seconds=delay)
+    return delay
+
+
+def schedule_retry(queue_obj, failure_class, error, from_statuses=("Running",)):
+    """apply_failure() plus an UPDATE that only lands while the row is still in ``from_statuses``."""
+    now = timezone.now()
+    delay = apply_failure(queue_obj, failure_class, error, now)
+    CallQueue.objects.filter(pk=queue_obj.pk, status__in=from_statuses).update(**failure_fields(queue_obj, now))
+    return delay
+
+
+def settle_orphaned(queue_obj, reason):
+    """
+    Finish a Dialing/Ringing/Answered call whose worker is gone. An unanswered
+    call goes through the retry policy; an Answered one may already have
+    played its prompt, so it is dead-lettered for an operator to requeue
+    instead of being dialed again.
+    """
+    if queue_obj.status != "Answered":
+        schedule_retry(queue_obj, ERROR, reason, from_statuses=("Dialing", "Ringing"))
+        return
+    queue_obj.status = DEAD_LETTER
+    queue_obj.last_failure = ERROR
+    queue_obj.last_error = f"{reason} after the call was answered; not retried"[:2000]
+    CallQueue.objects.filter(pk=queue_obj.pk, status="Answered").update(**failure_fields(queue_obj))
+
+
+def failure_fields(queue_obj, now=None):
+    """The columns apply_failure() changed, for an .update() or a write-behind update (which restamps ``updated``)."""
+    fields = dict(
+        status=queue_obj.status, attempts=queue_obj.attempts, last_failure=queue_obj.last_failure,
+        last_error=queue_obj.last_error, lease_owner="", lease_expires=None, updated=now or timezone.now(),
+    )
+    if queue_obj.status != DEAD_LETTER:
+        fields["not_before"] = queue_obj.not_before
+    return fields
+
+
+def dead_letters(campaign=None, failure_class=None):
+    qs = CallQueue.objects.filter(status=DEAD_LETTER)
+    if campaign is not None:
+        qs = qs.filter(campaign=campaign)
+    if failure_class:
+        qs = qs.filter(last_failure=failure_class)
+    return qs
+
+
+def requeue(queryset, reset_attempts=True, not_before=None):
+    """Send DeadLetter rows in ``queryset`` back to Queued in one UPDATE. Returns the row count."""
+    now = timezone.now()
+    fields = dict(status="Queued", not_before=not_before or now, updated=now)
+    if reset_attempts:
+        fields["attempts"] = 0
+    return queryset.filter(status=DEAD_LETTER).update(**fields)
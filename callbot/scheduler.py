@@ -0,0 +1,197 @@
+import asyncio
+import heapq
+from collections import defaultdict
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from asgiref.sync import sync_to_async
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Mod, NullIf
+from django.utils import timezone
+
+from .leases import claim_ids
+from .models import CallingWindow, CallQueue
+from .spans import start_spans
+from .voices import normalize_country
+
+
+class CallingWindows:
+    """Per-country local-time dialing windows (CallingWindow rows)."""
+
+    def __init__(self, windows):
+        self._by_country = defaultdict(list)
+        for w in windows:
+            try:
+                tz = ZoneInfo(w.time_zone)
+            except (ZoneInfoNotFoundError, ValueError):
+                tz = ZoneInfo("UTC")
+            days = {int(d) for d in w.weekdays if d.isdigit()}
+            self._by_country[normalize_country(w.country)].append((tz, w.start, w.end, days))
+
+    @classmethod
+    def load(cls):
+        return cls(CallingWindow.objects.all())
+
+    def next_open(self, country, when):
+        """Earliest moment >= ``when`` inside one of the country's windows (``when`` if none are set)."""
+        windows = self._by_country.get(normalize_country(country))
+        if not windows:
+            return when
+        best = None
+        for tz, start, end, days in windows:
+            local = when.astimezone(tz)
+            # Start a day early to catch an overnight window opened yesterday.
+            for offset in range(-1, 8):
+                day = local.date() + timedelta(days=offset)
+                if day.weekday() not in days:
+                    continue
+                opens = datetime.combine(day, start, tzinfo=tz)
+                closes = datetime.combine(day + timedelta(days=1) if end <= start else day, end, tzinfo=tz)
+                if closes > local:
+                    candidate = max(opens, local)
+                    if best is None or candidate < best:
+                        best = candidate
+                    break
+        return best.astimezone(when.tzinfo) if best else when
+
+
+class CallScheduler:
+    """
+    Releases Queued calls to the dialer when they become eligible.
+
+    Every ``refill_interval`` seconds up to ``batch`` calls that are already
+    due are read highest priority first, plus up to ``batch`` that come due
+    within ``horizon`` seconds (an indexed range query on (status,
+    not_before)), so a backlog of old low-priority calls can't hide urgent
+    ones. Both are kept in a heap ordered by eligibility time. Calls outside
+    their country's CallingWindow get not_before pushed to the next opening
+    in the DB, so later range queries skip them. The release loop sleeps until
+    the heap's head is due, then claims the due calls by id (highest priority
+    first) under a lease and hands them to ``feed``.
+    """
+
+    def __init__(self, worker_id, feed, lease_seconds, horizon=300, refill_interval=5,
+                 batch=500, credential_ids=None, shard=None):
+        self.worker_id = worker_id
+        self.feed = feed
+        self.lease_seconds = lease_seconds
+        self.horizon = horizon
+        self.refill_interval = refill_interval
+        self.batch = batch
+        self.credential_ids = credential_ids
+        self.shard = shard
+        self._heap = []
+        self._known = set()
+        self._wake = asyncio.Event()
+        self.released = 0
+        self.deferred = 0
+
+    async def run(self):
+        refill_task = asyncio.create_task(self._refill_loop())
+        try:
+            await self._release_loop()
+        finally:
+            refill_task.cancel()
+
+    # -- refill -----------------------------------------------------------
+
+    async def _refill_loop(self):
+        while True:
+            try:
+                rows = await sync_to_async(self._fetch_upcoming)()
+            except Exception as e:
+                print(f"❌ Scheduler {self.worker_id} could not read upcoming calls: {e}")
+                rows = []
+            for eligible_at, priority, pk in rows:
+                if pk not in self._known:
+                    self._known.add(pk)
+                    heapq.heappush(self._heap, (eligible_at, -priority, pk))
+            if rows:
+                self._wake.set()
+            await asyncio.sleep(self.refill_interval)
+
+    def _upcoming_queryset(self):
+        qs = CallQueue.objects.filter(status="Queued")
+        if self.credential_ids is not None:
+            qs = qs.filter(script__credential_id__in=self.credential_ids)
+        shard = self.shard() if self.shard else None
+        if shard is not None and shard[1] > 1:
+            index, count = shard
+            qs = qs.annotate(
+                shard=Mod(Coalesce("script__credential_id", Value(0)), Value(count))
+            ).filter(shard=index)
+        return qs
+
+    def _fetch_upcoming(self):
+        now = timezone.now()
+        # Sharding is filtered in the queryset, so each slice only holds this worker's rows
+        qs = self._upcoming_queryset().annotate(
+            effective_country=Coalesce(NullIf(F("country"), Value("")), F("script__country"))
+        )
+        fields = ("id", "not_before", "priority", "effective_country")
+        rows = list(
+            qs.filter(not_before__lte=now).order_by("-priority", "not_before", "id").values_list(*fields)[:self.batch]
+        ) + list(
+            qs.filter(not_before__gt=now, not_before__lte=now + timedelta(seconds=self.horizon))
+            .order_by("not_before", "id").values_list(*fields)[:self.batch]
+        )
+        windows = CallingWindows.load()
+        upcoming, deferred = [], []
+        for pk, not_before, priority, country in rows:
+            eligible_at = windows.next_open(country, max(not_before, now))
+            if eligible_at > not_before and eligible_at > now:
+                deferred.append((pk, eligible_at))
+            upcoming.append((eligible_at, priority, pk))
+        for pk, eligible_at in deferred:
+            # Persist the deferral so range queries stop returning this row
+            # (and other dialer processes agree on when it may ring).
+            CallQueue.objects.filter(pk=pk, status="Queued").update(not_before=eligible_at, updated=now)
+        self.deferred += len(deferred)
+        return upcoming
+
+    # -- release ----------------------------------------------------------
+
+    async def _release_loop(self):
+        while True:
+            now = timezone.now()
+            if not self._heap or self._heap[0][0] > now:
+                timeout = (self._heap[0][0] - now).total_seconds() if self._heap else self.refill_interval
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), max(timeout, 0))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            room = self.feed.maxsize - self.feed.qsize()
+            if room <= 0:
+                await asyncio.sleep(0.05)
+                continue
+
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap))
+            # Everything here is due now: highest priority first, then oldest.
+            due.sort(key=lambda item: (item[1], item[0], item[2]))
+            take, keep = due[:room], due[room:]
+            for item in keep:
+                heapq.heappush(self._heap, item)
+            ids = [pk for _, _, pk in take]
+            self._known.difference_update(ids)
+            try:
+                claimed = await sync_to_async(claim_ids)(self.worker_id, ids, self.lease_seconds)
+            except Exception as e:
+                print(f"❌ Scheduler {self.worker_id} could not claim calls: {e}")
+                claimed = []
+            for queue_obj in claimed:
+                self.released += 1
+                queue_obj.spans = start_spans(queue_obj)
+                await self.feed.put(queue_obj)
+
+    def stats(self):
+        return {
+            "scheduled": len(self._heap),
+            "next_due": self._heap[0][0].isoformat() if self._heap else None,
+            "released": self.released,
+            "deferred_to_window": self.deferred,
+        }
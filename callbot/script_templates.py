@@ -0,0 +1,210 @@
+import re
+from collections import namedtuple
+from concurrent.futures import Future
+from functools import lru_cache
+
+from .audio import TELEPHONY, TELEPHONY_RATE, asterisk_prompt, read_pcm, resample, trim_silence, write_wav
+from .tts_cache import normalize_text
+from .tts_chunks import ChunkedPrompt
+
+# {name} is spoken by TTS, {name:number} / {name:digits} from the clip library; {{ and }} are literal braces
+_TOKEN_RE = re.compile(r"\{\{|\}\}|\{(\w+)(?::(\w+))?\}|[{}]")
+STYLES = ("say", "number", "digits")
+# Voice languages the clip words below are spoken in; other voices read number fields themselves
+CLIP_LANGUAGES = ("en",)
+
+Field = namedtuple("Field", "name style")
+
+_ONES = ("zero one two three four five six seven eight nine ten eleven twelve thirteen fourteen fifteen "
+         "sixteen seventeen eighteen nineteen").split()
+_TENS = "_ _ twenty thirty forty fifty sixty seventy eighty ninety".split()
+_SCALES = ((10 ** 9, "billion"), (10 ** 6, "million"), (1000, "thousand"), (100, "hundred"))
+
+
+def _integer_words(n):
+    if n < 20:
+        return [_ONES[n]]
+    if n < 100:
+        return [_TENS[n // 10]] + ([_ONES[n % 10]] if n % 10 else [])
+    for scale, word in _SCALES:
+        if n >= scale:
+            rest = n % scale
+            return _integer_words(n // scale) + [word] + (_integer_words(rest) if rest else [])
+
+
+def number_words(value):
+    """``"1,234.50"`` -> ["one", "thousand", "two", "hundred", "thirty", "four", "point", "five", "zero"]."""
+    text = str(value).strip().replace(",", "")
+    match = re.fullmatch(r"(-?)(\d{1,12})(?:\.(\d+))?", text)
+    if not match:
+        raise ValueError(f"not a number: {value!r}")
+    sign, integer, fraction = match.groups()
+    words = (["minus"] if sign else []) + _integer_words(int(integer))
+    if fraction:
+        words += ["point"] + [_ONES[int(d)] for d in fraction]
+    return words
+
+
+def digit_words(value):
+    """One word per digit (phone numbers, codes); everything else is skipped."""
+    return [_ONES[int(c)] for c in str(value) if c.isdigit()]
+
+
+class ScriptTemplate:
+    """
+    A script split into static text and variable fields. ``segments`` holds
+    strings and Field(name, style) in script order; ``fields`` the distinct
+    field names. A script without fields is a template with no fields.
+    """
+
+    __slots__ = ("segments", "fields")
+
+    def __init__(self, segments):
+        self.segments = tuple(segments)
+        self.fields = tuple(dict.fromkeys(s.name for s in self.segments if isinstance(s, Field)))
+
+    def render_text(self, values):
+        """The script as the callee hears it; missing fields are left out."""
+        return normalize_text("".join(
+            s if isinstance(s, str) else str((values or {}).get(s.name, "")) for s in self.segments
+        ))
+
+    def preview_values(self):
+        """Stand-ins for a preview render: each field's name, or 123 for number/digit fields."""
+        return {s.name: "123" if s.style != "say" else s.name.replace("_", " ")
+                for s in self.segments if isinstance(s, Field)}
+
+
+@lru_cache(maxsize=256)
+def parse_template(text):
+    """ScriptTemplate for ``text``; ValueError on a stray brace or unknown style."""
+    segments, literal, pos = [], [], 0
+    for match in _TOKEN_RE.finditer(text):
+        literal.append(text[pos:match.start()])
+        pos = match.end()
+        token, name, style = match.group(0), match.group(1), match.group(2)
+        if token in ("{{", "}}"):
+            literal.append(token[0])
+        elif name is None:
+            raise ValueError(f"Unmatched '{token}' at character {match.start() + 1}; write '{token * 2}' for a brace")
+        elif (style or "say") not in STYLES:
+            raise ValueError(f"Unknown style '{style}' for {{{name}}}; use one of {', '.join(STYLES)}")
+        else:
+            segments.append("".join(literal))
+            literal = []
+            segments.append(Field(name, style or "say"))
+    literal.append(text[pos:])
+    segments.append("".join(literal))
+    return ScriptTemplate(s for s in segments if s != "")
+
+
+def script_template(text):
+    """The template of a script about to be spoken, or None for plain text."""
+    try:
+        template = parse_template(text)
+    except ValueError:
+        return None  # a stray brace in a script saved before templates: read it as written
+    return template if template.fields else None
+
+
+class SplicedPrompt:
+    """A finished template render, with the ChunkedPrompt interface start_ai_voice callers use."""
+
+    def __init__(self, path, rendered):
+        self.paths = [path]
+        self.rendered = rendered
+        self.hit = not rendered
+        self.first = self.done = Future()
+        self.done.set_result(path)
+
+    def playback(self):
+        return asterisk_prompt(self.paths[0])
+
+    def result(self, timeout=None):
+        return self.done.result(timeout)
+
+
+class TemplateRenderer:
+    """
+    Renders a ScriptTemplate for one call. Static fragments, spoken field
+    values and number/digit words (the clip library) are each a ChunkedPrompt, so each is
+    synthesized once per voice and then served from the TTS cache. A call
+    only pays TTS for field values nobody has used before. Clip words are
+    English, so they are only used for voices in CLIP_LANGUAGES; any other
+    voice (or one of unknown language) gets the number as digits, or the
+    digits spaced out, and reads them in its own language. Each piece's
+    source audio is resampled to 8 kHz, trimmed to ``pad_ms`` of silence
+    either side and joined sample for sample; loudness is normalized once
+    over the join, so it doesn't jump between pieces. The result is cached
+    under the list of pieces and encoded into the telephony variants, so
+    Asterisk plays one file with no gaps between the files.
+
+    Unlike a plain script, a template can't be dialed on its first sentence
+    (see ChunkedPrompt): the splice needs every piece, so the returned
+    prompt's ``first`` resolves with ``done``. The pieces still render in
+    parallel, and once a template's static text is cached a call only waits
+    for its field values.
+    """
+
+    def __init__(self, cache, synthesize, telephony=TELEPHONY, max_chars=200, pad_ms=40):
+        self.cache = cache
+        self.synthesize = synthesize
+        self.telephony = telephony
+        self.max_chars = max_chars
+        self.pad_ms = pad_ms
+
+    def _start(self, text, voice_id):
+        return ChunkedPrompt(text, voice_id, self.cache, self.synthesize, self.telephony, self.max_chars).start()
+
+    def pieces(self, template, values, language=None):
+        """Texts to render, in order: static fragments, field values or clip words for ``language``."""
+        clips = language in CLIP_LANGUAGES
+        out = []
+        for segment in template.segments:
+            if isinstance(segment, str):
+                out.append(segment)
+                continue
+            value = str((values or {}).get(segment.name, ""))
+            if not clips:
+                # The voice reads numbers in its own language; spaced out digits one by one
+                out.append(" ".join(c for c in value if c.isdigit()) if segment.style == "digits" else value)
+                continue
+            try:
+                words = {"number": number_words, "digits": digit_words}.get(segment.style, lambda v: [v])(value)
+            except ValueError:
+                words = [value]  # not a number after all: let TTS read it
+            out.extend(words)
+        return [t for t in out if normalize_text(t)]
+
+    def render(self, template, values, voice_id, language=None):
+        texts = self.pieces(template, values, language)
+        if not texts:
+            raise ValueError("Template rendered to no speech")
+        prompts = {}
+        for text in texts:  # all started before any wait, so they render in parallel
+            if text not in prompts:
+                prompts[text] = self._start(text, voice_id)
+        paths = [prompts[t].result() for t in texts]
+        rendered = sum(p.rendered for p in prompts.values())
+        return SplicedPrompt(paths[0] if len(paths) == 1 else self._splice(paths, voice_id), rendered)
+
+    def _piece_pcm(self, path):
+        pcm = resample(*read_pcm(path))
+        return trim_silence(pcm, TELEPHONY_RATE, self.telephony.silence_dbfs, pad_ms=self.pad_ms)
+
+    def _splice(self, paths, voice_id):
+        joined = []
+
+        def write(tmp):
+            pcm = self.telephony.normalize(b"".join(self._piece_pcm(p) for p in paths))
+            joined.append(pcm)
+            write_wav(tmp, pcm)
+
+        # Keyed on the pieces, so the same values spoken by the same voice are spliced once
+        key = "splice " + " ".join(p.stem for p in paths)
+        path = self.cache.get_or_create(key, voice_id, "wav", write)
+        missing = self.telephony.missing(path)
+        if missing:
+            # The spliced WAV is already 8 kHz, trimmed and normalized: encode it as is
+            self.telephony.write(path, joined[0] if joined else read_pcm(path)[0], missing)
+        return path
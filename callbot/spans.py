@@ -0,0 +1,108 @@
+import random
+import time
+
+from django.conf import settings
+
+from .metrics import REGISTRY, TTS_BUCKETS
+from .stats import percentile
+
+# Order a call goes through after it is due ("queued", its not_before). A stage
+# missing from a call (never answered, failed at login) is simply skipped.
+STAGES = ("claimed", "started", "tts", "ami_connected", "originated", "answered", "hung_up")
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "callbot_call_stage_seconds", "Time to reach each call stage from the previous one (sampled calls).",
+    ["stage"], TTS_BUCKETS + (60.0, 300.0, 900.0, 3600.0),
+)
+
+
+class CallSpans:
+    """
+    Wall-clock marks for one call attempt, from when it became due through
+    hangup. ``encode`` stores them on CallLog.timings as milliseconds spent
+    reaching each stage of STAGES from the previous stage reached, comma
+    separated in STAGES order with stages not reached left empty, e.g.
+    ``"120,3,250,1,14,4100,61000"``; CallLog.total_ms holds the sum.
+    """
+
+    __slots__ = ("queued_at", "marks")
+    sampled = True
+
+    def __init__(self, queued_at):
+        self.queued_at = queued_at
+        self.marks = {}
+
+    def mark(self, stage, at=None):
+        # First mark wins: a call's TTS or answer counts once
+        self.marks.setdefault(stage, time.time() if at is None else at)
+
+    def durations(self):
+        """[(stage, seconds from the previous reached stage)] in STAGES order."""
+        out, previous = [], self.queued_at
+        for stage in STAGES:
+            at = self.marks.get(stage)
+            if at is not None:
+                out.append((stage, max(at - previous, 0.0)))
+                previous = at
+        return out
+
+    def encode(self):
+        durations = dict(self.durations())
+        return ",".join(str(round(1000 * durations[s])) if s in durations else "" for s in STAGES)
+
+    def total_ms(self):
+        return round(1000 * sum(seconds for _, seconds in self.durations()))
+
+    def observe(self):
+        for stage, seconds in self.durations():
+            STAGE_SECONDS.labels(stage=stage).observe(seconds)
+
+
+class _Unsampled:
+    """Stands in for CallSpans on calls left out by CALL_TIMING_SAMPLE_RATE."""
+
+    __slots__ = ()
+    sampled = False
+
+    def mark(self, stage, at=None):
+        pass
+
+    def encode(self):
+        return ""
+
+    def total_ms(self):
+        return None
+
+    def observe(self):
+        pass
+
+
+UNSAMPLED = _Unsampled()
+
+
+def start_spans(queue_obj, rate=None):
+    """CallSpans for a call just claimed (sampled at CALL_TIMING_SAMPLE_RATE), or UNSAMPLED."""
+    rate = getattr(settings, "CALL_TIMING_SAMPLE_RATE", 1.0) if rate is None else rate
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        return UNSAMPLED
+    spans = CallSpans(queue_obj.not_before.timestamp())
+    spans.mark("claimed")
+    return spans
+
+
+def decode(timings):
+    """{stage: ms} from a CallLog.timings string."""
+    return {stage: int(ms) for stage, ms in zip(STAGES, (timings or "").split(",")) if ms}
+
+
+def stage_percentiles(timings_rows, percentiles=(50, 95, 99)):
+    """{stage: {"calls", "p50", ...}} in ms over an iterable of CallLog.timings strings."""
+
+    by_stage = {stage: [] for stage in STAGES}
+    for timings in timings_rows:
+        for stage, ms in decode(timings).items():
+            by_stage[stage].append(ms)
+    return {
+        stage: {"calls": len(values), **{f"p{p}": percentile(values, p) for p in percentiles}}
+        for stage, values in by_stage.items() if values
+    }
@@ -0,0 +1,10 @@
+import math
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of ``values`` (q in 0..100); 0.0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
@@ -0,0 +1,158 @@
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+
+from django.test import SimpleTestCase
+
+from ..ami_async import AMIMessage, AsyncAMIClient, AsyncAMIPool, format_action
+from ..ami_events import AMIEventListener
+from ..fake_ami import FakeAMIServer
+from ..metrics import AMI_SOCKET_LOOKUPS
+from ..models import CallCredential
+
+
+@asynccontextmanager
+async def fake_pbx(**server_options):
+    """(FakeAMIServer, its CallCredential) for the length of the block."""
+    server = await FakeAMIServer(latency=0, **server_options).start()
+    try:
+        yield server, CallCredential(ami_host="127.0.0.1", ami_port=server.port, ami_user="u", ami_pass="p")
+    finally:
+        await server.stop()
+
+
+class AMIMessageTests(SimpleTestCase):
+    def test_parse_keeps_repeated_headers(self):
+        message = AMIMessage.parse(
+            b"Response: Success\r\nActionID: a1\r\nOutput: one\r\nOutput: two: with colon\r\nnoise\r\n\r\n"
+        )
+        self.assertEqual(message.keys["ActionID"], "a1")
+        self.assertEqual(message.keys["Output"], "two: with colon")
+        self.assertEqual(message.multi["Output"], ["one", "two: with colon"])
+        self.assertEqual((message.status, message.name, message.is_error()), ("Success", None, False))
+        self.assertTrue(AMIMessage.parse(b"Response: Error\r\n\r\n").is_error())
+
+    def test_format_action_expands_lists_and_skips_none(self):
+        data = format_action("Originate", {"ActionID": "a1", "Variable": ["A=1", "B=2"], "Account": None})
+        self.assertEqual(data, b"Action: Originate\r\nActionID: a1\r\nVariable: A=1\r\nVariable: B=2\r\n\r\n")
+
+
+@asynccontextmanager
+async def reversed_pbx(actions):
+    """A PBX that reads ``actions`` actions after Login and answers them last first."""
+
+    finished = asyncio.Event()
+
+    async def session(reader, writer):
+        writer.write(b"Asterisk Call Manager/5.0.1\r\n")
+        login = AMIMessage.parse(await reader.readuntil(b"\r\n\r\n"))
+        writer.write(f"Response: Success\r\nActionID: {login.keys['ActionID']}\r\n\r\n".encode())
+        ids = [AMIMessage.parse(await reader.readuntil(b"\r\n\r\n")).keys["ActionID"] for _ in range(actions)]
+        for action_id in reversed(ids):
+            writer.write(f"Response: Success\r\nActionID: {action_id}\r\nEcho: {action_id}\r\n\r\n".encode())
+        await reader.read()  # until the client hangs up
+        writer.close()
+        finished.set()
+
+    server = await asyncio.start_server(session, "127.0.0.1", 0)
+    try:
+        yield server.sockets[0].getsockname()[1]
+        await asyncio.wait_for(finished.wait(), 2)
+    finally:
+        server.close()
+
+
+class AsyncAMIClientTests(SimpleTestCase):
+    async def test_responses_are_matched_by_action_id(self):
+        async with reversed_pbx(3) as port:
+            client = AsyncAMIClient("127.0.0.1", port, "u", "p", keepalive_interval=0)
+            await client.connect()
+            futures = [client.send_action_nowait("Ping", ActionID=f"id-{i}") for i in range(3)]
+            responses = await asyncio.wait_for(asyncio.gather(*futures), 2)
+            stats = client.stats()
+            await client.close()
+        self.assertEqual([r.keys["Echo"] for r in responses], ["id-0", "id-1", "id-2"])
+        self.assertEqual(stats["in_flight_max"], 3)  # all three were on the wire at once
+
+    async def test_pipelined_actions_share_one_socket(self):
+        async with fake_pbx() as (server, credential):
+            client = AsyncAMIClient("127.0.0.1", server.port, "u", "p", keepalive_interval=0)
+            await client.connect()
+            responses = await asyncio.gather(*(client.ping() for _ in range(20)))
+            stats = client.stats()
+            await client.close()
+        self.assertTrue(all(r.keys["Ping"] == "Pong" for r in responses))
+        self.assertEqual((stats["actions"], server.counts["logins"]), (21, 1))  # Login + 20 pings
+        self.assertGreater(stats["in_flight_max"], 1)
+
+    async def test_coroutine_subscribers_are_kept_until_done(self):
+        seen = []
+
+        async def subscriber(event):
+            await asyncio.sleep(0)
+            seen.append(event.name)
+
+        client = AsyncAMIClient("127.0.0.1", 0, "u", "p", events=True)
+        client.subscribe(subscriber, ["Hangup"])
+        client._dispatch(AMIMessage({"Event": "Newstate"}))
+        client._dispatch(AMIMessage({"Event": "Hangup"}))
+        self.assertEqual(len(client._event_tasks), 1)
+        await asyncio.gather(*client._event_tasks)
+        self.assertEqual((seen, client._event_tasks), (["Hangup"], set()))
+
+
+class AMIEventListenerTests(SimpleTestCase):
+    def test_call_events_reach_the_handler_in_order(self):
+        server = FakeAMIServer(latency=0, ring_seconds=(0, 0), call_seconds=(0, 0)).start_in_thread()
+        credential = CallCredential(ami_host="127.0.0.1", ami_port=server.port, ami_user="u", ami_pass="p")
+        events, done = [], threading.Event()
+
+        def on_event(event, source=None):
+            events.append((event.name, event.keys.get("ChannelState")))
+            if event.name == "Hangup":
+                done.set()
+
+        listener = AMIEventListener(credential, on_event, keepalive_interval=5, timeout=10)
+        listener.start()
+        try:
+            self.assertTrue(listener.connected.wait(5))
+
+            async def originate():
+                client = AsyncAMIClient("127.0.0.1", server.port, "u", "p", keepalive_interval=0)
+                await client.connect()
+                await client.send_action("Originate", Channel="Local/100", Async="true", ChannelId="c-1")
+                await client.close()
+
+            asyncio.run(originate())
+            self.assertTrue(done.wait(5))
+        finally:
+            listener.stop()
+            listener.join(5)
+            server.stop_thread()
+        self.assertEqual(events, [("Newstate", "5"), ("Newstate", "6"), ("OriginateResponse", None), ("Hangup", None)])
+        self.assertFalse(listener.is_alive())
+
+
+class AsyncAMIPoolTests(SimpleTestCase):
+    async def test_sockets_are_reused(self):
+        async with fake_pbx() as (server, credential):
+            pool = AsyncAMIPool(sockets=2, keepalive_interval=0)
+            label = f"u@127.0.0.1:{server.port}"
+            hits_before = AMI_SOCKET_LOOKUPS.labels(credential=label, result="hit").value
+            for _ in range(5):
+                response = await pool.send_action(credential, "Ping")
+                self.assertFalse(response.is_error())
+            stats = pool.stats()[label]
+            await pool.close()
+        self.assertEqual((stats["misses"], stats["hits"], stats["sockets"]), (2, 3, 2))
+        self.assertEqual(server.counts["logins"], 2)
+        self.assertEqual(AMI_SOCKET_LOOKUPS.labels(credential=label, result="hit").value - hits_before, 3)
+
+    async def test_dropped_socket_is_replaced(self):
+        async with fake_pbx() as (server, credential):
+            pool = AsyncAMIPool(sockets=1, keepalive_interval=0)
+            await (await pool.client(credential)).close()
+            await pool.send_action(credential, "Ping")
+            stats = pool.stats()[f"u@127.0.0.1:{server.port}"]
+            await pool.close()
+        self.assertEqual((stats["dropped"], stats["misses"], stats["hits"]), (1, 2, 0))
@@ -0,0 +1,49 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from ..ami_events import CallTracker
+from ..models import CallQueue, CallScript
+
+
+class EventFilterTests(TestCase):
+    def test_other_processes_calls_skip_the_db(self):
+        tracker = CallTracker(writer=mock.Mock(), call_prefix="callbot-mine-")
+        with self.assertNumQueries(0):
+            self.assertEqual(tracker._call(action_id="callbot-other-5-1"), (None, None))
+            self.assertEqual(tracker._call(uniqueid="1718000000.42"), (None, None))  # not a dialer channel
+        self.assertEqual(tracker.foreign, 2)
+
+    def test_own_untracked_call_falls_back_to_the_row(self):
+        script = CallScript.objects.create(country="USA", script_text="Hi.", credential=None)
+        tracker = CallTracker(writer=mock.Mock(), call_prefix="callbot-mine-")
+        row = CallQueue.objects.create(script=script, status="Ringing", uniqueid=tracker.call_id(1, 1))
+        queue_id, state = tracker._call(uniqueid=row.uniqueid)
+        self.assertEqual((queue_id, state["status"]), (row.pk, "Ringing"))
+
+
+class ExpireStaleTests(TestCase):
+    def setUp(self):
+        self.script = CallScript.objects.create(country="USA", script_text="Hi.", credential=None)
+        self.tracker = CallTracker(writer=mock.Mock(), call_prefix="callbot-mine-")
+        self.old = timezone.now() - timedelta(hours=2)
+
+    def row(self, status, prefix="callbot-mine-"):
+        row = CallQueue.objects.create(script=self.script, status=status, attempts=1, lease_owner="w",
+                                       lease_expires=timezone.now() + timedelta(minutes=1))
+        CallQueue.objects.filter(pk=row.pk).update(action_id=f"{prefix}{row.pk}-1", updated=self.old)
+        return row.pk
+
+    def test_only_own_untracked_calls_are_settled(self):
+        ringing, answered = self.row("Ringing"), self.row("Answered")
+        foreign, tracked = self.row("Ringing", prefix="callbot-other-"), self.row("Dialing")
+        self.tracker._calls[tracked] = {"status": "Dialing"}
+
+        self.assertEqual(self.tracker.expire_stale(3600), 2)
+        statuses = dict(CallQueue.objects.values_list("id", "status"))
+        self.assertEqual(statuses[ringing], "Queued")
+        self.assertEqual(statuses[answered], "DeadLetter")  # it may have played; never redialed
+        self.assertEqual(statuses[foreign], "Ringing")
+        self.assertEqual(statuses[tracked], "Dialing")
@@ -0,0 +1,109 @@
+import math
+import shutil
+import struct
+import tempfile
+import warnings
+import wave
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+from .. import audio
+from ..audio import TELEPHONY_RATE, TelephonyAudio, normalize, read_pcm, resample, trim_silence, write_wav
+from ..tts_cache import TTSCache
+from ..tts_chunks import ChunkedPrompt
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    import audioop
+
+
+def tone(freq, seconds, rate, amplitude=8000):
+    n = int(seconds * rate)
+    return struct.pack(f"<{n}h", *(int(amplitude * math.sin(2 * math.pi * freq * i / rate)) for i in range(n)))
+
+
+def rms_dbfs(pcm):
+    return 20 * math.log10(audioop.rms(pcm, 2) / 32767)
+
+
+class InlineExecutor:
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+class ConversionTests(SimpleTestCase):
+    def test_resample_to_8k_keeps_speech_and_filters_what_would_alias(self):
+        speech = resample(tone(1000, 1, 22050), 22050)
+        self.assertAlmostEqual(len(speech) / 2, TELEPHONY_RATE, delta=10)
+        self.assertGreater(audioop.rms(speech, 2), 0.8 * audioop.rms(tone(1000, 1, 8000), 2))
+        # 7 kHz would fold down to 1 kHz without the low-pass
+        self.assertLess(audioop.rms(resample(tone(7000, 1, 22050), 22050), 2), 0.1 * audioop.rms(speech, 2))
+
+    def test_trim_silence_keeps_padding(self):
+        silence = b"\0" * TELEPHONY_RATE  # half a second
+        pcm = trim_silence(silence + tone(440, 0.5, TELEPHONY_RATE) + silence, TELEPHONY_RATE, pad_ms=100)
+        self.assertAlmostEqual(len(pcm) / 2 / TELEPHONY_RATE, 0.7, delta=0.05)
+        self.assertEqual(trim_silence(silence, TELEPHONY_RATE), b"")
+
+    def test_normalize_reaches_target_without_clipping_peaks(self):
+        self.assertAlmostEqual(rms_dbfs(normalize(tone(440, 0.5, 8000, 500), -18.0)), -18.0, delta=0.2)
+        # A lone spike limits the gain to the peak ceiling
+        spiky = tone(440, 0.5, 8000, 100) + struct.pack("<h", 16000)
+        self.assertLessEqual(audioop.max(normalize(spiky, -18.0, -1.0), 2), audio.dbfs_to_amplitude(-1.0) + 1)
+
+    def test_read_pcm_converts_stereo_and_8_bit(self):
+        root = Path(tempfile.mkdtemp(prefix="callbot-audio-test-"))
+        self.addCleanup(shutil.rmtree, root)
+        pcm = tone(440, 0.1, 16000)
+        with wave.open(str(root / "stereo.wav"), "wb") as f:
+            f.setnchannels(2)
+            f.setsampwidth(2)
+            f.setframerate(16000)
+            f.writeframes(audioop.tostereo(pcm, 2, 1, 1))
+        self.assertEqual(read_pcm(root / "stereo.wav"), (pcm, 16000))
+        with wave.open(str(root / "byte.wav"), "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(1)
+            f.setframerate(8000)
+            f.writeframes(audioop.bias(audioop.lin2lin(pcm, 2, 1), 1, 128))
+        self.assertGreater(audioop.rms(read_pcm(root / "byte.wav")[0], 2), 0.9 * audioop.rms(pcm, 2))
+
+
+class TelephonyAudioTests(SimpleTestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp(prefix="callbot-audio-test-"))
+        self.addCleanup(shutil.rmtree, self.root)
+        self.telephony = TelephonyAudio(formats=("sln", "ulaw", "alaw"))
+
+    def test_render_writes_each_variant_from_the_same_pcm(self):
+        source = self.root / "prompt.wav"
+        write_wav(source, tone(440, 0.5, 22050, 2000), 22050)
+        written = self.telephony.render(source)
+        self.assertEqual(set(written), {"sln", "ulaw", "alaw"})
+        self.assertEqual(self.telephony.missing(source), [])
+        sln = written["sln"].read_bytes()
+        self.assertAlmostEqual(rms_dbfs(sln), -18.0, delta=0.5)
+        self.assertEqual(written["ulaw"].read_bytes(), audioop.lin2ulaw(sln, 2))
+        self.assertEqual(len(written["alaw"].read_bytes()), len(sln) // 2)
+        self.assertEqual(self.telephony.render(source), {})  # nothing missing
+
+    def test_unknown_format_is_rejected(self):
+        with self.assertRaises(ValueError):
+            TelephonyAudio(formats=("sln", "mp3"))
+
+    def test_chunked_prompt_is_normalized_once_over_all_chunks(self):
+        def synthesize(text, voice_id, filename):
+            # The second sentence comes out of TTS 12 dB quieter than the first
+            write_wav(filename, tone(440, 0.5, 22050, 4000 if text.startswith("Loud") else 1000), 22050)
+            return filename
+
+        cache = TTSCache(self.root, 10_000_000)
+        prompt = ChunkedPrompt("Loud sentence. Quiet sentence.", "v", cache, synthesize, self.telephony,
+                               max_chars=20, executor=InlineExecutor()).start()
+        path = prompt.result(5)
+        self.assertEqual(len(prompt.paths), 2)
+        sln = path.with_suffix(".sln").read_bytes()
+        half = len(sln) // 2 // 2 * 2
+        # One gain for the whole prompt: the sentences keep their 12 dB difference
+        self.assertAlmostEqual(rms_dbfs(sln[:half - 1000]) - rms_dbfs(sln[half + 1000:]), 12.0, delta=1.0)
@@ -0,0 +1,92 @@
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from .. import utils
+from ..dialer import Dialer
+from ..models import CallCredential, CallQueue, CallScript
+
+
+class DialerErrorTests(SimpleTestCase):
+    def queue_obj(self):
+        return CallQueue(pk=9, script=CallScript(country="USA", script_text="Hi.", credential=None))
+
+    async def test_failure_before_process_call_releases_row(self):
+        process_call, on_error = mock.AsyncMock(), mock.AsyncMock()
+        dialer = Dialer(process_call, concurrency=1, on_error=on_error)
+        queue_obj = self.queue_obj()
+        await dialer._dial(queue_obj, default_credential=None)  # no credential anywhere
+        process_call.assert_not_called()
+        on_error.assert_awaited_once()
+        self.assertIs(on_error.call_args.args[0], queue_obj)
+        self.assertEqual(dialer.errors, 1)
+
+    async def test_failure_inside_process_call_is_left_to_it(self):
+        process_call, on_error = mock.AsyncMock(side_effect=RuntimeError("AMI down")), mock.AsyncMock()
+        dialer = Dialer(process_call, concurrency=1, on_error=on_error)
+        await dialer._dial(self.queue_obj(), default_credential=CallCredential(pk=1))
+        on_error.assert_not_called()
+
+    async def test_zero_limits_mean_unlimited(self):
+        process_call = mock.AsyncMock()
+        dialer = Dialer(process_call, concurrency=1)
+        credential = CallCredential(pk=1, max_channels=0, max_cps=0)
+        await asyncio.wait_for(dialer._dial(self.queue_obj(), default_credential=credential), 1)
+        process_call.assert_awaited_once()
+        self.assertEqual(dialer.errors, 0)
+
+    async def test_fail_claimed_requeues_with_an_attempt(self):
+        queue_obj = self.queue_obj()
+        with mock.patch.object(utils, "WRITER", aupdate=mock.AsyncMock()) as writer:
+            await utils._fail_claimed(queue_obj, ValueError("no credential"))
+        fields = writer.aupdate.call_args.kwargs
+        self.assertEqual((fields["status"], fields["attempts"]), ("Queued", 1))
+
+
+class TrunkLimiterTests(SimpleTestCase):
+    async def test_edited_limits_resize_the_same_limiter(self):
+        dialer = Dialer(mock.AsyncMock())
+        credential = CallCredential(pk=7, ami_host="pbx", ami_port=5038, ami_user="bot", max_channels=1, max_cps=0)
+        limiter = dialer.limiter_for(credential)
+        await limiter.acquire()
+
+        blocked = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0.01)
+        self.assertFalse(blocked.done())
+
+        credential.max_channels = 2
+        self.assertIs(dialer.limiter_for(credential), limiter)
+        await asyncio.wait_for(blocked, 1)
+        self.assertEqual(limiter.in_flight, 2)
+
+        # Shrinking keeps the calls already up; new ones wait until they drop below it
+        credential.max_channels = 1
+        dialer.limiter_for(credential)
+        blocked = asyncio.create_task(limiter.acquire())
+        limiter.release()
+        await asyncio.sleep(0.01)
+        self.assertFalse(blocked.done())
+        limiter.release()
+        await asyncio.wait_for(blocked, 1)
+        self.assertEqual(limiter.in_flight, 1)
+
+    async def test_trunk_usage_is_exported(self):
+        from ..metrics import DIALER_CALLS, TRUNK_CALLS, TRUNK_CHANNELS_IN_USE, TRUNK_LIMIT
+
+        seen = {}
+
+        async def process_call(credential, queue_obj):
+            seen["in_use"] = TRUNK_CHANNELS_IN_USE.labels(credential="bot@metrics:5038").value
+
+        completed = DIALER_CALLS.labels(outcome="completed").value
+        dialer = Dialer(process_call, concurrency=1)
+        credential = CallCredential(pk=8, ami_host="metrics", ami_port=5038, ami_user="bot", max_channels=3, max_cps=50)
+        queue_obj = CallQueue(pk=9, script=CallScript(country="USA", script_text="Hi.", credential=None))
+        await dialer._dial(queue_obj, default_credential=credential)
+
+        self.assertEqual(seen["in_use"], 1)
+        self.assertEqual(TRUNK_CHANNELS_IN_USE.labels(credential="bot@metrics:5038").value, 0)
+        self.assertEqual(TRUNK_CALLS.labels(credential="bot@metrics:5038").value, 1)
+        self.assertEqual(TRUNK_LIMIT.labels(credential="bot@metrics:5038", limit="cps").value, 50)
+        self.assertEqual(DIALER_CALLS.labels(outcome="completed").value, completed + 1)
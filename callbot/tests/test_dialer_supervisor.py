@@ -0,0 +1,40 @@
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from ..dialer_supervisor import DialerSupervisor, settle_leftover_calls
+from ..models import CallQueue, CallScript
+
+
+class SizingTests(SimpleTestCase):
+    def test_sizes_to_depth_within_bounds(self):
+        supervisor = DialerSupervisor(min_workers=1, max_workers=4, calls_per_worker=100, max_lag=30)
+        self.assertEqual(supervisor.desired_workers(0, 0, 3), 1)
+        self.assertEqual(supervisor.desired_workers(250, 0, 1), 3)
+        self.assertEqual(supervisor.desired_workers(10_000, 0, 1), 4)
+
+    def test_lag_adds_a_worker(self):
+        supervisor = DialerSupervisor(min_workers=1, max_workers=4, calls_per_worker=100, max_lag=30)
+        self.assertEqual(supervisor.desired_workers(50, 120, 1), 2)
+
+
+class LeftoverCallTests(TestCase):
+    def test_killed_workers_rows_are_released_or_settled(self):
+        script = CallScript.objects.create(country="USA", script_text="Hi.", credential=None)
+        expires = timezone.now() + timezone.timedelta(minutes=5)
+
+        def row(status, owner="dead"):
+            return CallQueue.objects.create(
+                script=script, status=status, attempts=1, lease_owner=owner, lease_expires=expires,
+            ).pk
+
+        claimed, dialing, answered, other = row("Running"), row("Dialing"), row("Answered"), row("Dialing", "alive")
+        released, settled = settle_leftover_calls("dead")
+
+        self.assertEqual(released, 1)
+        self.assertEqual(sorted(settled), sorted([(dialing, "Queued"), (answered, "DeadLetter")]))
+        statuses = dict(CallQueue.objects.values_list("id", "status"))
+        self.assertEqual(statuses[claimed], "Queued")
+        self.assertEqual(statuses[dialing], "Queued")
+        self.assertEqual(statuses[answered], "DeadLetter")
+        self.assertEqual(statuses[other], "Dialing")
+        self.assertIn("answered", CallQueue.objects.get(pk=answered).last_error)
@@ -0,0 +1,96 @@
+import io
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..importer import ImportFileError, import_calls, iter_rows
+from ..models import CallQueue, CallScript
+
+
+def rows(text, fmt="csv"):
+    return list(iter_rows(io.BytesIO(text.encode("utf-8") if isinstance(text, str) else text), fmt))
+
+
+class IterRowsTests(TestCase):
+    def test_csv_rows_carry_their_line_numbers(self):
+        got = rows("\ufeffexten,script\n100,1\n200,2\n")
+        self.assertEqual(got, [(2, {"exten": "100", "script": "1"}), (3, {"exten": "200", "script": "2"})])
+
+    def test_bad_jsonl_line_is_a_rejected_row(self):
+        got = rows('{"exten": "100"}\n\nnot json\n[1]\n', "jsonl")
+        self.assertEqual(got[0], (1, {"exten": "100"}))
+        self.assertIn("invalid JSON", got[1][1]["__error__"])
+        self.assertEqual(got[1][0], 3)
+        self.assertEqual(got[2], (4, {"__error__": "expected a JSON object"}))
+
+    def test_non_utf8_file_raises_import_file_error(self):
+        with self.assertRaises(ImportFileError) as ctx:
+            rows("exten,script\n100,1\n".encode("utf-8") + "caf\xe9,1\n".encode("latin-1"))
+        self.assertIn("not UTF-8", str(ctx.exception))
+
+    def test_malformed_csv_raises_import_file_error(self):
+        with self.assertRaises(ImportFileError) as ctx:
+            # An unclosed quote swallows the rest of the file into one field
+            rows('exten,script\n100,1\n"200,1\n' + "9" * 200_000)
+        self.assertEqual(ctx.exception.line, 3)
+
+
+class ImportCallsTests(TestCase):
+    def setUp(self):
+        self.script = CallScript.objects.create(country="USA", script_text="Hi {name}.", credential=None)
+
+    def test_valid_rows_are_queued_and_bad_ones_rejected(self):
+        result = import_calls(rows(
+            "exten,script,var_name,priority,not_before\n"
+            f"+15551234,{self.script.pk},Ann,5,2024-01-01T09:00\n"
+            f"abc,{self.script.pk},,,\n"
+            "5551234,999,,,\n"
+            f"5551234,{self.script.pk},,high,\n"
+            f"5551234,{self.script.pk},,,yesterday\n"
+        ), campaign="spring", batch_size=2)
+        self.assertEqual((result.processed, result.created, result.rejected), (5, 1, 4))
+        self.assertEqual(
+            [r.reason for r in result.rejects],
+            ["invalid exten", "unknown script", "invalid priority", "invalid not_before"],
+        )
+        row = CallQueue.objects.get()
+        self.assertEqual((row.exten, row.campaign, row.priority, row.variables), ("+15551234", "spring", 5, {"name": "Ann"}))
+        self.assertEqual(row.not_before.isoformat(), "2024-01-01T09:00:00+00:00")
+
+    def test_invalid_variable_name_rejects_the_row(self):
+        result = import_calls(rows(
+            f'{{"exten": "100", "script": {self.script.pk}, "variables": {{"bad name": "x"}}}}\n', "jsonl"
+        ))
+        self.assertEqual(result.created, 0)
+        self.assertIn("invalid variable name", result.rejects[0].reason)
+
+
+class ImportViewTests(TestCase):
+    def setUp(self):
+        self.script = CallScript.objects.create(country="USA", script_text="Hi.", credential=None)
+
+    def post(self, content, name="calls.csv"):
+        return self.client.post(reverse("import_campaign"), {
+            "file": SimpleUploadedFile(name, content), "campaign": "spring",
+        })
+
+    def test_imports_valid_file(self):
+        response = self.post(f"exten,script\n100,{self.script.pk}\n".encode())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["created"], 1)
+
+    def test_unreadable_file_is_400_and_queues_nothing(self):
+        # Past the first chunk, so a partial import would have left rows behind
+        good = "".join(f"{100 + i},{self.script.pk}\n" for i in range(1500))
+        response = self.post(f"exten,script\n{good}".encode() + b"\xff\xfe,1\n")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("not UTF-8", response.json()["msg"])
+        self.assertFalse(CallQueue.objects.exists())
+
+    @override_settings(CAMPAIGN_IMPORT_MAX_UPLOAD_BYTES=10)
+    def test_oversized_upload_is_refused(self):
+        response = self.post(f"exten,script\n100,{self.script.pk}\n".encode())
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("manage.py import_campaign", response.json()["errors"]["file"][0])
+        self.assertFalse(CallQueue.objects.exists())
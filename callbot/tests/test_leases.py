@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from ..leases import claim_ids, reclaim_expired, release_leases, renew_leases
+from ..models import CallQueue, CallScript
+
+
+class LeaseTests(TestCase):
+    def setUp(self):
+        script = CallScript.objects.create(country="USA", script_text="Hi.", credential=None)
+        self.rows = [CallQueue.objects.create(script=script, exten=f"10{i}") for i in range(3)]
+        self.ids = [row.pk for row in self.rows]
+
+    def status(self, pk):
+        return CallQueue.objects.values_list("status", "lease_owner").get(pk=pk)
+
+    def test_claim_returns_rows_in_requested_order(self):
+        ids = list(reversed(self.ids))
+        claimed = claim_ids("w1", ids, 60)
+        self.assertEqual([row.pk for row in claimed], ids)
+        self.assertEqual(self.status(ids[0]), ("Running", "w1"))
+        self.assertGreater(claimed[0].lease_expires, timezone.now())
+
+    def test_rows_claimed_elsewhere_or_not_due_are_left_out(self):
+        claim_ids("w1", self.ids[:1], 60)
+        CallQueue.objects.filter(pk=self.ids[1]).update(not_before=timezone.now() + timedelta(hours=1))
+        claimed = claim_ids("w2", self.ids, 60)
+        self.assertEqual([row.pk for row in claimed], self.ids[2:])
+        self.assertEqual(self.status(self.ids[0]), ("Running", "w1"))
+
+    def test_renew_only_touches_own_rows(self):
+        claim_ids("w1", self.ids[:1], 1)
+        claim_ids("w2", self.ids[1:2], 1)
+        self.assertEqual(renew_leases("w1", 600), 1)
+        leases = dict(CallQueue.objects.filter(pk__in=self.ids[:2]).values_list("lease_owner", "lease_expires"))
+        self.assertGreater(leases["w1"], timezone.now() + timedelta(seconds=500))
+        self.assertLess(leases["w2"], timezone.now() + timedelta(seconds=5))
+
+    def test_renew_covers_calls_in_progress(self):
+        claim_ids("w1", self.ids, 1)
+        CallQueue.objects.filter(pk=self.ids[0]).update(status="Answered")
+        CallQueue.objects.filter(pk=self.ids[1]).update(status="Completed")
+        self.assertEqual(renew_leases("w1", 600), 2)
+
+    def test_reclaim_requeues_only_expired_leases(self):
+        claim_ids("dead", self.ids[:1], 60)
+        claim_ids("alive", self.ids[1:2], 60)
+        CallQueue.objects.filter(pk=self.ids[0]).update(lease_expires=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(reclaim_expired(), 1)
+        self.assertEqual(self.status(self.ids[0]), ("Queued", ""))
+        self.assertEqual(self.status(self.ids[1]), ("Running", "alive"))
+
+    def test_reclaim_settles_calls_in_progress(self):
+        claim_ids("dead", self.ids, 60)
+        CallQueue.objects.filter(pk=self.ids[0]).update(status="Dialing", attempts=1)
+        CallQueue.objects.filter(pk=self.ids[1]).update(status="Answered", attempts=1)
+        CallQueue.objects.update(lease_expires=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(reclaim_expired(), 3)
+        statuses = dict(CallQueue.objects.values_list("id", "status"))
+        self.assertEqual([statuses[pk] for pk in self.ids], ["Queued", "DeadLetter", "Queued"])
+
+    def test_release_hands_back_unstarted_rows(self):
+        claim_ids("w1", self.ids, 60)
+        CallQueue.objects.filter(pk=self.ids[0]).update(status="Dialing")
+        self.assertEqual(release_leases("w1"), 2)
+        self.assertEqual(self.status(self.ids[0]), ("Dialing", "w1"))
+        self.assertEqual(self.status(self.ids[1]), ("Queued", ""))
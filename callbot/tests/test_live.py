@@ -0,0 +1,18 @@
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+
+class LiveEventsTests(SimpleTestCase):
+    def test_wsgi_gets_no_content(self):
+        # The test client is a WSGI request: no stream that would never be sent
+        response = self.client.get(reverse("live_events"))
+        self.assertEqual(response.status_code, 204)
+
+    async def test_asgi_streams_ready_first(self):
+        response = await self.async_client.get(reverse("live_events"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        first = await anext(stream)
+        await stream.aclose()
+        self.assertIn(b"event: ready", first if isinstance(first, bytes) else first.encode())
@@ -0,0 +1,43 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+
+from ..metrics import REGISTRY, MetricsRegistry
+
+FAMILIES = [
+    "callbot_tts_pool_queue_wait_seconds", "callbot_tts_pool_job_seconds",
+    "callbot_tts_cache_lookups_total", "callbot_tts_cache_evicted_total",
+    "callbot_dialer_calls_total", "callbot_dialer_in_flight",
+    "callbot_trunk_channels_in_use", "callbot_trunk_limit", "callbot_trunk_calls_total",
+    "callbot_ami_socket_lookups_total", "callbot_ami_sockets_open",
+    "callbot_queue_depth",
+]
+
+
+class MetricsViewTests(TestCase):
+    def test_every_subsystem_is_exported(self):
+        body = self.client.get(reverse("metrics")).content.decode()
+        for name in FAMILIES:
+            self.assertIn(f"# TYPE {name} ", body)
+
+    def test_dialer_snapshots_are_merged_with_a_process_label(self):
+        # What a dialer worker publishes: its trunk and throughput numbers
+        worker = MetricsRegistry(directory="unused")
+        worker.process = "node1:dialer-0"
+        worker.gauge("callbot_trunk_channels_in_use", "Channels.", ["credential"]).labels(credential="bot@pbx:5038").set(3)
+        worker.counter("callbot_dialer_calls_total", "Calls.", ["outcome"]).labels(outcome="completed").inc(7)
+
+        with tempfile.TemporaryDirectory() as directory:
+            Path(directory, "node1_dialer-0.json").write_text(json.dumps({
+                "process": worker.process, "pid": os.getpid() + 1, "families": worker.families(),
+            }))
+            with mock.patch.object(REGISTRY, "directory", Path(directory)):
+                body = self.client.get(reverse("metrics")).content.decode()
+
+        self.assertIn('callbot_trunk_channels_in_use{process="node1:dialer-0",credential="bot@pbx:5038"} 3.0', body)
+        self.assertIn('callbot_dialer_calls_total{process="node1:dialer-0",outcome="completed"} 7.0', body)
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from .. import views
+from ..models import CallQueue, CallScript
+from ..pagination import decode_position, encode_position, keyset_page
+
+
+class PositionTests(SimpleTestCase):
+    def test_round_trip_keeps_microseconds(self):
+        at = datetime(2024, 5, 1, 12, 30, 45, 123457, tzinfo=timezone.utc)
+        self.assertEqual(decode_position(encode_position(at, 42)), (at, 42))
+
+    def test_garbage_is_no_position(self):
+        for raw in (None, "", "abc", "1.2.3", "x.5"):
+            self.assertIsNone(decode_position(raw))
+
+
+class KeysetPageTests(TestCase):
+    def setUp(self):
+        script = CallScript.objects.create(country="USA", script_text="Hi.", credential=None)
+        base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.rows = []
+        # Pairs share a timestamp, so pages have to break ties on id
+        for i in range(7):
+            row = CallQueue.objects.create(script=script)
+            CallQueue.objects.filter(pk=row.pk).update(timestamp=base + timedelta(seconds=i // 2))
+            self.rows.append(row.pk)
+
+    def expected(self):
+        stamps = dict(CallQueue.objects.values_list("id", "timestamp"))
+        return sorted(self.rows, key=lambda pk: (stamps[pk], pk), reverse=True)
+
+    def test_pages_walk_every_row_once_newest_first(self):
+        seen, cursor, pages = [], None, 0
+        while True:
+            page = keyset_page(CallQueue.objects.all(), cursor, 2)
+            seen.extend(row.pk for row in page)
+            pages += 1
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, self.expected())
+        self.assertEqual(pages, 4)
+
+    def test_rows_added_meanwhile_dont_shift_later_pages(self):
+        first = keyset_page(CallQueue.objects.all(), None, 3)
+        CallQueue.objects.create(script=CallScript.objects.get())  # newer than everything
+        second = keyset_page(CallQueue.objects.all(), first.next_cursor, 3)
+        self.assertEqual([r.pk for r in first] + [r.pk for r in second], self.expected()[:6])
+
+    def test_last_page_has_no_cursor(self):
+        page = keyset_page(CallQueue.objects.all(), None, 7)
+        self.assertEqual((len(page), page.next_cursor), (7, None))
+
+    def test_dashboard_follows_the_cursor(self):
+        with mock.patch.object(views, "DASHBOARD_PAGE_SIZE", 3):
+            first = self.client.get(reverse("home")).context["queue"]
+            second = self.client.get(reverse("home"), {"queue_before": first.next_cursor}).context["queue"]
+            bad = self.client.get(reverse("home"), {"queue_before": "not-a-cursor"}).context["queue"]
+        self.assertEqual([r.pk for r in first] + [r.pk for r in second], self.expected()[:6])
+        self.assertEqual([r.pk for r in bad], self.expected()[:3])
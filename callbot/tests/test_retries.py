@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .. import retries
+from ..ami_async import AMILoginError
+from ..models import CallQueue, CallScript
+
+NOW = datetime(2024, 5, 6, 12, 0, tzinfo=timezone.utc)
+
+
+class RetryPolicyTests(SimpleTestCase):
+    @override_settings(CALL_RETRY_POLICIES={"error": {"max_attempts": 9, "base_delay": 1}})
+    def test_settings_are_the_only_source(self):
+        self.assertEqual(retries.get_policy(retries.ERROR).max_attempts, 9)
+        # Classes the setting leaves out use its error policy, not the module defaults
+        self.assertEqual(retries.get_policy(retries.LOGIN).max_attempts, 9)
+
+    @override_settings(CALL_RETRY_POLICIES={
+        "login": {"max_attempts": 6, "base_delay": 1}, "rejected": {"max_attempts": 3, "base_delay": 1},
+    })
+    def test_max_attempts_counts_every_failure_class(self):
+        queue_obj = CallQueue(pk=1, attempts=3)  # three login failures so far
+        self.assertIsNone(retries.apply_failure(queue_obj, retries.REJECTED, "rejected"))
+        self.assertEqual(queue_obj.status, retries.DEAD_LETTER)
+
+    def test_backoff_grows_and_caps(self):
+        policy = retries.RetryPolicy(max_attempts=10, base_delay=30, factor=2, max_delay=200, jitter=0)
+        self.assertEqual([policy.delay(n) for n in range(1, 6)], [30, 60, 120, 200, 200])
+
+    def test_jitter_stays_within_bounds(self):
+        policy = retries.RetryPolicy(max_attempts=10, base_delay=100, jitter=0.1)
+        for _ in range(50):
+            self.assertTrue(90 <= policy.delay(1) <= 110)
+
+    @override_settings(CALL_RETRY_JITTER=0, CALL_RETRY_POLICIES={
+        "no_answer": {"max_attempts": 3, "base_delay": 600, "factor": 2, "max_delay": 7200},
+    })
+    def test_failure_requeues_with_backoff_then_dead_letters(self):
+        queue_obj = CallQueue(pk=1, attempts=2, status="Dialing", lease_owner="w1")
+        self.assertEqual(retries.apply_failure(queue_obj, retries.NO_ANSWER, "busy", now=NOW), 1200)
+        self.assertEqual((queue_obj.status, queue_obj.lease_owner), ("Queued", ""))
+        self.assertEqual(queue_obj.not_before, NOW + timedelta(seconds=1200))
+        self.assertEqual(queue_obj.last_failure, retries.NO_ANSWER)
+
+        queue_obj.attempts = 3
+        self.assertIsNone(retries.apply_failure(queue_obj, retries.NO_ANSWER, "busy", now=NOW))
+        self.assertEqual(queue_obj.status, retries.DEAD_LETTER)
+        self.assertNotIn("not_before", retries.failure_fields(queue_obj))
+
+
+class ClassifyTests(SimpleTestCase):
+    def test_failure_classes(self):
+        rejected = SimpleNamespace(keys={"Message": "Originate failed"})
+        self.assertEqual(retries.classify(AMILoginError("denied")), retries.LOGIN)
+        self.assertEqual(retries.classify(retries.OriginateRejected(rejected)), retries.REJECTED)
+        self.assertEqual(retries.classify(retries.OriginateRejected(rejected, reason=5)), retries.NO_ANSWER)
+        self.assertEqual(retries.classify(retries.OriginateRejected(SimpleNamespace(keys={"Message": "Busy"}))), retries.NO_ANSWER)
+        self.assertEqual(retries.classify(RuntimeError("boom")), retries.ERROR)
+
+
+class DeadLetterTests(TestCase):
+    def setUp(self):
+        script = CallScript.objects.create(country="USA", script_text="Hi.", credential=None)
+        self.dead = [
+            CallQueue.objects.create(script=script, status=retries.DEAD_LETTER, attempts=4, campaign=campaign,
+                                     last_failure=failure)
+            for campaign, failure in [("a", retries.LOGIN), ("a", retries.NO_ANSWER), ("b", retries.LOGIN)]
+        ]
+        CallQueue.objects.create(script=script, status="Queued", campaign="a")
+
+    def test_filters(self):
+        self.assertEqual(retries.dead_letters().count(), 3)
+        self.assertEqual(retries.dead_letters(campaign="a").count(), 2)
+        self.assertEqual(retries.dead_letters(campaign="a", failure_class=retries.LOGIN).get(), self.dead[0])
+
+    def test_requeue_only_touches_dead_letters(self):
+        self.assertEqual(retries.requeue(CallQueue.objects.filter(campaign="a")), 2)
+        row = CallQueue.objects.get(pk=self.dead[0].pk)
+        self.assertEqual((row.status, row.attempts), ("Queued", 0))
+        self.assertEqual(CallQueue.objects.get(pk=self.dead[2].pk).status, retries.DEAD_LETTER)
+
+    @override_settings(CALL_RETRY_JITTER=0)
+    def test_schedule_retry_skips_rows_that_moved_on(self):
+        row = CallQueue.objects.create(script=self.dead[0].script, status="Completed", attempts=1)
+        retries.schedule_retry(row, retries.ERROR, "late", from_statuses=("Running",))
+        self.assertEqual(CallQueue.objects.get(pk=row.pk).status, "Completed")
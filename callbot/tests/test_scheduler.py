@@ -0,0 +1,112 @@
+import asyncio
+import heapq
+from datetime import datetime, time, timedelta, timezone
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from .. import scheduler
+from ..models import CallingWindow, CallQueue, CallScript
+from ..scheduler import CallingWindows, CallScheduler
+
+UTC = timezone.utc
+
+
+def window(start, end, weekdays="0123456", country="Pakistan", time_zone="Asia/Karachi"):
+    return CallingWindow(country=country, time_zone=time_zone, start=start, end=end, weekdays=weekdays)
+
+
+class NextOpenTests(SimpleTestCase):
+    # Asia/Karachi is UTC+5 all year
+    def test_no_window_means_now(self):
+        when = datetime(2024, 5, 6, 3, 0, tzinfo=UTC)
+        self.assertEqual(CallingWindows([]).next_open("Pakistan", when), when)
+
+    def test_inside_window_is_unchanged(self):
+        when = datetime(2024, 5, 6, 6, 0, tzinfo=UTC)  # 11:00 local
+        windows = CallingWindows([window(time(9), time(18))])
+        self.assertEqual(windows.next_open(" pakistan ", when), when)
+
+    def test_before_and_after_hours_move_to_next_opening(self):
+        windows = CallingWindows([window(time(9), time(18))])
+        early = datetime(2024, 5, 6, 1, 0, tzinfo=UTC)  # 06:00 local
+        late = datetime(2024, 5, 6, 14, 0, tzinfo=UTC)  # 19:00 local
+        self.assertEqual(windows.next_open("Pakistan", early), datetime(2024, 5, 6, 4, 0, tzinfo=UTC))
+        self.assertEqual(windows.next_open("Pakistan", late), datetime(2024, 5, 7, 4, 0, tzinfo=UTC))
+
+    def test_skips_closed_weekdays(self):
+        # Friday 19:00 local, weekdays only: next opening is Monday 09:00
+        windows = CallingWindows([window(time(9), time(18), weekdays="01234")])
+        when = datetime(2024, 5, 10, 14, 0, tzinfo=UTC)
+        self.assertEqual(windows.next_open("Pakistan", when), datetime(2024, 5, 13, 4, 0, tzinfo=UTC))
+
+    def test_overnight_window_opened_yesterday(self):
+        windows = CallingWindows([window(time(22), time(2))])
+        when = datetime(2024, 5, 6, 20, 0, tzinfo=UTC)  # 01:00 local, the window opened at 22:00
+        self.assertEqual(windows.next_open("Pakistan", when), when)
+
+
+class ReleaseTests(SimpleTestCase):
+    async def test_due_calls_go_out_highest_priority_first(self):
+        feed = asyncio.Queue(maxsize=2)
+        sched = CallScheduler("w1", feed, lease_seconds=60)
+        now = datetime.now(UTC)
+        for eligible_at, priority, pk in [
+            (now - timedelta(minutes=5), 1, 1),
+            (now - timedelta(seconds=1), 5, 2),
+            (now - timedelta(minutes=1), 3, 3),
+            (now + timedelta(hours=1), 9, 4),
+        ]:
+            heapq.heappush(sched._heap, (eligible_at, -priority, pk))
+            sched._known.add(pk)
+
+        def claim(worker_id, ids, lease_seconds):
+            return [SimpleNamespace(pk=pk, not_before=now) for pk in ids]
+
+        with mock.patch.object(scheduler, "claim_ids", side_effect=claim):
+            task = asyncio.create_task(sched._release_loop())
+            try:
+                first = await asyncio.wait_for(feed.get(), 1)
+                second = await asyncio.wait_for(feed.get(), 1)
+                third = await asyncio.wait_for(feed.get(), 1)
+            finally:
+                task.cancel()
+        self.assertEqual([first.pk, second.pk, third.pk], [2, 3, 1])
+        # The future call stays scheduled
+        self.assertEqual([pk for _, _, pk in sched._heap], [4])
+        self.assertEqual(sched._known, {4})
+
+
+class FetchUpcomingTests(TestCase):
+    def setUp(self):
+        self.script = CallScript.objects.create(country="Pakistan", script_text="Hi.", credential=None)
+
+    def queue(self, not_before, priority=0, country=""):
+        return CallQueue.objects.create(script=self.script, not_before=not_before, priority=priority, country=country).pk
+
+    def test_urgent_due_call_is_not_hidden_behind_old_backlog(self):
+        now = datetime.now(UTC)
+        for i in range(5):
+            self.queue(now - timedelta(hours=1, minutes=i))
+        urgent = self.queue(now - timedelta(seconds=1), priority=10)
+        soon = self.queue(now + timedelta(seconds=30))
+        self.queue(now + timedelta(hours=2))  # past the horizon
+
+        rows = CallScheduler("w1", asyncio.Queue(), 60, horizon=300, batch=2)._fetch_upcoming()
+        pks = [pk for _, _, pk in rows]
+        self.assertEqual(len(pks), 3)
+        self.assertEqual(pks[0], urgent)
+        self.assertEqual(pks[2], soon)
+
+    def test_calls_outside_the_window_are_deferred_in_the_db(self):
+        now = datetime.now(UTC)
+        opens = datetime.combine(now.date() + timedelta(days=2), time(9), tzinfo=UTC)
+        CallingWindow.objects.create(
+            country="pakistan", time_zone="UTC", start=time(9), end=time(17), weekdays=str(opens.weekday()),
+        )
+        pk = self.queue(now)
+        sched = CallScheduler("w1", asyncio.Queue(), 60)
+        self.assertEqual(sched._fetch_upcoming(), [(opens, 0, pk)])
+        self.assertEqual(CallQueue.objects.get(pk=pk).not_before, opens)
+        self.assertEqual(sched.deferred, 1)
@@ -0,0 +1,101 @@
+import math
+import shutil
+import struct
+import tempfile
+import threading
+import warnings
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+from ..audio import TELEPHONY_RATE, TelephonyAudio, write_wav
+from ..script_templates import TemplateRenderer, digit_words, number_words, parse_template, script_template
+from ..tts_cache import TTSCache
+from ..voices import VoiceCatalogue
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    import audioop
+
+TEMPLATE = "Hello {name}, your code is {code:digits} and you owe {amount:number}."
+
+
+class ParseTests(SimpleTestCase):
+    def test_fields_styles_and_literal_braces(self):
+        template = parse_template("Hi {name}, {{not a field}} {amount:number}")
+        self.assertEqual(template.fields, ("name", "amount"))
+        self.assertEqual(template.render_text({"name": "Ayesha", "amount": 5}), "Hi Ayesha, {not a field} 5")
+
+    def test_stray_brace_is_plain_text(self):
+        with self.assertRaises(ValueError):
+            parse_template("Hi {name")
+        self.assertIsNone(script_template("Hi {name"))
+        self.assertIsNone(script_template("No fields here."))
+
+    def test_number_and_digit_words(self):
+        self.assertEqual(number_words("1,205.5"), ["one", "thousand", "two", "hundred", "five", "point", "five"])
+        self.assertEqual(number_words("-40"), ["minus", "forty"])
+        self.assertEqual(digit_words("03-1"), ["zero", "three", "one"])
+        with self.assertRaises(ValueError):
+            number_words("twelve")
+
+
+class PiecesTests(SimpleTestCase):
+    values = {"name": "Ayesha", "code": "4-07", "amount": "1250"}
+
+    def test_english_voices_use_the_clip_library(self):
+        pieces = TemplateRenderer(None, None).pieces(parse_template(TEMPLATE), self.values, "en")
+        self.assertEqual(pieces, ["Hello ", "Ayesha", ", your code is ", "four", "zero", "seven", " and you owe ",
+                                  "one", "thousand", "two", "hundred", "fifty", "."])
+
+    def test_other_voices_read_numbers_themselves(self):
+        renderer = TemplateRenderer(None, None)
+        for language in ("ur", None):
+            self.assertEqual(renderer.pieces(parse_template(TEMPLATE), self.values, language),
+                             ["Hello ", "Ayesha", ", your code is ", "4 0 7", " and you owe ", "1250", "."])
+
+    def test_voice_language_comes_from_the_engine_list(self):
+        voices = VoiceCatalogue()
+        voices._build([("v-en", "English", ["en-us"]), ("v-ur", "Urdu", ["ur_PK"]), ("untagged", "Robot", [])])
+        self.assertEqual([voices.language(v) for v in ("v-en", "v-ur", "untagged", "missing")], ["en", "ur", None, None])
+
+
+class SpliceTests(SimpleTestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp(prefix="callbot-template-test-"))
+        self.addCleanup(shutil.rmtree, self.root)
+        self.calls = []
+        self.lock = threading.Lock()
+        self.renderer = TemplateRenderer(TTSCache(self.root, 10_000_000), self.synthesize,
+                                         TelephonyAudio(formats=("sln", "ulaw")), pad_ms=40)
+
+    def synthesize(self, text, voice_id, filename):
+        # 0.3 s of tone between 0.2 s of silence; field values come out of TTS louder than the rest
+        with self.lock:
+            self.calls.append(text)
+        n = int(0.3 * 22050)
+        amplitude = 8000 if text == "Ayesha" else 2000
+        tone = struct.pack(f"<{n}h", *(int(amplitude * math.sin(2 * math.pi * 440 * i / 22050)) for i in range(n)))
+        silence = b"\0" * (2 * 4410)
+        write_wav(filename, silence + tone + silence, 22050)
+
+    def test_pieces_are_trimmed_joined_and_normalized_once(self):
+        prompt = self.renderer.render(parse_template("Hello {name}, goodbye."), {"name": "Ayesha"}, "v", "en")
+        self.assertTrue(prompt.first.done())  # nothing to dial on early: the splice needs every piece
+        self.assertEqual(sorted(self.calls), [", goodbye.", "Ayesha", "Hello"])
+        sln = prompt.paths[0].with_suffix(".sln").read_bytes()
+        # Three pieces of 0.3 s tone plus 40 ms of padding each side
+        self.assertAlmostEqual(len(sln) / 2 / TELEPHONY_RATE, 3 * 0.38, delta=0.05)
+        self.assertAlmostEqual(20 * math.log10(audioop.rms(sln, 2) / 32767), -18.0, delta=0.5)
+        self.assertTrue(prompt.paths[0].with_suffix(".ulaw").exists())
+
+    def test_same_values_are_served_from_the_cache(self):
+        template = parse_template("Hello {name}, you owe {amount:number}.")
+        first = self.renderer.render(template, {"name": "Ayesha", "amount": "20"}, "v", "en")
+        self.assertEqual(first.rendered, 5)
+        again = self.renderer.render(template, {"name": "Ayesha", "amount": "20"}, "v", "en")
+        self.assertEqual((again.rendered, again.hit, again.paths), (0, True, first.paths))
+        # A new value only synthesizes itself; the static text and clips are reused
+        self.calls.clear()
+        self.renderer.render(template, {"name": "Bilal", "amount": "20"}, "v", "en")
+        self.assertEqual(self.calls, ["Bilal"])
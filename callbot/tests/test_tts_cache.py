@@ -0,0 +1,102 @@
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+from ..metrics import TTS_CACHE_LOOKUPS
+from ..tts_cache import TTSCache, cache_key
+
+
+def render(data=b"x" * 100, calls=None, delay=0):
+    def synthesize(tmp):
+        if calls is not None:
+            calls.append(tmp)
+        time.sleep(delay)
+        Path(tmp).write_bytes(data)
+    return synthesize
+
+
+class TTSCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp(prefix="callbot-cache-test-"))
+
+    def cache(self, max_bytes=10_000, **options):
+        return TTSCache(self.root, max_bytes, **options)
+
+    def age(self, path, seconds):
+        old = time.time() - seconds
+        os.utime(path, (old, old))
+
+    def test_whitespace_variants_share_an_entry(self):
+        cache, calls = self.cache(), []
+        first = cache.get_or_create("Hello  world", "v", "wav", render(calls=calls))
+        second = cache.get_or_create(" Hello world ", "v", "wav", render(calls=calls))
+        self.assertEqual(first, second)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_least_recently_used_prompt_is_evicted_with_its_variants(self):
+        cache = self.cache(max_bytes=280, touch_interval=0, rescan_bytes=10_000)
+        oldest = cache.get_or_create("one", "v", "wav", render())
+        oldest.with_suffix(".ulaw").write_bytes(b"u" * 50)  # a telephony variant goes with it
+        used = cache.get_or_create("two", "v", "wav", render())
+        self.age(oldest, 300)
+        self.age(oldest.with_suffix(".ulaw"), 300)
+        self.age(used, 200)
+        cache.get_or_create("two", "v", "wav", render())  # a hit refreshes its mtime
+        cache.get_or_create("three", "v", "wav", render())  # over the limit
+        self.assertFalse(oldest.exists())
+        self.assertFalse(oldest.with_suffix(".ulaw").exists())
+        self.assertTrue(used.exists())
+        self.assertEqual(cache.stats()["evicted"], 1)
+
+    def test_concurrent_misses_render_once(self):
+        cache, calls = self.cache(), []
+        synthesize = render(calls=calls, delay=0.1)
+        threads = [threading.Thread(target=cache.get_or_create, args=("same", "v", "wav", synthesize)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats()["coalesced"], 3)
+
+    def test_waits_for_another_process_holding_the_lock(self):
+        cache, calls = self.cache(), []
+        path = cache.path_for(cache_key("held", "v", "wav"), "wav")
+        path.parent.mkdir(parents=True)
+        lock = path.with_name(path.name + TTSCache.LOCK_SUFFIX)
+        lock.write_text("12345")
+        # The other process finishes its render after a moment
+        threading.Timer(0.2, lambda: (path.write_bytes(b"y" * 10), lock.unlink())).start()
+        self.assertEqual(cache.get_or_create("held", "v", "wav", render(calls=calls)), path)
+        self.assertEqual(calls, [])
+        self.assertEqual(path.read_bytes(), b"y" * 10)
+
+    def test_stale_lock_of_a_dead_process_is_taken_over(self):
+        cache, calls = self.cache(lock_timeout=5), []
+        path = cache.path_for(cache_key("orphan", "v", "wav"), "wav")
+        path.parent.mkdir(parents=True)
+        lock = path.with_name(path.name + TTSCache.LOCK_SUFFIX)
+        lock.write_text("12345")
+        self.age(lock, 60)
+        cache.get_or_create("orphan", "v", "wav", render(calls=calls))
+        self.assertEqual(len(calls), 1)
+        self.assertFalse(lock.exists())
+
+    def test_failed_render_leaves_no_files(self):
+        cache = self.cache()
+        with self.assertRaises(RuntimeError):
+            cache.get_or_create("empty", "v", "wav", render(data=b""))
+        self.assertEqual([p for p in self.root.rglob("*") if p.is_file()], [])
+
+    def test_results_are_exported(self):
+        hits = TTS_CACHE_LOOKUPS.labels(result="hit")
+        before = hits.value
+        cache = self.cache()
+        cache.get_or_create("metric", "v", "wav", render())
+        cache.get_or_create("metric", "v", "wav", render())
+        self.assertEqual(hits.value - before, 1)
@@ -0,0 +1,48 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import CallScript, TTSJob
+from ..tts_jobs import recover_stale_jobs
+
+
+class RecoverStaleJobsTests(TestCase):
+    def setUp(self):
+        self.script = CallScript.objects.create(country="USA", script_text="Hello.", credential=None)
+
+    def job(self, status, age):
+        job = TTSJob.objects.create(script=self.script, status=status)
+        # auto_now: backdate with update()
+        TTSJob.objects.filter(pk=job.pk).update(updated=timezone.now() - timedelta(seconds=age))
+        return job
+
+    def test_stale_pending_resubmitted_and_running_failed(self):
+        pending, running = self.job("Pending", 3600), self.job("Running", 3600)
+        fresh, done = self.job("Pending", 1), self.job("Done", 3600)
+        with mock.patch("callbot.tts_jobs._EXECUTOR") as executor:
+            self.assertEqual(recover_stale_jobs(stale_after=600), (1, 1))
+        executor.submit.assert_called_once()
+        self.assertEqual(executor.submit.call_args.args[1], pending.pk)
+        running.refresh_from_db()
+        self.assertEqual(running.status, "Failed")
+        self.assertIn("restart", running.error)
+        for job, status in ((pending, "Pending"), (fresh, "Pending"), (done, "Done")):
+            job.refresh_from_db()
+            self.assertEqual(job.status, status)
+
+    def test_status_poll_fails_interrupted_job(self):
+        running = self.job("Running", 3600)
+        with mock.patch("callbot.tts_jobs._EXECUTOR"):
+            response = self.client.get(reverse("tts_job_status", args=[running.pk]))
+        self.assertEqual(response.json()["status"], "Failed")
+
+    def test_resubmitted_job_runs_once(self):
+        from ..tts_jobs import run_tts_job
+
+        job = self.job("Running", 0)
+        with mock.patch("callbot.tts_jobs.generate_ai_voice") as generate:
+            run_tts_job(job.pk)  # already claimed by another thread
+        generate.assert_not_called()
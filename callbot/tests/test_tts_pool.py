@@ -0,0 +1,26 @@
+from django.test import SimpleTestCase
+
+from ..metrics import TTS_POOL_JOB_SECONDS, TTS_POOL_QUEUE_WAIT_SECONDS
+from ..tts_pool import TTSWorkerPool
+
+
+def histogram_count(child):
+    return child.samples()[-1][2]
+
+
+class TTSWorkerPoolTests(SimpleTestCase):
+    def test_job_timings_reach_metrics(self):
+        waits = histogram_count(TTS_POOL_QUEUE_WAIT_SECONDS.labels())
+        pool = TTSWorkerPool(size=1, job_timeout=60)
+        try:
+            try:
+                pool.list_voices()
+                outcome = "ok"
+            except RuntimeError:
+                outcome = "failed"  # no TTS engine on this machine: still a timed job
+            runs = TTS_POOL_JOB_SECONDS.labels(outcome=outcome)
+            self.assertEqual(histogram_count(TTS_POOL_QUEUE_WAIT_SECONDS.labels()) - waits, 1)
+            self.assertGreaterEqual(histogram_count(runs), 1)
+            self.assertEqual(pool.stats()["queue_wait_seconds"]["count"], 1)
+        finally:
+            pool.shutdown()
@@ -0,0 +1,60 @@
+from concurrent.futures import Future
+from types import SimpleNamespace
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from .. import utils
+from ..models import CallCredential, CallQueue, CallScript
+
+
+class OriginateFieldsTests(SimpleTestCase):
+    def originate(self, credential=None, **row):
+        """Run async_process_call up to its Originate and return (Originate fields, TTS country)."""
+        script = CallScript(pk=3, country="USA", script_text="Hello.", exten="", caller_id="")
+        queue_obj = CallQueue(pk=7, script=script, attempts=1, not_before=timezone.now(), **row)
+        credential = credential or CallCredential(ami_host="pbx", ami_user="u", ami_pass="p")
+        sent = {}
+
+        async def send_action(credential, action, **fields):
+            sent.update(fields, Action=action)
+            raise RuntimeError("stop after the Originate")
+
+        async def client(credential):
+            return None
+
+        ready = Future()
+        ready.set_result("media/tts/x.wav")
+        prompt = SimpleNamespace(first=ready, done=ready, playback=lambda: "/media/tts/x")
+        with mock.patch.object(utils, "start_ai_voice", return_value=prompt) as start, \
+                mock.patch.object(utils, "generate_ai_voice") as generate, \
+                mock.patch.object(utils, "_ami", return_value=SimpleNamespace(client=client, send_action=send_action)), \
+                mock.patch.object(utils, "AMI_EVENTS"), \
+                mock.patch.object(utils, "WRITER", aupdate=mock.AsyncMock(), acreate=mock.AsyncMock()):
+            async_to_sync(utils.async_process_call)(credential, queue_obj)
+        generate.assert_not_called()  # nothing renders the whole prompt before dialing
+        return sent, start.call_args.args[1]
+
+    def test_row_overrides_are_dialed(self):
+        sent, country = self.originate(
+            credential=CallCredential(ami_host="pbx", ami_user="u", ami_pass="p", sip_endpoint="trunk1"),
+            exten="+923001234567", caller_id="Bank", country="Pakistan",
+        )
+        self.assertEqual(sent["Action"], "Originate")
+        self.assertEqual(sent["Channel"], "SIP/trunk1/+923001234567")
+        self.assertEqual(sent["Exten"], "+923001234567")
+        self.assertEqual(sent["CallerID"], "Bank")
+        self.assertEqual(country, "Pakistan")
+
+    def test_old_constants_are_only_a_fallback(self):
+        sent, country = self.originate()
+        self.assertEqual((sent["Channel"], sent["Exten"], sent["CallerID"]), ("SIP/1011", "1000", "AI Bot"))
+        self.assertEqual(country, "USA")
+
+    def test_dialplan_is_told_how_to_wait_for_chunks(self):
+        sent, _ = self.originate()
+        playlist, ready = sent["Variable"].split(",")
+        self.assertEqual(playlist, "CALLBOT_PROMPT=/media/tts/x")
+        self.assertEqual(ready, f"CALLBOT_PROMPT_READY={utils._ready_format()}")
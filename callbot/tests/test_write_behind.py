@@ -0,0 +1,80 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import DatabaseError, connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ..models import CallQueue, CallScript
+from ..write_behind import WriteBehindBuffer
+
+
+class WriteBehindStampTests(TestCase):
+    def test_updated_is_stamped_at_flush(self):
+        script = CallScript.objects.create(country="USA", script_text="Hi.", credential=None)
+        row = CallQueue.objects.create(script=script)
+        queued_at = timezone.now() - timedelta(seconds=30)  # queued, then a slow flush
+        flushed_after = timezone.now()
+        WriteBehindBuffer._write({(CallQueue, row.pk): {"status": "Ringing", "updated": queued_at}}, [])
+        row.refresh_from_db()
+        self.assertEqual(row.status, "Ringing")
+        self.assertGreaterEqual(row.updated, flushed_after)
+
+
+@mock.patch.object(WriteBehindBuffer, "_ensure_thread")  # flushed by hand, on the test's connection
+class WriteBehindFlushTests(TestCase):
+    def setUp(self):
+        script = CallScript.objects.create(country="USA", script_text="Hi.", credential=None)
+        self.rows = [CallQueue.objects.create(script=script).pk for _ in range(3)]
+        self.writer = WriteBehindBuffer(max_failures=3)
+
+    def test_updates_to_a_row_are_coalesced(self, _):
+        for status in ("Dialing", "Ringing", "Answered"):
+            self.writer.update(CallQueue, self.rows[0], status=status)
+        self.writer.update(CallQueue, self.rows[0], hangup_cause="16")
+        self.assertEqual(self.writer.pending(), 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.writer.flush(), 1)
+        self.assertEqual(sum(q["sql"].startswith("UPDATE") for q in queries), 1)
+        row = CallQueue.objects.get(pk=self.rows[0])
+        self.assertEqual((row.status, row.hangup_cause), ("Answered", "16"))
+        self.assertEqual(self.writer.stats()["updates_coalesced"], 3)
+
+    def test_failed_flush_keeps_writes_and_newer_values_win(self, _):
+        self.writer.update(CallQueue, self.rows[0], status="Ringing")
+        with mock.patch.object(WriteBehindBuffer, "_write", side_effect=DatabaseError("locked")), \
+                self.assertLogs("callbot.write_behind", "WARNING"):
+            self.assertEqual(self.writer.flush(), 0)
+        self.writer.update(CallQueue, self.rows[0], status="Answered")
+        self.assertEqual(self.writer.pending(), 1)
+        self.assertEqual(self.writer.flush(), 1)
+        self.assertEqual(CallQueue.objects.get(pk=self.rows[0]).status, "Answered")
+        self.assertEqual(self.writer.stats()["failing"], 0)
+
+    def test_repeated_failures_write_rows_one_by_one_and_keep_the_bad_one(self, _):
+        bad = self.rows[1]
+        write = WriteBehindBuffer._write
+
+        def fail_on_bad(updates, creates):
+            if any(pk == bad for _, pk in updates):
+                raise DatabaseError("value too long")
+            write(updates, creates)
+
+        for pk in self.rows:
+            self.writer.update(CallQueue, pk, status="Completed")
+        with mock.patch.object(WriteBehindBuffer, "_write", side_effect=fail_on_bad):
+            with self.assertLogs("callbot.write_behind", "WARNING"):
+                self.writer.flush()
+                self.writer.flush()
+            self.assertEqual(self.writer.pending(), 3)  # nothing written or lost yet
+            with self.assertLogs("callbot.write_behind", "ERROR") as logs:
+                self.assertEqual(self.writer.flush(), 2)
+        self.assertIn(f"CallQueue:{bad}", logs.output[0])
+        statuses = dict(CallQueue.objects.values_list("id", "status"))
+        self.assertEqual([statuses[pk] for pk in self.rows], ["Completed", "Queued", "Completed"])
+        self.assertEqual(self.writer.pending(), 1)
+
+        # Once the row can be written it goes out with the next flush
+        self.assertEqual(self.writer.flush(), 1)
+        self.assertEqual(CallQueue.objects.get(pk=bad).status, "Completed")
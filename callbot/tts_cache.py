@@ -0,0 +1,243 @@
+import hashlib
+import os
+import threading
+import time
+import unicodedata
+from pathlib import Path
+
+from django.conf import settings
+
+from .metrics import TTS_CACHE_BYTES, TTS_CACHE_EVICTED, TTS_CACHE_LOOKUPS
+
+
+def normalize_text(text):
+    """Scripts that only differ in whitespace or Unicode form render the same audio."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(text, voice_id, fmt):
+    payload = "\0".join([normalize_text(text), voice_id or "", fmt])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+_RESULTS = {"hits": "hit", "misses": "miss", "coalesced": "coalesced"}
+
+
+class TTSCache:
+    """
+    Content-addressed store of synthesized prompts under ``root``.
+
+    Files are named by ``cache_key`` so identical (text, voice, format) requests
+    share one file. Concurrent misses for the same key are coalesced: threads in
+    this process wait on an Event, other processes wait on an O_EXCL lock file
+    next to the target. When the directory grows past ``max_bytes`` the least
+    recently used files (by mtime, refreshed on hits) are removed.
+
+    The directory is only walked when the size known from the last walk plus
+    what this process has stored since would pass ``max_bytes``, or once
+    ``rescan_bytes`` have been stored. The second case picks up files written
+    by other processes and next to the cache (telephony variants).
+    """
+
+    LOCK_SUFFIX = ".lock"
+    TMP_SUFFIX = ".tmp"
+
+    def __init__(self, root, max_bytes, lock_timeout=120, touch_interval=60, rescan_bytes=None):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.rescan_bytes = max_bytes // 20 if rescan_bytes is None else rescan_bytes
+        self.lock_timeout = lock_timeout
+        self.touch_interval = touch_interval
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._size = None  # bytes found by the last walk; None until the first one
+        self._written = 0  # bytes stored by this process since
+        self._evicting = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "evicted": 0}
+
+    def path_for(self, key, fmt):
+        return self.root / key[:2] / f"{key}.{fmt}"
+
+    def lookup(self, text, voice_id, fmt):
+        path = self.path_for(cache_key(text, voice_id, fmt), fmt)
+        if path.exists():
+            self._touch(path)
+            self._count("hits")
+            return path
+        return None
+
+    def get_or_create(self, text, voice_id, fmt, synthesize):
+        """
+        Return the cached file for (text, voice_id, fmt), calling
+        ``synthesize(tmp_path)`` to render it on a miss.
+        """
+        key = cache_key(text, voice_id, fmt)
+        path = self.path_for(key, fmt)
+        if path.exists():
+            self._touch(path)
+            self._count("hits")
+            return path
+
+        with self._lock:
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+
+        if not leader:
+            event.wait(self.lock_timeout)
+            if path.exists():
+                self._count("coalesced")
+                return path
+            # The leader failed; let this caller have a go.
+            return self.get_or_create(text, voice_id, fmt, synthesize)
+
+        try:
+            return self._create(path, synthesize)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def evict(self):
+        with self._evicting:
+            return self._evict()
+
+    def _evict(self):
+        # A prompt and its derived variants (<key>.ulaw, ... from callbot.audio) share
+        # the key as stem and go together, aged by the source's mtime that hits refresh.
+        entries = {}
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith((self.LOCK_SUFFIX, self.TMP_SUFFIX)) or self.TMP_SUFFIX + "." in name:
+                    continue
+                full = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(full)
+                except FileNotFoundError:
+                    continue
+                entry = entries.setdefault(os.path.join(dirpath, name.split(".", 1)[0]), [0.0, 0, []])
+                entry[0] = max(entry[0], st.st_mtime)
+                entry[1] += st.st_size
+                entry[2].append(full)
+                total += st.st_size
+        with self._lock:
+            self._size, self._written = total, 0
+        TTS_CACHE_BYTES.set(total)
+        if total <= self.max_bytes:
+            return 0
+        # Evict down to 90% so a busy cache doesn't rescan on every store.
+        target = self.max_bytes * 0.9
+        removed = 0
+        for _, size, paths in sorted(entries.values()):
+            if total <= target:
+                break
+            for full in paths:
+                try:
+                    os.remove(full)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            removed += 1
+        with self._lock:
+            self._size = total
+        TTS_CACHE_BYTES.set(total)
+        self._count("evicted", removed)
+        return removed
+
+    # -- internals --------------------------------------------------------
+
+    def _create(self, path, synthesize):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        lock_path = path.with_name(path.name + self.LOCK_SUFFIX)
+        deadline = time.monotonic() + self.lock_timeout
+        while not self._try_lock(lock_path):
+            # Another process is rendering this key.
+            if path.exists():
+                self._count("coalesced")
+                return path
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for TTS render of {path.name}")
+            time.sleep(0.05)
+        try:
+            if path.exists():
+                self._count("coalesced")
+                return path
+            tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.{threading.get_ident()}{self.TMP_SUFFIX}{path.suffix}")
+            try:
+                synthesize(str(tmp_path))
+                if not tmp_path.exists() or tmp_path.stat().st_size == 0:
+                    raise RuntimeError(f"TTS engine produced no audio for {path.name}")
+                os.replace(tmp_path, path)
+            finally:
+                if tmp_path.exists():
+                    tmp_path.unlink()
+        finally:
+            try:
+                lock_path.unlink()
+            except FileNotFoundError:
+                pass
+        self._count("misses")
+        self._stored(path)
+        return path
+
+    def _stored(self, path):
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        with self._lock:
+            self._written += size
+            due = (self._size is None or self._size + self._written > self.max_bytes
+                   or self._written >= self.rescan_bytes)
+        # A miss that finds a walk already running leaves it to that one
+        if due and self._evicting.acquire(blocking=False):
+            try:
+                self._evict()
+            finally:
+                self._evicting.release()
+
+    def _try_lock(self, lock_path):
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                stale = time.time() - os.path.getmtime(lock_path) > self.lock_timeout
+            except FileNotFoundError:
+                return False
+            if stale:
+                # The process holding it died mid-render.
+                try:
+                    os.remove(lock_path)
+                except FileNotFoundError:
+                    pass
+            return False
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        return True
+
+    def _touch(self, path):
+        try:
+            if time.time() - path.stat().st_mtime > self.touch_interval:
+                os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+        if name == "evicted":
+            TTS_CACHE_EVICTED.inc(n)
+        else:
+            TTS_CACHE_LOOKUPS.labels(result=_RESULTS[name]).inc(n)
+
+
+TTS_CACHE = TTSCache(
+    root=getattr(settings, "TTS_CACHE_DIR", Path(settings.MEDIA_ROOT) / "tts"),
+    max_bytes=getattr(settings, "TTS_CACHE_MAX_BYTES", 512 * 1024 * 1024),
+)
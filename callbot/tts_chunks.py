@@ -0,0 +1,153 @@
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+
+from .audio import TELEPHONY, asterisk_prompt, concat_audio
+from .tts_cache import cache_key, normalize_text
+
+# Sentence ends (Latin, Urdu/Arabic, Devanagari) and clause breaks, each followed by whitespace
+_SENTENCE_RE = re.compile(r"(?<=[.!?۔؟।])\s+")
+_CLAUSE_RE = re.compile(r"(?<=[,;:،])\s+")
+
+# Renders chunks in parallel; each thread waits on one job in the TTS worker pool
+_EXECUTOR = ThreadPoolExecutor(
+    max_workers=getattr(settings, "TTS_CHUNK_THREADS", 8),
+    thread_name_prefix="tts-chunk",
+)
+
+
+def _pack(parts, max_chars):
+    chunks, current = [], ""
+    for part in parts:
+        if current and len(current) + 1 + len(part) > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current} {part}" if current else part
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_script(text, max_chars=200):
+    """
+    One chunk per sentence, so editing a sentence only changes its own
+    chunk. Sentences over ``max_chars`` are cut at clause breaks, then
+    between words, packing the pieces back up to ``max_chars``.
+    """
+    chunks = []
+    for sentence in _SENTENCE_RE.split(normalize_text(text)):
+        if len(sentence) <= max_chars:
+            chunks.append(sentence)
+            continue
+        pieces = []
+        for clause in _CLAUSE_RE.split(sentence):
+            pieces.extend(_pack(clause.split(" "), max_chars) if len(clause) > max_chars else [clause])
+        chunks.extend(_pack(pieces, max_chars))
+    return [c for c in chunks if c]
+
+
+class ChunkedPrompt:
+    """
+    Renders a script as per-chunk TTS jobs running in parallel, each cached
+    on its own (text, voice) key, then joins their source WAVs into the
+    full prompt and renders its telephony variants (callbot.audio) from
+    that, so loudness is normalized once over the whole prompt and doesn't
+    jump at chunk boundaries. Only the chunk files played before the full
+    prompt exists (early dial) keep their own levels. ``first`` resolves
+    with the first chunk's path as soon as it is ready, ``done`` with the
+    full prompt's; both are concurrent.futures.Future. ``playback()`` is
+    the Asterisk playlist (``chunk1&chunk2&...``). Once ``first`` is done
+    only the first entry is sure to exist, so whoever plays it while later
+    chunks are rendering has to wait for each file (see the README dialplan).
+
+    A prompt already cached in full resolves immediately without splitting.
+    """
+
+    def __init__(self, text, voice_id, cache, synthesize, telephony=TELEPHONY, max_chars=200, executor=_EXECUTOR):
+        self.text = text
+        self.voice_id = voice_id
+        self.cache = cache
+        self.synthesize = synthesize
+        self.telephony = telephony
+        self.max_chars = max_chars
+        self.executor = executor
+        self.chunks = []
+        self.paths = []
+        self.hit = False
+        self.rendered = 0
+        self.first = Future()
+        self.done = Future()
+        self._lock = threading.Lock()
+        self._remaining = 0
+
+    def start(self):
+        path = self.cache.lookup(self.text, self.voice_id, "wav")
+        if path is not None:
+            if self.telephony.missing(path):
+                self._variants(path)
+            self.hit = True
+            self.chunks, self.paths = [self.text], [path]
+            self.first.set_result(path)
+            self.done.set_result(path)
+            return self
+
+        self.chunks = split_script(self.text, self.max_chars) or [self.text]
+        self.paths = [self.cache.path_for(cache_key(c, self.voice_id, "wav"), "wav") for c in self.chunks]
+        self._remaining = len(self.chunks)
+        # In order, so the first chunk gets the first free TTS worker
+        for index in range(len(self.chunks)):
+            self.executor.submit(self._render, index)
+        return self
+
+    def playback(self):
+        return "&".join(asterisk_prompt(p) for p in self.paths)
+
+    def result(self, timeout=None):
+        return self.done.result(timeout)
+
+    # -- internals --------------------------------------------------------
+
+    def _render(self, index):
+        text = self.chunks[index]
+        try:
+            rendered = []
+            path = self.cache.get_or_create(
+                text, self.voice_id, "wav", lambda tmp: rendered.append(self.synthesize(text, self.voice_id, tmp)),
+            )
+            if rendered or self.telephony.missing(path):
+                self._variants(path)
+        except Exception as e:
+            self._fail(e)
+            return
+        with self._lock:
+            self.rendered += len(rendered)
+            self._remaining -= 1
+            last = self._remaining == 0
+        if index == 0 and not self.first.done():
+            self.first.set_result(path)
+        if last and not self.done.done():
+            try:
+                self.done.set_result(self._assemble())
+            except Exception as e:
+                self._fail(e)
+
+    def _assemble(self):
+        if len(self.paths) == 1:
+            return self.paths[0]
+        path = self.cache.get_or_create(self.text, self.voice_id, "wav", lambda tmp: concat_audio(self.paths, tmp))
+        if self.telephony.missing(path):
+            self._variants(path)
+        return path
+
+    def _variants(self, path):
+        try:
+            self.telephony.render(path)
+        except Exception as e:
+            print(f"⚠️ Telephony variants of {path.name} not written: {e}")
+
+    def _fail(self, exc):
+        for future in (self.first, self.done):
+            if not future.done():
+                future.set_exception(exc)
@@ -0,0 +1,82 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import TTSJob
+from .script_templates import script_template
+from .utils import generate_ai_voice
+
+# Synthesis runs here instead of on the request thread. The job row is the
+# source of truth, so any worker process can answer the status URL.
+_EXECUTOR = ThreadPoolExecutor(
+    max_workers=getattr(settings, "TTS_JOB_WORKERS", 1),
+    thread_name_prefix="tts-job",
+)
+
+
+_recovered = threading.Event()
+
+
+def recover_stale_jobs(stale_after=None):
+    """
+    Jobs live on this process' executor, so a restart strands the ones it had.
+    Pending jobs untouched for ``stale_after`` seconds are submitted again
+    (run_tts_job skips a job another thread already started). Running ones
+    are marked Failed, since their render died with the old process. Returns
+    (resubmitted, failed).
+    """
+    stale_after = getattr(settings, "TTS_JOB_STALE_SECONDS", 600) if stale_after is None else stale_after
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    stale = TTSJob.objects.filter(updated__lt=cutoff)
+    failed = stale.filter(status="Running").update(
+        status="Failed", error="Interrupted by a server restart; save the script again to retry",
+        updated=timezone.now(),
+    )
+    pending = list(stale.filter(status="Pending").values_list("pk", flat=True))
+    # Bump updated so other processes recovering at the same time leave these alone
+    TTSJob.objects.filter(pk__in=pending, status="Pending").update(updated=timezone.now())
+    for job_id in pending:
+        _EXECUTOR.submit(run_tts_job, job_id)
+    return len(pending), failed
+
+
+def _recover_once():
+    if not _recovered.is_set():
+        _recovered.set()
+        try:
+            recover_stale_jobs()
+        except Exception as e:
+            print(f"⚠️ Could not recover stale TTS jobs: {e}")
+
+
+def submit_tts_job(script):
+    _recover_once()
+    job = TTSJob.objects.create(script=script)
+    # Only hand the id to the executor once the row is visible to other connections.
+    transaction.on_commit(lambda: _EXECUTOR.submit(run_tts_job, job.pk))
+    return job
+
+
+def run_tts_job(job_id):
+    close_old_connections()
+    try:
+        # Claimed with a conditional update, so a job submitted twice (recover_stale_jobs) runs once
+        if not TTSJob.objects.filter(pk=job_id, status="Pending").update(status="Running", updated=timezone.now()):
+            return
+        job = TTSJob.objects.select_related("script").get(pk=job_id)
+        try:
+            # A template previews with stand-in values, which also pre-renders its static fragments
+            template = script_template(job.script.script_text)
+            variables = template.preview_values() if template else None
+            job.audio_path = generate_ai_voice(job.script.script_text, job.script.country, variables=variables)
+            job.status = "Done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "Failed"
+        job.save(update_fields=["status", "audio_path", "error", "updated"])
+    finally:
+        close_old_connections()
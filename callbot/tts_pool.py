@@ -0,0 +1,274 @@
+import atexit
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+def _language_code(lang):
+    # espeak reports b"\x05en-us" (priority byte + code); sapi5/nsss give str.
+    if isinstance(lang, bytes):
+        lang = lang.decode("ascii", errors="ignore")
+    return "".join(ch for ch in str(lang) if ch.isprintable()).strip()
+
+
+def _worker_main(jobs, results, max_jobs):
+    """
+    Body of one TTS worker process. The pyttsx3 engine is initialized once and
+    reused for up to ``max_jobs`` jobs, after which the process exits and the
+    pool starts a fresh one (drivers tend to leak over long runs).
+    """
+    try:
+        import pyttsx3
+        engine = pyttsx3.init()
+        init_error = None
+    except Exception as e:
+        # Keep consuming jobs so callers get the real reason instead of a
+        # pool that respawns forever.
+        engine = None
+        init_error = f"TTS engine failed to start: {e}"
+
+    pid = os.getpid()
+    done = 0
+    while not max_jobs or done < max_jobs:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id, kind, payload, enqueued = job
+        started = time.time()
+        results.put(("start", job_id, pid, started))
+        value, error = None, init_error
+        if engine is not None:
+            try:
+                if kind == "voices":
+                    value = [
+                        (v.id, v.name or "", [_language_code(lang) for lang in (v.languages or [])])
+                        for v in engine.getProperty("voices")
+                    ]
+                else:
+                    text, voice_id, filename = payload
+                    if voice_id:
+                        engine.setProperty("voice", voice_id)
+                    engine.save_to_file(text, filename)
+                    engine.runAndWait()
+                    value = filename
+            except Exception as e:
+                error = repr(e)
+        results.put(("done", job_id, value, error, enqueued, started, time.time()))
+        done += 1
+
+
+class _Timings:
+    def __init__(self, window=1000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def summary(self):
+        ordered = sorted(self.samples)
+
+        def pct(p):
+            return ordered[min(int(p * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+
+        return {
+            "count": self.count,
+            "avg": self.total / self.count if self.count else 0.0,
+            "p50": pct(0.50),
+            "p95": pct(0.95),
+            "max": self.max,
+        }
+
+
+class TTSWorkerPool:
+    """
+    A fixed number of long-lived TTS worker processes fed from one bounded
+    queue. ``submit`` returns a concurrent.futures.Future; ``stats`` exposes
+    queue wait and per-job run time so the pool can be sized against volume.
+    Both are also recorded as /metrics histograms (callbot_tts_pool_*).
+    """
+
+    def __init__(self, size=2, max_jobs_per_worker=500, queue_size=100,
+                 queue_timeout=5, job_timeout=120):
+        self.size = size
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.queue_timeout = queue_timeout
+        self.job_timeout = job_timeout
+        # spawn: the web process has threads, forking it is not safe.
+        self._ctx = multiprocessing.get_context("spawn")
+        self._jobs = self._ctx.Queue(queue_size)
+        self._results = self._ctx.Queue()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._futures = {}
+        self._running = {}
+        self._workers = {}
+        self._closed = False
+        self._queue_wait = _Timings()
+        self._run_time = _Timings()
+        self._counters = {"submitted": 0, "failed": 0, "rejected": 0, "recycled": 0, "crashed": 0}
+
+        for _ in range(size):
+            self._spawn()
+        threading.Thread(target=self._collect, daemon=True, name="tts-pool-results").start()
+        threading.Thread(target=self._supervise, daemon=True, name="tts-pool-supervisor").start()
+
+    # -- public API -------------------------------------------------------
+
+    def submit(self, kind, payload=None):
+        if self._closed:
+            raise RuntimeError("TTS pool is shut down")
+        job_id = next(self._ids)
+        future = Future()
+        future.job_id = job_id
+        with self._lock:
+            self._futures[job_id] = future
+        try:
+            self._jobs.put((job_id, kind, payload, time.time()), timeout=self.queue_timeout)
+        except queue.Full:
+            from .metrics import TTS_POOL_REJECTED
+
+            with self._lock:
+                self._futures.pop(job_id, None)
+                self._counters["rejected"] += 1
+            TTS_POOL_REJECTED.inc()
+            raise
+        with self._lock:
+            self._counters["submitted"] += 1
+        return future
+
+    def synthesize(self, text, voice_id, filename):
+        return self._wait(self.submit("speak", (text, voice_id, filename)))
+
+    def list_voices(self):
+        return self._wait(self.submit("voices"))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["workers"] = len(self._workers)
+            stats["in_flight"] = len(self._running)
+            stats["pending"] = len(self._futures) - len(self._running)
+            stats["queue_wait_seconds"] = self._queue_wait.summary()
+            stats["job_seconds"] = self._run_time.summary()
+        return stats
+
+    def shutdown(self, timeout=5):
+        if self._closed:
+            return
+        self._closed = True
+        with self._lock:
+            workers = list(self._workers.values())
+        for _ in workers:
+            try:
+                self._jobs.put_nowait(None)
+            except queue.Full:
+                break
+        for proc in workers:
+            proc.join(timeout)
+            if proc.is_alive():
+                proc.terminate()
+
+    # -- internals --------------------------------------------------------
+
+    def _wait(self, future):
+        try:
+            return future.result(self.job_timeout)
+        except TimeoutError:
+            with self._lock:
+                self._futures.pop(future.job_id, None)
+            raise
+
+    def _spawn(self):
+        proc = self._ctx.Process(
+            target=_worker_main,
+            args=(self._jobs, self._results, self.max_jobs_per_worker),
+            daemon=True,
+            name="tts-worker",
+        )
+        proc.start()
+        with self._lock:
+            self._workers[proc.pid] = proc
+
+    def _collect(self):
+        # Imported here: worker processes import this module without Django set up
+        from .metrics import TTS_POOL_JOB_SECONDS, TTS_POOL_QUEUE_WAIT_SECONDS
+
+        while True:
+            msg = self._results.get()
+            if msg[0] == "start":
+                _, job_id, pid, _ = msg
+                with self._lock:
+                    self._running[job_id] = pid
+                continue
+            _, job_id, value, error, enqueued, started, finished = msg
+            with self._lock:
+                self._running.pop(job_id, None)
+                future = self._futures.pop(job_id, None)
+                self._queue_wait.add(max(started - enqueued, 0.0))
+                self._run_time.add(finished - started)
+                if error:
+                    self._counters["failed"] += 1
+            TTS_POOL_QUEUE_WAIT_SECONDS.observe(max(started - enqueued, 0.0))
+            TTS_POOL_JOB_SECONDS.labels(outcome="failed" if error else "ok").observe(finished - started)
+            if future is None:
+                continue
+            if error:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(value)
+
+    def _supervise(self):
+        from .metrics import TTS_POOL_WORKER_EXITS
+
+        while not self._closed:
+            time.sleep(0.5)
+            with self._lock:
+                dead = [(pid, p) for pid, p in self._workers.items() if not p.is_alive()]
+                lost = []
+                for pid, proc in dead:
+                    del self._workers[pid]
+                    reason = "recycled" if proc.exitcode == 0 else "crashed"
+                    self._counters[reason] += 1
+                    TTS_POOL_WORKER_EXITS.labels(reason=reason).inc()
+                    for job_id, owner in list(self._running.items()):
+                        if owner == pid:
+                            del self._running[job_id]
+                            lost.append(self._futures.pop(job_id, None))
+            for future in lost:
+                if future is not None:
+                    future.set_exception(RuntimeError("TTS worker died while running the job"))
+            for _ in dead:
+                if not self._closed:
+                    self._spawn()
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_tts_pool():
+    """The process-wide pool, started on first use so imports never spawn workers."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            from django.conf import settings
+            _POOL = TTSWorkerPool(
+                size=getattr(settings, "TTS_POOL_SIZE", 2),
+                max_jobs_per_worker=getattr(settings, "TTS_POOL_MAX_JOBS_PER_WORKER", 500),
+                queue_size=getattr(settings, "TTS_POOL_QUEUE_SIZE", 100),
+                queue_timeout=getattr(settings, "TTS_POOL_QUEUE_TIMEOUT", 5),
+                job_timeout=getattr(settings, "TTS_POOL_JOB_TIMEOUT", 120),
+            )
+            atexit.register(_POOL.shutdown)
+        return _POOL
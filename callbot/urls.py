@@ -4,7 +4,11 @@ from . import views
 urlpatterns = [
     path("", views.home, name="home"),
     path("get_queue_logs/", views.get_queue_logs, name="get_queue_logs"),
+    path("live/events/", views.live_events, name="live_events"),
     path("save_credentials/", views.save_credentials, name="save_credentials"),
     path("save_script/", views.save_script, name="save_script"),
      path("save_form/", views.save_form, name="save_form"),
+    path("campaigns/import/", views.import_campaign, name="import_campaign"),
+    path("tts_jobs/<int:job_id>/", views.tts_job_status, name="tts_job_status"),
+    path("metrics", views.metrics, name="metrics"),
 ]
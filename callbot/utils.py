@@ -1,75 +1,284 @@
 
-import os
 import asyncio
-import pyttsx3
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
 from .models import CallQueue, CallLog
-from asterisk.ami import AMIClient, SimpleAction
-
-CALL_QUEUE = asyncio.Queue()
-
-def generate_ai_voice(text, country, media_dir='media'):
-    engine = pyttsx3.init()
-    voices = engine.getProperty('voices')
-    voice_id = voices[0].id
-    country_lower = country.lower()
-    for v in voices:
-        if 'english' in v.name.lower() and 'us' in country_lower:
-            voice_id = v.id
-        if 'english' in v.name.lower() and ('uk' in country_lower or 'britain' in country_lower):
-            voice_id = v.id
-    engine.setProperty('voice', voice_id)
-    os.makedirs(media_dir, exist_ok=True)
-    filename = f"{media_dir}/response_{country}_{len(text)}.mp3"
-    engine.save_to_file(text, filename)
-    engine.runAndWait()
-    return filename
+from .audio import TELEPHONY
+from .ami_async import AMILoginError, make_async_pool
+from .ami_events import AMI_EVENTS
+from .retries import ERROR, OriginateRejected, apply_failure, classify, failure_fields
+from .write_behind import WRITER
+from .tts_cache import TTS_CACHE, TTSCache
+from .tts_chunks import ChunkedPrompt
+from .script_templates import TemplateRenderer, script_template
+from .tts_pool import get_tts_pool
+from .voices import VOICES
+from .dialer import Dialer
+from .scheduler import CallScheduler
+from .leases import new_worker_id, reclaim_expired, release_leases, renew_leases
+from .loop_monitor import LoopLagMonitor
+from .metrics import ENQUEUE_TO_DIAL_SECONDS, REGISTRY, TTS_SECONDS
+from .spans import UNSAMPLED
+
+logger = logging.getLogger(__name__)
+
+def _synthesize(text, voice_id, filename):
+    # Runs on a warm engine in one of the TTS worker processes
+    get_tts_pool().synthesize(text, voice_id, filename)
+
+def _media_path(path):
+    try:
+        return Path(path).resolve().relative_to(settings.BASE_DIR).as_posix()
+    except ValueError:
+        return str(path)
+
+def start_ai_voice(text, country, media_dir=None, variables=None):
+    """
+    Start rendering ``text`` and return its ChunkedPrompt (callbot.tts_chunks) at once:
+    ``first`` resolves when the first sentence is playable, ``done`` with the whole prompt.
+    A template script ("Hello {name}") is rendered and spliced with ``variables`` before
+    returning, so both futures are already done: templates don't dial on the first sentence.
+    """
+    voice_id = VOICES.resolve(country)
+    cache = TTS_CACHE if media_dir is None else TTSCache(Path(media_dir) / 'tts', TTS_CACHE.max_bytes)
+    started = time.perf_counter()
+    max_chars = getattr(settings, 'TTS_CHUNK_MAX_CHARS', 200)
+    template = script_template(text)
+    if template is not None:
+        # Static fragments and number clips come from the cache; only new field values are synthesized
+        renderer = TemplateRenderer(cache, _synthesize, max_chars=max_chars, pad_ms=getattr(settings, 'TTS_SPLICE_PAD_MS', 40))
+        prompt = renderer.render(template, variables, voice_id, VOICES.language(voice_id))
+        TTS_SECONDS.labels(cache='miss' if prompt.rendered else 'hit').observe(time.perf_counter() - started)
+        return prompt
+    # Sentences render in parallel across the TTS workers, each cached on its own so an
+    # edited script only re-renders what changed; the joined prompt gets its 8 kHz variants
+    # normalized once over all chunks, so Asterisk never transcodes on playback
+    prompt = ChunkedPrompt(text, voice_id, cache, _synthesize, max_chars=max_chars).start()
+    prompt.done.add_done_callback(lambda _: TTS_SECONDS.labels(
+        cache='miss' if prompt.rendered else 'hit').observe(time.perf_counter() - started))
+    return prompt
+
+def generate_ai_voice(text, country, media_dir=None, variables=None):
+    return _media_path(start_ai_voice(text, country, media_dir, variables).result())
+
+# Blocking work on the call path (TTS cache and pool) runs here so it never stalls the
+# dialer's event loop; the bound keeps a burst of calls from spawning threads
+_IO_EXECUTOR = ThreadPoolExecutor(max_workers=getattr(settings, 'DIALER_IO_THREADS', 32), thread_name_prefix='dialer-io')
+
+async def _off_loop(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_IO_EXECUTOR, fn, *args)
+
+# asyncio AMI sockets of this worker's loop, pipelining Originates (callbot.ami_async)
+AMI = None
+
+def _ami():
+    global AMI
+    if AMI is None:
+        AMI = make_async_pool()
+    return AMI
+
+def _ready_format():
+    # Variants are written in this order after the chunk's WAV, so the first one
+    # existing means Asterisk can play the chunk
+    return (TELEPHONY.available_formats() or ('wav',))[0]
+
+def dial_fields(queue_obj, credential):
+    """
+    Channel / Exten / CallerID of a call's Originate: the row's own values (campaign
+    imports), then its script's, then the fixed ones calls used to get.
+    """
+    script = queue_obj.script
+    number = queue_obj.exten or script.exten
+    endpoint = (credential.sip_endpoint or '').strip() if credential is not None else ''
+    if number:
+        channel = f'SIP/{endpoint}/{number}' if endpoint else f'SIP/{number}'
+    else:
+        channel = 'SIP/1011'
+    return {
+        'Channel': channel,
+        'Exten': number or '1000',
+        'CallerID': queue_obj.caller_id or script.caller_id or 'AI Bot',
+    }
 
 async def async_process_call(credential, queue_obj):
-    queue_obj.status = 'Running'
-    queue_obj.save()
+    # The row is already Running (claimed by the scheduler) with script and credential
+    # loaded. Nothing here blocks the loop: TTS runs on _IO_EXECUTOR, Originate is pipelined
+    # on an asyncio AMI socket, and status changes and the CallLog row go through the
+    # write-behind buffer.
     script_text = queue_obj.script.script_text
-    ai_response = f"AI reading: {script_text}"
-    audio_path = generate_ai_voice(script_text, queue_obj.script.country)
+    country = queue_obj.country or queue_obj.script.country  # the row's override, as the scheduler uses
+    spans = getattr(queue_obj, 'spans', UNSAMPLED)  # set by the scheduler at claim
+    variables = queue_obj.variables  # values for a template script's {fields}
+    spans.mark('started')
+    template = script_template(script_text)
+    ai_response = f"AI reading: {template.render_text(variables) if template else script_text}"
+    audio_path = ''  # the prompt the call played, once it has finished rendering
+    outcome = prompt = None
     try:
-        client = AMIClient(address=credential.ami_host, port=credential.ami_port)
-        future = client.login(username=credential.ami_user, secret=credential.ami_pass)
-        if future.response.is_error():
-            ai_response += " | AMI connection failed"
-            queue_obj.status = 'Failed'
-        else:
-            # Simulate multi-agent AI response
-            # Here we can later integrate GPT or local AI logic
-            dynamic_response = script_text + " (Agent AI response)"
-            audio_path = generate_ai_voice(dynamic_response, queue_obj.script.country)
-            action = SimpleAction(
-                'Originate',
-                Channel='SIP/1011',
-                Context='from-internal',
-                Exten='1000',
-                Priority=1,
-                CallerID='AI Bot',
-                Timeout=30000
-            )
-            client.send_action(action)
-            ai_response += f" | AMI call triggered with response: {dynamic_response}"
-            queue_obj.status = 'Completed'
-            client.logoff()
+        # Simulate multi-agent AI response
+        # Here we can later integrate GPT or local AI logic
+        dynamic_response = script_text + " (Agent AI response)"
+        prompt = await _off_loop(start_ai_voice, dynamic_response, country, None, variables)
+        # Dial once the first sentence is ready; the rest finish while the phone rings
+        await asyncio.wrap_future(prompt.first)
+        spans.mark('tts')
+        action_id = AMI_EVENTS.call_id(queue_obj.pk, queue_obj.attempts)
+        originate = dict(
+            Context='from-internal',
+            Priority=1,
+            Timeout=30000,
+            **dial_fields(queue_obj, credential),
+            # Async: Asterisk answers at once and reports progress as events
+            # (callbot.ami_events), which we match on ActionID / ChannelId; both carry
+            # this process' prefix so the other dialers' listeners skip them
+            Async='true',
+            ActionID=action_id,
+            ChannelId=action_id,
+            # The prompt's chunks joined with '&'. Only the first is sure to exist yet, so the
+            # dialplan (see README) waits for each chunk's <path>.${CALLBOT_PROMPT_READY}
+            # before playing it; Asterisk picks each one's native variant
+            Variable=f'CALLBOT_PROMPT={prompt.playback()},CALLBOT_PROMPT_READY={_ready_format()}',
+        )
+        await _off_loop(AMI_EVENTS.ensure_listener, credential)
+        await _ami().client(credential)  # logged in (or reusing a socket) before the Originate
+        spans.mark('ami_connected')
+        # Register before sending so an early event can't be missed
+        outcome = AMI_EVENTS.track(queue_obj.pk, action_id, action_id, queue_obj.attempts, spans=spans)
+        queue_obj.status = 'Dialing'
+        await WRITER.aupdate(
+            CallQueue, queue_obj.pk, status='Dialing', attempts=queue_obj.attempts,
+            action_id=action_id, uniqueid=action_id,
+            answered_at=None, ended_at=None, duration=None, hangup_cause='',
+        )
+        ENQUEUE_TO_DIAL_SECONDS.observe(max((timezone.now() - queue_obj.not_before).total_seconds(), 0.0))
+        response = await _ami().send_action(credential, 'Originate', **originate)
+        if response is None or response.is_error():
+            raise OriginateRejected(response)
+        spans.mark('originated')
+        ai_response += f" | AMI call triggered with response: {dynamic_response}"
     except Exception as e:
-        ai_response += f" | Exception: {str(e)}"
-        queue_obj.status = 'Failed'
-    queue_obj.save()
-    CallLog.objects.create(user_script=queue_obj.script, ai_response=ai_response, audio_path=audio_path)
+        if outcome is not None:
+            AMI_EVENTS.forget(queue_obj.pk)
+            outcome = None
+        # Back to Queued with a backed-off not_before, or DeadLetter when out of attempts
+        failure = classify(e)
+        delay = apply_failure(queue_obj, failure, e)
+        ai_response += " | AMI connection failed" if isinstance(e, AMILoginError) else f" | Exception: {str(e)}"
+        ai_response += f" | retry in {delay:.0f}s" if delay is not None else f" | {queue_obj.status} after {queue_obj.attempts} attempts"
+        await WRITER.aupdate(CallQueue, queue_obj.pk, **failure_fields(queue_obj))
+    if outcome is not None:
+        # The row is updated by the event listener from here on; we only hold the
+        # trunk channel until the call is over
+        max_seconds = getattr(settings, 'CALL_MAX_SECONDS', 3600)
+        try:
+            ai_response += f" | {await asyncio.wait_for(outcome, max_seconds)}"
+        except asyncio.TimeoutError:
+            AMI_EVENTS.fail(queue_obj.pk, ERROR, f"no hangup within {max_seconds}s")
+            ai_response += f" | no hangup within {max_seconds}s"
+    # A call that never went out doesn't hold its dialer slot for the rest of the render
+    if prompt is not None and (outcome is not None or prompt.done.done()):
+        try:
+            audio_path = _media_path(await asyncio.wrap_future(prompt.done))
+        except Exception as e:
+            ai_response += f" | TTS failed: {e}"
+    spans.observe()
+    await WRITER.acreate(CallLog(
+        user_script=queue_obj.script, ai_response=ai_response, audio_path=audio_path,
+        call_id=queue_obj.pk, timings=spans.encode(), total_ms=spans.total_ms(),
+    ))
 
-async def queue_worker(credential):
-    while True:
-        queue_obj = await CALL_QUEUE.get()
+DIALER = None
+LOOP_MONITOR = None
+
+async def _process_claimed(credential, queue_obj):
+    # A claimed row must never stay Running (and lease-renewed) after an unexpected error
+    queue_obj.attempts += 1
+    try:
         await async_process_call(credential, queue_obj)
-        CALL_QUEUE.task_done()
+    except Exception as e:
+        if not AMI_EVENTS.fail(queue_obj.pk, classify(e), e):
+            apply_failure(queue_obj, classify(e), e)
+            await WRITER.aupdate(CallQueue, queue_obj.pk, **failure_fields(queue_obj))
+        raise
+
+async def _fail_claimed(queue_obj, error):
+    # The dialer failed before _process_claimed got the row (no credential, ...): it still
+    # counts as an attempt, so a row that can never dial ends up dead-lettered
+    queue_obj.attempts += 1
+    logger.error("Call %s could not be dialed: %s", queue_obj.pk, error)
+    apply_failure(queue_obj, classify(error), error)
+    await WRITER.aupdate(CallQueue, queue_obj.pk, **failure_fields(queue_obj))
+
+async def _lease_keeper(worker_id):
+    # Renew leases on everything still Running so long calls aren't reclaimed,
+    # re-queue rows whose worker died and retry calls whose events never came
+    lease = getattr(settings, 'DIALER_LEASE_SECONDS', 60)
+    max_call = getattr(settings, 'CALL_MAX_SECONDS', 3600)
+    while True:
+        try:
+            await sync_to_async(reclaim_expired)()
+            await sync_to_async(renew_leases)(worker_id, lease)
+            await sync_to_async(AMI_EVENTS.expire_stale)(max_call + lease)
+        except Exception:
+            logger.exception("Dialer %s could not renew leases", worker_id)
+        await asyncio.sleep(lease / 3)
+
+async def queue_worker(credential=None, credential_ids=None, shard=None, worker_id=None, stop=None):
+    # Many calls in flight at once, bounded per trunk by CallCredential.max_channels / max_cps.
+    # The CallQueue table is the queue; rows are claimed under a lease so several
+    # dialer processes can share it and a crashed worker's calls get re-queued.
+    # CallScheduler releases rows once not_before has passed and their country's
+    # CallingWindow is open, highest priority first.
+    # ``shard`` is a callable returning (index, count); ``stop`` an asyncio.Event
+    # that makes the worker stop claiming, finish in-flight calls and hand back
+    # the rest of its claimed rows.
+    global DIALER, LOOP_MONITOR, AMI
+    concurrency = getattr(settings, 'DIALER_CONCURRENCY', 20)
+    worker_id = worker_id or new_worker_id()
+    stop = stop or asyncio.Event()
+    feed = asyncio.Queue(maxsize=concurrency)
+    LOOP_MONITOR = LoopLagMonitor(threshold=getattr(settings, 'LOOP_LAG_THRESHOLD_MS', 100) / 1000, name=f"dialer {worker_id}")
+    LOOP_MONITOR.start()
+    # Lets /metrics in the web process report this worker's AMI, flush and loop numbers
+    REGISTRY.start_snapshots(process=worker_id)
+    AMI = make_async_pool()
+    DIALER = Dialer(_process_claimed, concurrency=concurrency, on_error=_fail_claimed)
+    runner = asyncio.create_task(DIALER.run(feed, default_credential=credential))
+    scheduler = CallScheduler(
+        worker_id, feed,
+        lease_seconds=getattr(settings, 'DIALER_LEASE_SECONDS', 60),
+        horizon=getattr(settings, 'SCHEDULER_HORIZON_SECONDS', 300),
+        refill_interval=getattr(settings, 'SCHEDULER_REFILL_SECONDS', 5),
+        batch=getattr(settings, 'SCHEDULER_BATCH', 500),
+        credential_ids=credential_ids, shard=shard,
+    )
+    claimer = asyncio.create_task(scheduler.run())
+    keeper = asyncio.create_task(_lease_keeper(worker_id))
+    try:
+        await stop.wait()
+    finally:
+        claimer.cancel()
+        runner.cancel()
+        await DIALER.drain()
+        keeper.cancel()
+        await sync_to_async(WRITER.flush)()
+        await sync_to_async(release_leases)(worker_id)
+        await AMI.close()
+        LOOP_MONITOR.stop()
 
 def enqueue_call(queue_obj):
-    asyncio.run_coroutine_threadsafe(CALL_QUEUE.put(queue_obj), asyncio.get_event_loop())
+    # Nothing to hand off in-process: a saved Queued row is picked up by whichever dialer claims it
+    if queue_obj.status != 'Queued':
+        queue_obj.status = 'Queued'
+        queue_obj.save(update_fields=['status', 'updated'])
+    return queue_obj
 
-def start_queue_loop(credential):
+def start_queue_loop(credential=None):
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     loop.run_until_complete(queue_worker(credential))
@@ -1,15 +1,48 @@
-from django.shortcuts import render, redirect
-from django.http import JsonResponse
-from .forms import CredentialForm, ScriptForm
-from .models import CallQueue, CallLog, CallCredential, CallScript
-from .utils import generate_ai_voice, enqueue_call
+from django.shortcuts import render, redirect, get_object_or_404
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.db import transaction
+from django.db.models import Max
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition
+from asgiref.sync import sync_to_async
+import asyncio
+import hashlib
+from .forms import CredentialForm, ScriptForm, CampaignImportForm
+from .importer import ImportFileError, guess_format, import_calls, iter_rows
+from .models import CallQueue, CallLog, CallCredential, CallScript, TTSJob
+from .utils import enqueue_call
+from .tts_jobs import recover_stale_jobs, submit_tts_job
+from .pagination import keyset_page
+from .metrics import REGISTRY
+from .live import (
+    LIVE_FEED, fetch_changes, fetch_snapshot, format_log_row, format_queue_row,
+    log_values, parse_cursor, queue_values, sse_message,
+)
 from .models import CallCredential
 import requests 
-from asterisk.ami import AMIClient, SimpleAction
 
 
 
 
+DASHBOARD_PAGE_SIZE = 50
+
+
+def _queue_page(cursor=None):
+    queue = CallQueue.objects.select_related("script").only(
+        "id", "status", "timestamp", "script__script_text", "script__country"
+    )
+    return keyset_page(queue, cursor, DASHBOARD_PAGE_SIZE)
+
+
+def _logs_page(cursor=None):
+    logs = CallLog.objects.select_related("user_script").only(
+        "id", "ai_response", "audio_path", "timestamp", "user_script__country"
+    )
+    return keyset_page(logs, cursor, DASHBOARD_PAGE_SIZE)
+
+
 # 🏠 Home View (Main Dashboard)
 def home(request):
     if request.method == "POST":
@@ -24,16 +57,17 @@ def home(request):
             queue_obj = CallQueue.objects.create(script=script)
             enqueue_call(queue_obj)
 
-            # Generate AI voice
-            audio_path = generate_ai_voice(script.script_text, script.country)
+            # Generate AI voice in the background
+            job = submit_tts_job(script)
 
             # AJAX response
             return JsonResponse({
                 "status": "success",
                 "ai_response": f"✅ Call queued for {script.country}",
-                "audio_path": audio_path,
-                "queue_html": render(request, "partials/queue.html", {"queue": CallQueue.objects.all()}).content.decode(),
-                "logs_html": render(request, "partials/logs.html", {"logs": CallLog.objects.all()}).content.decode()
+                "job_id": job.pk,
+                "status_url": reverse("tts_job_status", args=[job.pk]),
+                "queue_html": render(request, "partials/queue.html", {"queue": _queue_page()}).content.decode(),
+                "logs_html": render(request, "partials/logs.html", {"logs": _logs_page()}).content.decode()
             })
         else:
             return JsonResponse({"status": "error", "errors": cred_form.errors | script_form.errors}, status=400)
@@ -41,8 +75,8 @@ def home(request):
     # GET request
     cred_form = CredentialForm()
     script_form = ScriptForm()
-    queue = CallQueue.objects.all().order_by("-timestamp")
-    logs = CallLog.objects.all().order_by("-timestamp")
+    queue = _queue_page(request.GET.get("queue_before"))
+    logs = _logs_page(request.GET.get("logs_before"))
     return render(request, "callbot/home.html", {
         "cred_form": cred_form,
         "script_form": script_form,
@@ -78,35 +112,98 @@ def save_script(request):
     return render(request, "script_form.html", {"form": script_form})
 
 
-def get_queue_logs(request):
-    queue = CallQueue.objects.select_related("script").values(
-        "id", "status", "timestamp", "script__script_text", "script__country"
-    )
-    logs = CallLog.objects.select_related("user_script").values(
-        "id", "ai_response", "timestamp", "audio_path", "user_script__country"
-    )
+def _queue_logs_etag(request):
+    # Cheap fingerprint of "anything changed?" so unchanged polls get a 304
+    # without serializing a single row.
+    queue_state = CallQueue.objects.aggregate(updated=Max("updated"), id=Max("id"))
+    log_state = CallLog.objects.aggregate(id=Max("id"))
+    raw = f"{request.GET.urlencode()}|{queue_state['updated']}|{queue_state['id']}|{log_state['id']}"
+    return hashlib.md5(raw.encode()).hexdigest()
 
-    queue_data = [
-        {
-            "id": q["id"],
-            "status": q["status"],
-            "timestamp": q["timestamp"].strftime("%Y-%m-%d %H:%M:%S"),
-            "script_text": q["script__script_text"],
-            "country": q["script__country"]
-        } for q in queue
-    ]
-
-    logs_data = [
-        {
-            "id": l["id"],
-            "ai_response": l["ai_response"],
-            "timestamp": l["timestamp"].strftime("%Y-%m-%d %H:%M:%S"),
-            "audio_path": l["audio_path"],
-            "country": l["user_script__country"]
-        } for l in logs
-    ]
-
-    return JsonResponse({"queue": queue_data, "logs": logs_data})
+
+@gzip_page
+@condition(etag_func=_queue_logs_etag)
+def get_queue_logs(request):
+    # Old behaviour: every row ever written. Only on explicit request.
+    if request.GET.get("full") == "1":
+        return JsonResponse({
+            "queue": [format_queue_row(q) for q in queue_values()],
+            "logs": [format_log_row(l) for l in log_values()]
+        })
+
+    cursor = parse_cursor(request.GET.get("cursor"))
+    if cursor is None:
+        return JsonResponse(fetch_snapshot())
+    return JsonResponse(fetch_changes(cursor))
+
+
+# 📡 Live dashboard push (Server-Sent Events); needs the ASGI server to stream
+async def live_events(request):
+    if not isinstance(request, ASGIRequest):
+        # WSGI drains a streaming body before sending anything, and this one never ends.
+        # 204 tells EventSource not to reconnect, and the dashboard polls instead.
+        return HttpResponse(status=204)
+    cursor = parse_cursor(request.headers.get("Last-Event-ID") or request.GET.get("cursor"))
+
+    async def stream():
+        queue = LIVE_FEED.subscribe()
+        try:
+            # "ready" tells the dashboard the stream really flows (not held by a buffering proxy)
+            yield "retry: 3000\nevent: ready\ndata: {}\n\n"
+            # Catch up on anything missed since the client's cursor
+            since = cursor
+            while since is not None:
+                batch = await sync_to_async(fetch_changes)(since)
+                if batch["queue"] or batch["logs"]:
+                    yield sse_message(batch)
+                since = parse_cursor(batch["cursor"]) if batch["more"] else None
+            while LIVE_FEED.is_subscribed(queue):
+                try:
+                    batch = await asyncio.wait_for(queue.get(), 15)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield sse_message(batch)
+        finally:
+            LIVE_FEED.unsubscribe(queue)
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+# 📥 Bulk campaign upload (large files: use `manage.py import_campaign`)
+def import_campaign(request):
+    if request.method != "POST":
+        return JsonResponse({"status": "error", "msg": "Invalid request"}, status=400)
+    form = CampaignImportForm(request.POST, request.FILES)
+    if not form.is_valid():
+        return JsonResponse({"status": "error", "errors": form.errors}, status=400)
+    upload = form.cleaned_data["file"]
+    try:
+        # All or nothing: a file that breaks halfway leaves no rows behind
+        with transaction.atomic():
+            result = import_calls(
+                iter_rows(upload, guess_format(upload.name)),
+                campaign=form.cleaned_data["campaign"],
+            )
+    except ImportFileError as e:
+        return JsonResponse({"status": "error", "msg": str(e), "line": e.line}, status=400)
+    return JsonResponse({"status": "success", **result.as_dict()})
+
+
+def tts_job_status(request, job_id):
+    job = get_object_or_404(TTSJob, pk=job_id)
+    if job.status in ("Pending", "Running"):
+        # A job left behind by a restarted process would otherwise be polled forever
+        if recover_stale_jobs() != (0, 0):
+            job.refresh_from_db()
+    return JsonResponse({
+        "job_id": job.pk,
+        "status": job.status,
+        "audio_path": job.audio_path or None,
+        "error": job.error or None
+    })
 
 def save_form(request):
     if request.method == "POST":
@@ -121,17 +218,17 @@ def save_form(request):
 
             # Queue the call
             queue_obj = CallQueue.objects.create(script=script)
-            print("Calling enqueue_call()...")
-            enqueue_call(queue_obj)  # Print inside this function will show in console
+            enqueue_call(queue_obj)  # claimed from the DB by a dialer worker (utils.queue_worker)
 
-            # Generate AI audio
-            audio_path = generate_ai_voice(script.script_text, script.country)
+            # Generate AI audio in the background; the dashboard polls status_url
+            job = submit_tts_job(script)
 
             return JsonResponse({
                 "status": "success",
                 "msg": f"✅ Data saved for {script.country}",
-                "audio_path": audio_path
-            })
+                "job_id": job.pk,
+                "status_url": reverse("tts_job_status", args=[job.pk])
+            }, status=202)
         else:
             return JsonResponse({
                 "status": "error",
@@ -140,46 +237,7 @@ def save_form(request):
 
     return JsonResponse({"status": "error", "msg": "Invalid request"}, status=400)
 
- # agar AMI API ya external service ho
-# Agar aapka AMI server Asterisk hai to aap py-Asterisk ya pyst2 use kar sakte hain
 
-def enqueue_call(queue_obj):
-    try:
-        # Get saved AMI credentials
-        ami_host = queue_obj.script.credential.ami_host
-        ami_port = queue_obj.script.credential.ami_port
-        ami_user = queue_obj.script.credential.ami_user
-        ami_pass = queue_obj.script.credential.ami_pass
-
-        # Connect to AMI
-        client = AMIClient(address=ami_host, port=ami_port)
-        future = client.login(username=ami_user, secret=ami_pass)
-        if not future.response.success:
-            return f"❌ AMI login failed: {future.response}"
-
-        # Originate call
-        action = SimpleAction(
-            'Originate',
-            Channel=f'SIP/{queue_obj.script.country}',  # Replace with real SIP channel
-            Context='from-internal',                     # Your Asterisk context
-            Exten='1000',                                # Destination extension / number
-            Priority=1,
-            CallerID='AI Call Center',
-            Async='true'
-        )
-        resp = client.send_action(action)
-        client.logoff()
-
-        # Save log in database
-        CallLog.objects.create(
-            user_script=queue_obj.script,
-            ai_response=f"Call enqueued successfully",
-            audio_path=""  # update if audio generated
-        )
-
-        print(f"✅ Call enqueued successfully: {queue_obj.script.script_text}")
-        return f"✅ Call enqueued for: {queue_obj.script.script_text}"
-
-    except Exception as e:
-        print(f"❌ Error enqueuing call: {e}")
-        return f"❌ Error: {e}"
\ No newline at end of file
+# 📈 Prometheus scrape target (text exposition format)
+def metrics(request):
+    return HttpResponse(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,143 @@
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+
+from .models import VoiceOverride
+from .tts_pool import get_tts_pool
+
+# Country names / codes -> locales to try in order. The last entries are the
+# explicit fallbacks; anything not listed falls through to TTS_DEFAULT_VOICE.
+COUNTRY_LOCALES = {
+    "us": ["en-us", "en"],
+    "usa": ["en-us", "en"],
+    "united states": ["en-us", "en"],
+    "america": ["en-us", "en"],
+    "uk": ["en-gb", "en"],
+    "gb": ["en-gb", "en"],
+    "britain": ["en-gb", "en"],
+    "great britain": ["en-gb", "en"],
+    "united kingdom": ["en-gb", "en"],
+    "england": ["en-gb", "en"],
+    "canada": ["en-ca", "en-us", "en"],
+    "australia": ["en-au", "en-gb", "en"],
+    "pakistan": ["ur-pk", "ur", "en-in", "en"],
+    "pk": ["ur-pk", "ur", "en-in", "en"],
+    "india": ["hi-in", "en-in", "hi", "en"],
+    "uae": ["ar-ae", "ar", "en"],
+    "saudi arabia": ["ar-sa", "ar", "en"],
+    "germany": ["de-de", "de"],
+    "france": ["fr-fr", "fr"],
+    "spain": ["es-es", "es"],
+    "mexico": ["es-mx", "es"],
+}
+
+_LOCALE_RE = re.compile(r"(?<![a-z])([a-z]{2,3})[-_]([a-z]{2})(?![a-z])")
+
+
+def normalize_country(country):
+    return " ".join((country or "").lower().split())
+
+
+def _voice_locales(voice_id, name, languages):
+    locales = []
+    for lang in languages:
+        lang = lang.lower().replace("_", "-")
+        if lang:
+            locales.append(lang)
+    # sapi5 ids look like ...\TTS_MS_EN-US_ZIRA_11.0; nsss like com.apple.voice.en-GB.Daniel
+    for text in (voice_id.lower(), name.lower()):
+        locales.extend(f"{a}-{b}" for a, b in _LOCALE_RE.findall(text))
+    # Every locale also answers for its bare language ("en-us" -> "en").
+    locales.extend([loc.split("-")[0] for loc in locales])
+    return locales
+
+
+class VoiceCatalogue:
+    """
+    Country -> voice id table, built once per process from the engine's voice
+    list so a lookup is a single dict access. Admin overrides (VoiceOverride)
+    win over the computed table and are re-read at most every
+    ``override_ttl`` seconds, or immediately when changed in this process.
+    ``language(voice_id)`` is the bare language a voice speaks ("en", "ur").
+    """
+
+    def __init__(self, locales=None, default_voice=None, override_ttl=60):
+        self.locales = dict(COUNTRY_LOCALES, **(locales or {}))
+        self.default_voice = default_voice
+        self.override_ttl = override_ttl
+        self._lock = threading.Lock()
+        self._table = None
+        self._default = None
+        self._languages = {}
+        self._overrides = None
+        self._overrides_loaded = 0.0
+
+    def resolve(self, country):
+        key = normalize_country(country)
+        overrides = self._get_overrides()
+        if key in overrides:
+            return overrides[key]
+        table, default = self._get_table()
+        return table.get(key, default)
+
+    def table(self):
+        return dict(self._get_table()[0])
+
+    def language(self, voice_id):
+        """The voice's language, or None for a voice the engine didn't list or tag."""
+        self._get_table()
+        return self._languages.get(voice_id)
+
+    def invalidate_overrides(self, **kwargs):
+        self._overrides = None
+
+    def _get_overrides(self):
+        overrides = self._overrides
+        if overrides is None or time.monotonic() - self._overrides_loaded > self.override_ttl:
+            overrides = {
+                normalize_country(country): voice_id
+                for country, voice_id in VoiceOverride.objects.values_list("country", "voice_id")
+            }
+            self._overrides = overrides
+            self._overrides_loaded = time.monotonic()
+        return overrides
+
+    def _get_table(self):
+        if self._table is None:
+            with self._lock:
+                if self._table is None:
+                    self._build(get_tts_pool().list_voices())
+        return self._table, self._default
+
+    def _build(self, voices):
+        by_locale, by_voice = {}, {}
+        for voice_id, name, languages in voices:
+            locales = _voice_locales(voice_id, name, languages)
+            if locales:
+                by_voice[voice_id] = locales[0].split("-")[0]
+            for loc in locales:
+                by_locale.setdefault(loc, voice_id)
+
+        table = dict(by_locale)
+        for country, preferred in self.locales.items():
+            for loc in preferred:
+                if loc in by_locale:
+                    table[country] = by_locale[loc]
+                    break
+
+        self._default = self.default_voice or (voices[0][0] if voices else None)
+        self._languages = by_voice
+        self._table = table
+
+
+VOICES = VoiceCatalogue(
+    locales=getattr(settings, "TTS_VOICE_LOCALES", None),
+    default_voice=getattr(settings, "TTS_DEFAULT_VOICE", None),
+    override_ttl=getattr(settings, "TTS_VOICE_OVERRIDE_TTL", 60),
+)
+
+post_save.connect(VOICES.invalidate_overrides, sender=VoiceOverride, weak=False)
+post_delete.connect(VOICES.invalidate_overrides, sender=VoiceOverride, weak=False)
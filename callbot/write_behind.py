@@ -0,0 +1,273 @@
+import asyncio
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache, partial
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .metrics import DB_FLUSH_ERRORS, DB_FLUSH_ROWS, DB_FLUSH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class BufferFull(Exception):
+    """The write-behind buffer stayed full for ``put_timeout`` seconds."""
+
+
+class WriteBehindBuffer:
+    """
+    Collects row updates and inserts in memory and writes them in the
+    background with one bulk_update per model/field set and one bulk_create
+    per model, every ``flush_interval`` seconds or as soon as ``max_batch``
+    records are waiting.
+
+    Updates to the same row are coalesced (later values win), so a call that
+    goes Dialing -> Ringing -> Answered between flushes costs one UPDATE.
+    A model's auto_now fields (CallQueue.updated) are set when the flush
+    writes the row, not when the update was queued: readers use ``updated``
+    as a cursor and would skip a row that committed with an older value.
+    At most ``max_pending`` records are held; beyond that writers block for
+    up to ``put_timeout`` seconds (then BufferFull) instead of growing memory
+    without bound.
+
+    A failed flush puts its records back and is retried with a backoff of up
+    to ``max_retry_delay`` seconds; nothing is dropped. From the
+    ``max_failures``-th failure in a row each record is written on its own,
+    so one bad row can't hold back the rest, and whatever still fails is
+    logged at error level and kept for the next try.
+    """
+
+    def __init__(self, flush_interval=0.2, max_batch=500, max_pending=10000, put_timeout=5, max_failures=3,
+                 max_retry_delay=30):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.put_timeout = put_timeout
+        self.max_failures = max_failures
+        self.max_retry_delay = max_retry_delay
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()  # one flush at a time keeps writes to a row in order
+        self._updates = {}   # (model, pk) -> {field: value}
+        self._creates = []   # unsaved model instances
+        self._thread = None
+        self._stopping = False
+        self._failures = 0
+        self._stats = defaultdict(float)
+
+    # -- producers --------------------------------------------------------
+
+    def update(self, model, pk, **fields):
+        """Queue ``UPDATE model SET fields WHERE pk=pk``; merged into any pending update for that row."""
+        with self._cond:
+            key = (model, pk)
+            if key not in self._updates:
+                self._wait_for_room()
+                self._updates[key] = {}
+            self._updates[key].update(fields)
+            self._stats["updates_queued"] += 1
+            self._notify_if_full()
+
+    def create(self, obj):
+        """Queue ``obj`` (an unsaved model instance) for the next bulk_create."""
+        with self._cond:
+            self._wait_for_room()
+            self._creates.append(obj)
+            self._stats["creates_queued"] += 1
+            self._notify_if_full()
+
+    async def aupdate(self, model, pk, **fields):
+        """update() for coroutines: only leaves the event loop to wait when the buffer is full."""
+        if self.pending() < self.max_pending:
+            self.update(model, pk, **fields)
+        else:
+            await asyncio.get_running_loop().run_in_executor(None, partial(self.update, model, pk, **fields))
+
+    async def acreate(self, obj):
+        if self.pending() < self.max_pending:
+            self.create(obj)
+        else:
+            await asyncio.get_running_loop().run_in_executor(None, self.create, obj)
+
+    def pending(self):
+        return len(self._updates) + len(self._creates)
+
+    def _wait_for_room(self):
+        self._ensure_thread()
+        if self.pending() < self.max_pending:
+            return
+        self._stats["full_waits"] += 1
+        self._cond.notify_all()
+        if not self._cond.wait_for(lambda: self.pending() < self.max_pending, self.put_timeout):
+            raise BufferFull(f"{self.pending()} writes pending for {self.put_timeout}s")
+
+    def _notify_if_full(self):
+        if self.pending() >= self.max_batch:
+            self._cond.notify_all()
+
+    # -- flushing ---------------------------------------------------------
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._failures:
+                    # Back off while the database is refusing writes; a full buffer doesn't cut this short
+                    delay = min(self.flush_interval * 2 ** self._failures, self.max_retry_delay)
+                    self._cond.wait_for(lambda: self._stopping, delay)
+                else:
+                    self._cond.wait_for(lambda: self._stopping or self.pending() >= self.max_batch, self.flush_interval)
+                stopping = self._stopping
+            self.flush()
+            if stopping:
+                return
+
+    def flush(self):
+        """Write everything pending now, on the calling thread. Returns the number of records written."""
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self):
+        with self._cond:
+            updates, self._updates = self._updates, {}
+            creates, self._creates = self._creates, []
+            self._cond.notify_all()
+        size = len(updates) + len(creates)
+        if not size:
+            return 0
+        started = time.perf_counter()
+        try:
+            close_old_connections()
+            with transaction.atomic():
+                self._write(updates, creates)
+        except Exception as e:
+            self._failures += 1
+            self._stats["errors"] += 1
+            DB_FLUSH_ERRORS.inc()
+            if self._failures < self.max_failures:
+                logger.warning("Write-behind flush of %d writes failed, retrying: %s", size, e)
+                self._requeue(updates, creates)
+                return 0
+            return self._flush_each(updates, creates, e)
+        self._failures = 0
+        elapsed = time.perf_counter() - started
+        s = self._stats
+        s["flushes"] += 1
+        s["rows_updated"] += len(updates)
+        s["rows_created"] += len(creates)
+        s["flush_seconds"] += elapsed
+        s["flush_seconds_max"] = max(s["flush_seconds_max"], elapsed)
+        s["flush_size_max"] = max(s["flush_size_max"], size)
+        DB_FLUSH_SECONDS.observe(elapsed)
+        DB_FLUSH_ROWS.labels(op="update").inc(len(updates))
+        DB_FLUSH_ROWS.labels(op="create").inc(len(creates))
+        return size
+
+    @staticmethod
+    def _write(updates, creates):
+        # Inside the flush transaction; anything queued for these fields is overwritten
+        now = timezone.now()
+        # One bulk_update per (model, set of fields) so every row in it sets the same columns
+        groups = defaultdict(list)
+        for (model, pk), fields in updates.items():
+            fields = {**fields, **dict.fromkeys(_auto_now_fields(model), now)}
+            groups[(model, tuple(sorted(fields)))].append(model(pk=pk, **fields))
+        for (model, fields), objs in groups.items():
+            model.objects.bulk_update(objs, fields)
+        by_model = defaultdict(list)
+        for obj in creates:
+            by_model[type(obj)].append(obj)
+        for model, objs in by_model.items():
+            model.objects.bulk_create(objs)
+
+    def _flush_each(self, updates, creates, error):
+        """Write record by record after repeated failures; keep (and report) the ones that still fail."""
+        failed_updates, failed_creates = {}, []
+        for key, fields in updates.items():
+            try:
+                with transaction.atomic():
+                    self._write({key: fields}, [])
+            except Exception as e:
+                failed_updates[key] = fields
+                error = e
+        for obj in creates:
+            try:
+                with transaction.atomic():
+                    self._write({}, [obj])
+            except Exception as e:
+                failed_creates.append(obj)
+                error = e
+        written = len(updates) - len(failed_updates) + len(creates) - len(failed_creates)
+        self._stats["rows_updated"] += len(updates) - len(failed_updates)
+        self._stats["rows_created"] += len(creates) - len(failed_creates)
+        DB_FLUSH_ROWS.labels(op="update").inc(len(updates) - len(failed_updates))
+        DB_FLUSH_ROWS.labels(op="create").inc(len(creates) - len(failed_creates))
+        if failed_updates or failed_creates:
+            logger.error(
+                "Write-behind could not write %d of %d records after %d failed flushes, keeping them: %s (rows %s)",
+                len(failed_updates) + len(failed_creates), len(updates) + len(creates), self._failures, error,
+                ", ".join(f"{model.__name__}:{pk}" for model, pk in list(failed_updates)[:10]) or "-",
+            )
+            self._requeue(failed_updates, failed_creates)
+        else:
+            self._failures = 0
+        return written
+
+    def _requeue(self, updates, creates):
+        with self._cond:
+            for key, fields in updates.items():
+                # Anything written since keeps precedence over the failed batch
+                self._updates[key] = {**fields, **self._updates.get(key, {})}
+            self._creates[:0] = creates
+
+    def close(self):
+        """Stop the background thread after a final flush."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(10)
+        self.flush()
+        if self.pending():
+            logger.error("Write-behind exiting with %d writes that could not be written", self.pending())
+
+    def stats(self):
+        s = dict(self._stats)
+        flushes = s.get("flushes", 0)
+        return {
+            "pending": self.pending(),
+            "flushes": int(flushes),
+            "rows_updated": int(s.get("rows_updated", 0)),
+            "rows_created": int(s.get("rows_created", 0)),
+            "updates_coalesced": int(s.get("updates_queued", 0) - s.get("rows_updated", 0) - len(self._updates)),
+            "flush_size_avg": (s.get("rows_updated", 0) + s.get("rows_created", 0)) / flushes if flushes else 0.0,
+            "flush_size_max": int(s.get("flush_size_max", 0)),
+            "flush_ms_avg": 1000 * s.get("flush_seconds", 0) / flushes if flushes else 0.0,
+            "flush_ms_max": 1000 * s.get("flush_seconds_max", 0),
+            "full_waits": int(s.get("full_waits", 0)),
+            "errors": int(s.get("errors", 0)),
+            "failing": self._failures,
+        }
+
+
+@lru_cache(maxsize=None)
+def _auto_now_fields(model):
+    """bulk_update() skips pre_save, so auto_now fields have to be set by hand."""
+    return tuple(f.name for f in model._meta.concrete_fields if getattr(f, "auto_now", False))
+
+
+WRITER = WriteBehindBuffer(
+    flush_interval=getattr(settings, 'WRITE_BEHIND_FLUSH_MS', 200) / 1000,
+    max_batch=getattr(settings, 'WRITE_BEHIND_MAX_BATCH', 500),
+    max_pending=getattr(settings, 'WRITE_BEHIND_MAX_PENDING', 10000),
+)
+atexit.register(WRITER.close)
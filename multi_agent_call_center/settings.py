@@ -76,6 +76,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Several dialer processes claim rows concurrently: take the write lock at
+        # BEGIN and wait for it instead of failing with "database is locked".
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -126,3 +132,97 @@ INSTALLED_APPS.append("callbot")
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# AMI connections: the dialer's sockets (callbot.ami_async) and event listeners (callbot.ami_events)
+AMI_KEEPALIVE_SECONDS = 20         # must stay below AMI_SOCKET_TIMEOUT (checked at startup)
+AMI_SOCKET_TIMEOUT = 30            # event listener socket timeout
+AMI_ASYNC_SOCKETS = 2              # pipelined asyncio sockets per credential in each dialer worker (callbot.ami_async)
+AMI_ASYNC_TIMEOUT = 10             # seconds to wait for an action's Response
+
+# Content-addressed TTS prompt cache (callbot.tts_cache)
+TTS_CACHE_DIR = MEDIA_ROOT / 'tts'
+TTS_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Warm pyttsx3 worker processes (callbot.tts_pool)
+TTS_POOL_SIZE = 2
+TTS_POOL_MAX_JOBS_PER_WORKER = 500   # recycle a worker after this many jobs
+TTS_POOL_QUEUE_SIZE = 100            # bounded backlog; submit waits TTS_POOL_QUEUE_TIMEOUT then fails
+TTS_POOL_QUEUE_TIMEOUT = 5
+TTS_POOL_JOB_TIMEOUT = 120
+TTS_JOB_WORKERS = TTS_POOL_SIZE
+TTS_JOB_STALE_SECONDS = 600          # Pending/Running jobs untouched this long were lost to a restart
+
+# Long scripts render one sentence per TTS job (callbot.tts_chunks), in parallel and cached
+# per sentence; sentences longer than TTS_CHUNK_MAX_CHARS are cut at commas, then words
+TTS_CHUNK_MAX_CHARS = 200
+TTS_CHUNK_THREADS = 4 * TTS_POOL_SIZE  # chunks in flight per process, queued on the TTS workers
+TTS_SPLICE_PAD_MS = 40  # silence kept around each piece of a template render (callbot.script_templates)
+
+# Country -> voice table (callbot.voices). Per-country overrides live in the
+# VoiceOverride admin; these extend the built-in COUNTRY_LOCALES mapping.
+TTS_VOICE_LOCALES = {}
+TTS_DEFAULT_VOICE = None
+TTS_VOICE_OVERRIDE_TTL = 60
+
+# Live dashboard push (callbot.live); serve through asgi.py for streaming
+LIVE_FEED_INTERVAL = 1.0            # seconds between change-feed reads
+LIVE_FEED_SUBSCRIBER_QUEUE = 100    # batches buffered per browser before it is dropped
+
+# Concurrent dialer (callbot.dialer); per-trunk limits are CallCredential.max_channels / max_cps
+DIALER_CONCURRENCY = 20
+DIALER_LEASE_SECONDS = 60    # a claimed call returns to Queued if its worker stops renewing
+
+# run_dialer supervisor (callbot.dialer_supervisor); run one per node against the shared DB
+DIALER_MIN_WORKERS = 1
+DIALER_MAX_WORKERS = 4
+DIALER_CALLS_PER_WORKER = 100   # queued rows per worker before scaling up
+DIALER_MAX_LAG_SECONDS = 30     # add a worker while the oldest queued call waits longer than this
+DIALER_DRAIN_SECONDS = 60       # in-flight calls get this long to finish on SIGTERM
+
+# Call scheduler (callbot.scheduler); calling hours per country are CallingWindow rows
+SCHEDULER_HORIZON_SECONDS = 300   # how far ahead upcoming calls are read into the heap
+SCHEDULER_REFILL_SECONDS = 5      # seconds between range queries for new work
+SCHEDULER_BATCH = 500             # max rows read per refill
+
+# Call retries (callbot.retries); delay = base_delay * factor ** (attempt - 1), capped at max_delay.
+# Calls out of attempts go to DeadLetter; list/requeue them with `manage.py dead_letters`.
+# A call has one attempt counter for every failure class, so max_attempts is the total number
+# of attempts after which a failure of that class dead-letters the call, not a per-class count.
+# This dict is the only place the policies are set; callbot.retries falls back to the same
+# values only when the setting is missing.
+CALL_RETRY_POLICIES = {
+    "login": {"max_attempts": 6, "base_delay": 30, "factor": 2, "max_delay": 1800},
+    "rejected": {"max_attempts": 3, "base_delay": 60, "factor": 2, "max_delay": 3600},
+    "no_answer": {"max_attempts": 4, "base_delay": 600, "factor": 2, "max_delay": 7200},
+    "error": {"max_attempts": 3, "base_delay": 30, "factor": 4, "max_delay": 1800},
+}
+CALL_RETRY_JITTER = 0.1   # +/- fraction applied to every delay
+
+# Call progress from the AMI event stream (callbot.ami_events); one listener connection per PBX
+AMI_EVENTS_CONNECT_TIMEOUT = 5   # seconds the first call on a PBX waits for its listener to log in
+CALL_MAX_SECONDS = 3600          # a call holds its trunk channel until hangup, at most this long
+
+# Write-behind buffer for call status changes and CallLog rows (callbot.write_behind)
+WRITE_BEHIND_FLUSH_MS = 200       # flush at least this often
+WRITE_BEHIND_MAX_BATCH = 500      # ...or as soon as this many rows are waiting
+WRITE_BEHIND_MAX_PENDING = 10000  # writers block (then fail) beyond this many unflushed rows
+
+# Dialer event loop (callbot.utils / callbot.loop_monitor)
+DIALER_IO_THREADS = 32          # threads for blocking TTS and AMI work off the event loop
+LOOP_LAG_THRESHOLD_MS = 100     # report (with a stack) anything blocking the loop this long
+
+# Prometheus /metrics (callbot.metrics). Dialer workers publish their numbers as snapshot
+# files for the web process to serve; METRICS_DIR (default <tmp>/callbot-metrics) must be
+# shared by the web and run_dialer processes of a node.
+METRICS_SNAPSHOT_SECONDS = 10   # how often each dialer worker writes its snapshot
+METRICS_STALE_SECONDS = 60      # snapshots older than this (worker gone) are left out
+
+# Per-call stage timings on CallLog (callbot.spans); report with `manage.py slow_calls`
+CALL_TIMING_SAMPLE_RATE = 1.0   # share of calls timed; lower it if the extra CallLog bytes matter
+
+# Telephony variants of every prompt (callbot.audio): 8 kHz, silence trimmed, loudness
+# normalized, stored next to the cached source as <key>.sln/.ulaw/.alaw/.gsm (gsm needs sox)
+TTS_TELEPHONY_FORMATS = ["sln", "ulaw", "alaw", "gsm"]
+TTS_TELEPHONY_TARGET_DBFS = -18.0   # RMS loudness of the prompt
+TTS_TELEPHONY_PEAK_DBFS = -1.0      # ...unless that would push peaks above this
+TTS_TELEPHONY_SILENCE_DBFS = -45.0  # leading/trailing audio quieter than this is trimmed